@@ -0,0 +1,217 @@
+"""
+Renders every chart of the bundled testGrib.f000 with gfs_build_visualization_map and reports time spent in each
+stage of the render path, wall and CPU time and peak memory. Results can be saved as JSON and compared with results
+of another commit. Run from the repository root:
+
+    python -m benchmarks.bench_render --repeat 3 --json render.json
+    python -m benchmarks.bench_render --compare render.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import functools
+import subprocess
+import statistics
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+from matplotlib.axes import Axes
+from matplotlib.figure import Figure
+from project import contours, resampling
+from project import raw_data_visualization as rdv
+
+TEST_GRIB = os.path.join(rdv.BASE_DIR, "testGrib.f000")
+DATE = "19700101"  # GRIB file is copied to data/gfs/<DATE>/00z for the time of benchmark
+HOUR = 0
+THRESHOLD = 0.2  # relative slowdown of a stage reported as regression by --compare
+
+# stage name, object and name of its attribute which is timed
+STAGES = [
+    ("gdal open", rdv.gdal, "Open"),
+    ("band lookup", rdv.BAND_RESOLVER, "bands"),
+    ("band read", rdv.gdal.Band, "ReadAsArray"),
+    ("resize", resampling, "block_upsample"),
+    ("convolve", resampling, "box_smooth"),
+    ("basemap load", rdv, "prepare_basemap_layer"),
+    ("contours", contours, "compute"),
+    ("fill draw", contours, "draw_filled"),
+    ("line draw", contours, "draw_lines"),
+    ("clabel", Axes, "clabel"),
+    ("quiver", Axes, "quiver"),
+    ("savefig", Figure, "savefig"),
+]
+
+
+def timed(stage, func, timings):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+    return wrapper
+
+
+class Instrumented:
+    """
+    Context manager, which wraps all STAGES functions, so time spent in them is added to `timings` dict.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self._originals = []
+
+    def __enter__(self):
+        for stage, owner, name in STAGES:
+            original = getattr(owner, name)
+            self._originals.append((owner, name, original))
+            setattr(owner, name, timed(stage, original, self.timings))
+        return self
+
+    def __exit__(self, *args):
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals = []
+
+
+def render_chart(chart, out_dir):
+    """
+    Reads fields of a chart from the GRIB file (without field cache), computes its contours (without saving them)
+    and renders it.
+
+    :return: (wall time [s], {stage: time [s]})
+    """
+    with Instrumented() as instrumented:
+        start = time.perf_counter()
+        fields = rdv.gfs_extract_fields(DATE, HOUR, 0, [chart], rdv.EXTENT_POLAND, use_cache=False)
+        geometry = rdv.chart_contours(DATE, HOUR, 0, chart, rdv.EXTENT_POLAND, fields, use_cache=False)
+        rdv.gfs_build_visualization_map(DATE, HOUR, 0, chart, rdv.EXTENT_POLAND, img_path=out_dir, fields=fields,
+                                        geometry=geometry)
+        wall = time.perf_counter() - start
+    os.remove(os.path.join(out_dir, f"{chart}.png"))
+    return wall, instrumented.timings
+
+
+def run(repeat, charts):
+    """
+    Renders all charts `repeat` times. Basemap caches and the chart figure are cleared before the first round only, so
+    the first round shows cold start of a render worker and medians show a warm one.
+
+    :return: dict with results (see --json).
+    """
+    grib_dir = os.path.join(rdv.BASE_DIR, "data", "gfs", DATE, f"{HOUR:02}z")
+    os.makedirs(grib_dir, exist_ok=True)
+    shutil.copyfile(TEST_GRIB, os.path.join(grib_dir, "gfs.pgrb2.0p25.f000"))
+    rdv.BAND_RESOLVER.indexes.clear()
+    rdv._BASEMAPS.clear()
+    rdv._BASEMAP_LAYERS.clear()
+    rdv._CHART_FIGURE = None
+
+    rounds = {chart: [] for chart in charts}
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        with tempfile.TemporaryDirectory() as out_dir:
+            for i in range(repeat):
+                for chart in charts:
+                    rounds[chart].append(render_chart(chart, out_dir))
+    finally:
+        shutil.rmtree(os.path.dirname(grib_dir), ignore_errors=True)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    results = {}
+    for chart, chart_rounds in rounds.items():
+        stages = {stage: statistics.median(timings.get(stage, 0.0) for _, timings in chart_rounds)
+                  for stage, _, _ in STAGES}
+        median_wall = statistics.median(chart_wall for chart_wall, _ in chart_rounds)
+        stages["other"] = max(median_wall - sum(stages.values()), 0.0)
+        results[chart] = {"wall": median_wall, "cold": chart_rounds[0][0], "stages": stages}
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "matplotlib": matplotlib.__version__,
+        "repeat": repeat,
+        "charts": results,
+        "stages": {stage: sum(result["stages"][stage] for result in results.values())
+                   for stage in [s for s, _, _ in STAGES] + ["other"]},
+        "total": {
+            "wall": wall,
+            "cpu": cpu,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=rdv.BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results):
+    stages = list(results["stages"].keys())
+    print(f"{'chart':<20}{'wall':>8}{'cold':>8}" + "".join(f"{stage[:10]:>12}" for stage in stages))
+    for chart, result in results["charts"].items():
+        print(f"{chart:<20}{result['wall']:>8.3f}{result['cold']:>8.3f}" +
+              "".join(f"{result['stages'][stage]:>12.4f}" for stage in stages))
+    print(f"{'all charts':<20}{sum(r['wall'] for r in results['charts'].values()):>8.3f}{'':>8}" +
+          "".join(f"{results['stages'][stage]:>12.4f}" for stage in stages))
+    total = results["total"]
+    print(f"\nTotal ({results['repeat']} rounds): wall {total['wall']:.2f}s, CPU {total['cpu']:.2f}s, "
+          f"peak RSS {total['peak_rss_mb']:.0f} MB")
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    Prints per stage change against baseline results.
+
+    :return: list of stages slower by more than threshold.
+    """
+    print(f"\nComparison with {baseline.get('commit')}:")
+    regressions = []
+    for stage, seconds in results["stages"].items():
+        before = baseline["stages"].get(stage)
+        if not before:
+            continue
+        change = seconds / before - 1
+        flag = ""
+        if change > threshold and seconds - before > 0.005:
+            regressions.append(stage)
+            flag = "  <-- regression"
+        print(f"{stage:<14}{before:>10.4f}{seconds:>10.4f}{change:>+9.0%}{flag}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="number of rounds")
+    parser.add_argument("--charts", nargs="*", default=list(rdv.CHARTS.keys()), help="charts to render")
+    parser.add_argument("--json", help="save results in given file")
+    parser.add_argument("--compare", help="compare with results saved by --json; exit code is 1 on regression")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.charts)
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(results, json.load(f)):
+                sys.exit(1)
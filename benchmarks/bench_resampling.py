@@ -0,0 +1,49 @@
+"""
+Compares the old upsampling (Python loop + dense 2-D convolution) with project.resampling on the Poland grid and on
+bigger extents. Run from the repository root: python -m benchmarks.bench_resampling
+"""
+import timeit
+import numpy as np
+
+from scipy.ndimage import convolve
+from project import resampling
+
+FACTOR = 10
+
+# (name, extent [left_lon, right_lon, top_lat, bottom_lat]) at 0.25 deg resolution
+GRIDS = [
+    ("Poland", [13, 25, 56, 48]),
+    ("Central Europe", [0, 40, 60, 40]),
+    ("Europe", [-25, 45, 72, 34]),
+]
+
+
+def loop_resize(data_in: np.ndarray, factor: int) -> np.ndarray:
+    result = np.zeros(np.array(data_in.shape) * factor)
+    for i in range(data_in.shape[0]):
+        for j in range(data_in.shape[1]):
+            result[i * factor:(i + 1) * factor, j * factor:(j + 1) * factor] = data_in[i, j]
+    return result
+
+
+def old_upsample_smooth(data: np.ndarray, factor: int) -> np.ndarray:
+    return convolve(loop_resize(data, factor), np.ones([factor, factor]) / (factor ** 2))
+
+
+def grid_shape(extent):
+    return int((extent[2] - extent[3]) / 0.25) + 1, int((extent[1] - extent[0]) / 0.25) + 1
+
+
+def best_of(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+if __name__ == '__main__':
+    print(f"{'grid':<16}{'shape':>12}{'old [s]':>12}{'new [s]':>12}{'speedup':>10}{'max diff':>12}")
+    for name, extent in GRIDS:
+        data = np.random.RandomState(0).normal(10, 5, grid_shape(extent))
+        repeat = 5 if data.size < 10000 else 2
+        old = best_of(lambda: old_upsample_smooth(data, FACTOR), repeat)
+        new = best_of(lambda: resampling.upsample_smooth(data, FACTOR), repeat)
+        diff = np.abs(old_upsample_smooth(data, FACTOR) - resampling.upsample_smooth(data, FACTOR)).max()
+        print(f"{name:<16}{str(data.shape):>12}{old:>12.4f}{new:>12.4f}{old / new:>9.1f}x{diff:>12.1e}")
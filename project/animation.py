@@ -0,0 +1,125 @@
+import os
+import glob
+import json
+import math
+
+from PIL import Image
+from typing import List
+from project import image_variants
+
+PICS_DIR = os.path.dirname(__file__) + "/../data/pics"
+ANIMATIONS_DIR = os.path.dirname(__file__) + "/../data/animations"
+
+ANIMATION_WIDTH = 1280  # [px]
+FRAME_DURATION = 400  # [ms]
+SPRITE_TILE_WIDTH = 360  # [px]
+SPRITE_COLUMNS = 8
+
+
+def animation_paths(day: str, hour: str, chart: str, out_dir: str = ANIMATIONS_DIR) -> dict:
+    """
+    :param day: base date in format "YYYYMMDD"
+    :param hour: base hour in format "HHz"
+    :param chart: chart name, e.g. "Temperature 2m"
+    :param out_dir: directory with animations.
+    :return: dict with paths of animated WebP ("webp"), sprite sheet ("sprite") and its index ("index").
+    """
+    directory = os.path.join(out_dir, day, hour)
+    return {
+        "webp": os.path.join(directory, f"{chart}.webp"),
+        "sprite": os.path.join(directory, f"{chart}.sprite.png"),
+        "index": os.path.join(directory, f"{chart}.sprite.json"),
+    }
+
+
+def chart_frames(day: str, hour: str, chart: str, pics_dir: str = PICS_DIR) -> List[str]:
+    """
+    :return: paths of all rendered frames of given chart, sorted by forecast hour.
+    """
+    return sorted(glob.glob(os.path.join(pics_dir, day, hour, "*", f"{glob.escape(chart)}.png")))
+
+
+def _load_frame(path: str, width: int) -> Image.Image:
+    # medium variant is already scaled down, so use it when it is big enough
+    medium = image_variants.variant_path(path, "medium", "png")
+    source = medium if os.path.isfile(medium) and image_variants.SIZES["medium"] >= width else path
+    with Image.open(source) as image:
+        image = image.convert("RGB")
+        image.thumbnail((width, round(width * image.height / image.width)), Image.LANCZOS)
+        return image
+
+
+def _save_atomic(image: Image.Image, path: str, **kwargs):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    image.save(tmp_path, **kwargs)
+    os.replace(tmp_path, path)
+
+
+def build_animation(day: str, hour: str, chart: str, pics_dir: str = PICS_DIR, out_dir: str = ANIMATIONS_DIR,
+                    width: int = ANIMATION_WIDTH) -> dict:
+    """
+    Builds looped animated WebP and tiled sprite sheet (with JSON index) of all rendered frames of a chart, so the
+    whole run can be fetched by a single request.
+
+    :param day: base date in format "YYYYMMDD"
+    :param hour: base hour in format "HHz"
+    :param chart: chart name, e.g. "Temperature 2m"
+    :param pics_dir: directory with pictures in structure: day/hour/forecast/chart.png
+    :param out_dir: directory with animations.
+    :param width: width of animation frames [px].
+    :return: dict with paths of created files (see animation_paths).
+    """
+
+    if type(width) != int:
+        raise TypeError("Width should be an integer!")
+    if width <= 0:
+        raise ValueError("Width should be a positive integer!")
+
+    frames = chart_frames(day, hour, chart, pics_dir)
+    if not frames:
+        raise FileNotFoundError(f"Could not find any frames of \"{chart}\" chart ({day} {hour}).")
+
+    paths = animation_paths(day, hour, chart, out_dir)
+    os.makedirs(os.path.dirname(paths["webp"]), exist_ok=True)
+    forecasts = [os.path.basename(os.path.dirname(frame)) for frame in frames]
+
+    images = [_load_frame(frame, width) for frame in frames]
+    _save_atomic(images[0], paths["webp"], format="WEBP", save_all=True, append_images=images[1:],
+                 duration=FRAME_DURATION, loop=0, quality=image_variants.WEBP_QUALITY, method=4)
+
+    tile_width = SPRITE_TILE_WIDTH
+    tile_height = round(tile_width * images[0].height / images[0].width)
+    columns = min(SPRITE_COLUMNS, len(images))
+    rows = math.ceil(len(images) / columns)
+    sprite = Image.new("RGB", (columns * tile_width, rows * tile_height), (255, 255, 255))
+    for i, image in enumerate(images):
+        sprite.paste(image.resize((tile_width, tile_height), Image.LANCZOS),
+                     ((i % columns) * tile_width, (i // columns) * tile_height))
+    _save_atomic(sprite, paths["sprite"], format="PNG", optimize=True)
+
+    index = {
+        "forecasts": forecasts,
+        "tile_width": tile_width,
+        "tile_height": tile_height,
+        "columns": columns,
+        "frame_duration": FRAME_DURATION,
+    }
+    tmp_path = f"{paths['index']}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, paths["index"])
+
+    return paths
+
+
+def build_cycle_animations(day: str, hour: str, pics_dir: str = PICS_DIR, out_dir: str = ANIMATIONS_DIR):
+    """
+    Builds animations of all charts rendered for given base date and hour.
+
+    :param day: base date in format "YYYYMMDD"
+    :param hour: base hour in format "HHz"
+    """
+    charts = sorted({os.path.basename(pic)[:-4] for pic in glob.glob(os.path.join(pics_dir, day, hour, "*", "*.png"))})
+    for chart in charts:
+        print(f"Building animation of \"{chart}\" ({day} {hour})...")
+        build_animation(day, hour, chart, pics_dir, out_dir)
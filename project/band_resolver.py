@@ -0,0 +1,183 @@
+import re
+
+from typing import Dict, Iterable, List, Tuple
+
+# (variable, level, time range) of a GRIB message in wgrib2 inventory notation, e.g. ("TMP", "2 m above ground",
+# "fcst"). Time range is "fcst" (analysis or instantaneous forecast) or statistic ("acc", "ave", "max", "min") with
+# length of its time interval, e.g. "acc 6h" ("0-6 hour acc fcst" or "6-12 hour acc fcst" in inventory), so GFS
+# accumulations since the last reset and since the start of forecast are different keys.
+Key = Tuple[str, str, str]
+
+# GRIB2 code table 4.10 (type of statistical processing)
+STATISTICS = {0: "ave", 1: "acc", 2: "max", 3: "min"}
+
+# GRIB2 code table 4.4 (indicator of unit of time range): length of the unit in hours
+TIME_UNITS = {0: 1 / 60, 1: 1, 2: 24, 10: 3, 11: 6, 12: 12, 13: 1 / 3600}
+
+# position of the type of statistical processing in values of product definition templates 4.8 and 4.11 (it is
+# followed by type of time increment, unit of time range and length of time range)
+STATISTICS_POSITION = {8: 23, 11: 26}
+
+# GDAL level types (GRIB_SHORT_NAME suffix) and their names in wgrib2 inventory
+LEVEL_TYPES = {
+    "SFC": lambda value: "surface",
+    "MSL": lambda value: "mean sea level",
+    "HTGL": lambda value: f"{value} m above ground",
+    "ISBL": lambda value: f"{value / 100:g} mb",
+}
+
+
+def statistic_range(statistic: str, hours: float) -> str:
+    """
+    :return: time range of a Key of given statistic over given number of hours, e.g. "acc 6h".
+    """
+    return f"{statistic} {hours:g}h"
+
+
+def time_range(text: str) -> str:
+    """
+    :param text: time range of a message in inventory, e.g. "anl", "3 hour fcst", "0-6 hour acc fcst".
+    :return: time range of a Key.
+    """
+    match = re.search(r"\b(\d+)-(\d+) (hour|day) (acc|ave|max|min)\b", text)
+    if match:
+        hours = (int(match.group(2)) - int(match.group(1))) * (24 if match.group(3) == "day" else 1)
+        return statistic_range(match.group(4), hours)
+    for statistic in ["acc", "ave", "max", "min"]:
+        if re.search(rf"\b{statistic}\b", text):
+            return statistic
+    return "fcst"
+
+
+def forecast_key(key: Key, forecast: int) -> Key:
+    """
+    Statistics of GFS are reset every few hours (e.g. precipitation every 6 hours), so the key of a field over the
+    whole period (e.g. "acc 6h") is shorter at forecast hours in the middle of a period: "0-3 hour acc" at forecast
+    hour 3, "6-9 hour acc" at 9, "6-12 hour acc" at 12.
+
+    :param key: key of a field, time range of statistics is the period of resets.
+    :param forecast: given forecast hour as integer.
+    :return: key of the field at given forecast hour.
+    """
+    match = re.fullmatch(r"(acc|ave|max|min) (\d+)h", key[2])
+    if not match or forecast <= 0:
+        return key
+    period = int(match.group(2))
+    return key[0], key[1], statistic_range(match.group(1), forecast - (forecast - 1) // period * period)
+
+
+def inventory_key(description: str) -> Key:
+    """
+    :param description: description of a message in .idx inventory (see downloader.parse_idx), e.g.
+                        "d=2020101206:TMP:2 m above ground:3 hour fcst:".
+    :return: Key of the message.
+    """
+    fields = description.split(":")
+    if len(fields) < 4:
+        raise ValueError(f"Incorrect inventory description: \"{description}\"!")
+    return fields[1], fields[2], time_range(fields[3])
+
+
+def metadata_key(metadata: Dict[str, str]) -> Key:
+    """
+    :param metadata: metadata of a GDAL GRIB band (GRIB_ELEMENT, GRIB_SHORT_NAME, GRIB_PDS_PDTN,
+                     GRIB_PDS_TEMPLATE_ASSEMBLED_VALUES).
+    :return: Key of the band.
+    """
+    variable = metadata.get("GRIB_ELEMENT", "")
+
+    level = metadata.get("GRIB_SHORT_NAME", "")
+    match = re.fullmatch(r"(\d+)-([A-Z]+)", level)
+    if match and match.group(2) in LEVEL_TYPES:
+        level = LEVEL_TYPES[match.group(2)](int(match.group(1)))
+
+    statistic = "fcst"
+    template = int(metadata.get("GRIB_PDS_PDTN", 0))
+    values = metadata.get("GRIB_PDS_TEMPLATE_ASSEMBLED_VALUES", "").split()
+    position = STATISTICS_POSITION.get(template)
+    if position is not None and len(values) > position + 3 and int(values[position]) in STATISTICS:
+        statistic = STATISTICS[int(values[position])]
+        unit = int(values[position + 2])
+        if unit in TIME_UNITS:
+            statistic = statistic_range(statistic, int(values[position + 3]) * TIME_UNITS[unit])
+
+    return variable, level, statistic
+
+
+def build_index(keys: Iterable[Key]) -> Dict[Key, int]:
+    """
+    :param keys: keys of all messages in order.
+    :return: dict {Key: message number (from 1)}; the first of messages with the same key is used.
+    """
+    index = {}
+    for number, key in enumerate(keys, 1):
+        index.setdefault(key, number)
+    return index
+
+
+def inventory_messages(inventory: List[Tuple[int, int, str]], keys: Iterable[Key]) -> Dict[Key, int]:
+    """
+    Finds messages of given keys in .idx inventory.
+
+    :param inventory: parsed inventory (see downloader.parse_idx).
+    :param keys: wanted keys.
+    :return: dict {Key: message number}.
+    """
+    index = {}
+    for number, offset, description in inventory:
+        index.setdefault(inventory_key(description), number)
+    missing = [key for key in keys if key not in index]
+    if missing:
+        raise KeyError(f"Fields {missing} not found in inventory!")
+    return {key: index[key] for key in keys}
+
+
+class BandResolver:
+    """
+    Finds bands of an opened GDAL GRIB dataset by their keys. Index of a file (Key -> band number) is built from
+    metadata of all its bands once and kept per inventory signature (number of bands and keys of the first and the
+    last band), so files with the same inventory (e.g. the same forecast hour of following cycles) are looked up
+    without scanning. Every resolved band is checked against its key, so a changed inventory is indexed again instead
+    of giving a wrong field.
+    """
+
+    def __init__(self):
+        self.indexes = {}
+        self.scans = 0
+
+    @staticmethod
+    def signature(grib) -> tuple:
+        count = grib.RasterCount
+        return count, metadata_key(grib.GetRasterBand(1).GetMetadata()), \
+            metadata_key(grib.GetRasterBand(count).GetMetadata())
+
+    def scan(self, grib) -> Dict[Key, int]:
+        """
+        Builds index of a file from metadata of all its bands.
+        """
+        self.scans += 1
+        return build_index(metadata_key(grib.GetRasterBand(i).GetMetadata()) for i in range(1, grib.RasterCount + 1))
+
+    def bands(self, grib, keys: Iterable[Key]) -> dict:
+        """
+        :param grib: GDAL dataset of a GRIB file.
+        :param keys: (variable, level, time range) of wanted fields.
+        :return: dict {Key: GDAL band}.
+        """
+        signature = self.signature(grib)
+        index = self.indexes.get(signature)
+        if index is None:
+            index = self.indexes[signature] = self.scan(grib)
+
+        bands = {}
+        for key in keys:
+            if key in index:
+                band = grib.GetRasterBand(index[key])
+                if metadata_key(band.GetMetadata()) == key:
+                    bands[key] = band
+                    continue
+                index = self.indexes[signature] = self.scan(grib)
+            if key not in index:
+                raise KeyError(f"Field {key} not found in GRIB file!")
+            bands[key] = grib.GetRasterBand(index[key])
+        return bands
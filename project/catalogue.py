@@ -0,0 +1,217 @@
+import os
+import glob
+import sqlite3
+import threading
+
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple
+
+PICS_DIR = os.path.dirname(__file__) + "/../data/pics"
+CATALOGUE_PATH = os.path.dirname(__file__) + "/../data/catalogue.sqlite"
+REFRESH_INTERVAL = 5.0  # [s], how often CatalogueWatcher checks the catalogue files
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS charts (
+    day TEXT NOT NULL,
+    hour TEXT NOT NULL,
+    forecast TEXT NOT NULL,
+    pic TEXT NOT NULL,
+    PRIMARY KEY (day, hour, forecast, pic)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (id, version) VALUES (0, 0);
+"""
+
+
+def connect(path: str = CATALOGUE_PATH) -> sqlite3.Connection:
+    """
+    Opens catalogue database (and creates it if needed). WAL journal lets the web app read the catalogue while
+    render workers are writing to it.
+
+    :param path: path to catalogue file.
+    :return: sqlite3.Connection.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def publish(day: str, hour: str, forecast: str, pic: str, path: str = CATALOGUE_PATH):
+    """
+    Adds chart to the catalogue. Should be called after the picture is completely written.
+
+    :param day: base date in format "YYYYMMDD"
+    :param hour: base hour in format "HHz"
+    :param forecast: forecast hour in format "FFF"
+    :param pic: picture file name, e.g. "Temperature 2m.png"
+    :param path: path to catalogue file.
+    """
+    publish_many([(day, hour, forecast, pic)], path)
+
+
+def publish_many(entries: List[tuple], path: str = CATALOGUE_PATH):
+    """
+    Adds many charts to the catalogue in one transaction.
+
+    :param entries: list of (day, hour, forecast, pic) tuples (see publish).
+    :param path: path to catalogue file.
+    """
+    connection = connect(path)
+    try:
+        with connection:
+            cursor = connection.executemany("INSERT OR IGNORE INTO charts VALUES (?, ?, ?, ?)", entries)
+            if cursor.rowcount > 0:
+                connection.execute("UPDATE meta SET version = version + 1")
+    finally:
+        connection.close()
+
+
+def version(path: str = CATALOGUE_PATH) -> int:
+    """
+    :param path: path to catalogue file.
+    :return: number which changes every time new charts are published.
+    """
+    connection = connect(path)
+    try:
+        return connection.execute("SELECT version FROM meta").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def load(path: str = CATALOGUE_PATH) -> Dict[str, Dict[str, Dict[str, List[str]]]]:
+    """
+    Reads whole catalogue.
+
+    :param path: path to catalogue file.
+    :return: nested, sorted dict {day: {hour: {forecast: [pics]}}}.
+    """
+    connection = connect(path)
+    try:
+        rows = connection.execute("SELECT day, hour, forecast, pic FROM charts ORDER BY day, hour, forecast, pic")
+        charts = {}
+        for day, hour, forecast, pic in rows:
+            charts.setdefault(day, {}).setdefault(hour, {}).setdefault(forecast, []).append(pic)
+        return charts
+    finally:
+        connection.close()
+
+
+def rebuild(pics_dir: str = PICS_DIR, path: str = CATALOGUE_PATH):
+    """
+    Scans pictures directory and adds all charts found there to the catalogue. Needed only once, for pictures
+    rendered before the catalogue existed.
+
+    :param pics_dir: directory with pictures in structure: day/hour/forecast/chart.png
+    :param path: path to catalogue file.
+    """
+    entries = []
+    for pic in glob.glob(os.path.join(pics_dir, "*", "*", "*", "*.png")):
+        forecast_dir, name = os.path.split(pic)
+        hour_dir, forecast = os.path.split(forecast_dir)
+        day_dir, hour = os.path.split(hour_dir)
+        entries.append((os.path.basename(day_dir), hour, forecast, name))
+    publish_many(entries, path)
+
+
+class Snapshot(NamedTuple):
+    version: int  # catalogue version (see version) the charts were loaded at
+    charts: Mapping[str, Mapping[str, Mapping[str, tuple]]]  # read-only {day: {hour: {forecast: (pics)}}}
+
+
+def freeze(charts: Dict[str, Dict[str, Dict[str, List[str]]]]) -> Mapping[str, Mapping[str, Mapping[str, tuple]]]:
+    """
+    :param charts: nested dict returned by load.
+    :return: read-only view of the catalogue (mappings can not be changed and lists of pictures are tuples).
+    """
+    return MappingProxyType({day: MappingProxyType({hour: MappingProxyType({forecast: tuple(pics)
+                                                                           for forecast, pics in forecasts.items()})
+                                                    for hour, forecasts in hours.items()})
+                             for day, hours in charts.items()})
+
+
+class CatalogueWatcher:
+    """
+    Keeps the newest snapshot of the catalogue for request handlers. A background thread checks modification times
+    and sizes of the catalogue files (watermark) every `interval` seconds; only when they change it reads the
+    catalogue version, and only when the version changes it loads the catalogue. New snapshot replaces the old one
+    in a single assignment, so handlers read `snapshot` without locks and never see a half-updated catalogue.
+    """
+
+    def __init__(self, path: str = CATALOGUE_PATH, interval: float = REFRESH_INTERVAL):
+        if not isinstance(interval, (int, float)):
+            raise TypeError("Interval should be a number!")
+        if interval <= 0:
+            raise ValueError("Interval should be positive!")
+
+        self.path = path
+        self.interval = interval
+        self.snapshot = Snapshot(-1, freeze({}))
+        self.watermark = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def current_watermark(self) -> tuple:
+        """
+        :return: (modification time, size) of the catalogue file and of its WAL journal (None if missing).
+        """
+        watermark = []
+        for path in [self.path, f"{self.path}-wal"]:
+            try:
+                stat = os.stat(path)
+                watermark.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                watermark.append(None)
+        return tuple(watermark)
+
+    def refresh(self) -> bool:
+        """
+        Publishes new snapshot if the catalogue has changed.
+
+        :return: True if a new snapshot was published.
+        """
+        watermark = self.current_watermark()
+        if watermark == self.watermark:
+            return False
+        current_version = version(self.path)
+        published = current_version != self.snapshot.version
+        if published:
+            self.snapshot = Snapshot(current_version, freeze(load(self.path)))
+        # watermark is moved only after the snapshot is published, so a failed load is retried by the next refresh
+        self.watermark = watermark
+        return published
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except sqlite3.Error as e:
+                print(f"Could not refresh catalogue: {e}")
+
+    def start(self):
+        """
+        Loads the catalogue and starts the background thread. Safe to call many times: the thread is started once
+        per process (again after fork, e.g. in preloaded gunicorn workers, as threads do not survive it).
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self.refresh()
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="catalogue-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background thread.
+        """
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join()
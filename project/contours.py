@@ -0,0 +1,144 @@
+import os
+import numpy as np
+
+from matplotlib.collections import Collection, PathCollection
+from matplotlib.contour import ContourSet
+from matplotlib.figure import Figure
+from matplotlib.path import Path
+from typing import List
+
+CONTOURS_DIR = os.path.dirname(__file__) + "/../data/contours"
+KINDS = ["filled", "lines"]
+
+
+def contours_path(date: str, hour: int, forecast: int, chart: str, extent: List[int],
+                  contours_dir: str = CONTOURS_DIR) -> str:
+    """
+    :return: path of the geometry file of a chart of given forecast hour and extent.
+    """
+    name = f"{chart}_{'_'.join(str(value) for value in extent)}.npz"
+    return os.path.join(contours_dir, date, f"{hour:02}z", f"{forecast:03}", name)
+
+
+def _level_paths(contour_set) -> List[List[Path]]:
+    """
+    :return: list of paths of every level of a contour set (matplotlib >= 3.8 keeps one compound path per level,
+             older versions one collection of paths per level).
+    """
+    if isinstance(contour_set, Collection):
+        return [[path] if len(path.vertices) else [] for path in contour_set.get_paths()]
+    return [list(collection.get_paths()) for collection in contour_set.collections]
+
+
+def compute(data: np.ndarray, extent: List[int], levels: np.ndarray) -> dict:
+    """
+    Computes geometry of filled contours (bands between levels, extended below the first and above the last level)
+    and of contour lines of a field. Contouring is the expensive part of drawing a chart, so the geometry is computed
+    once and drawn by every output of the field (see draw_filled, draw_lines).
+
+    :param data: 2D field (usually upsampled), first row is top_lat and first column is left_lon.
+    :param extent: extent of the field as List[int] in format: [left_lon, right_lon, top_lat, bottom_lat]
+    :param levels: contour levels.
+    :return: dict with keys: extent, levels, filled (list of paths of every band) and lines (list of paths of every
+             level), coordinates are longitudes and latitudes.
+    """
+    if not isinstance(extent, list):
+        raise TypeError("Extent should be a type of list of integers!")
+    if len(extent) != 4:
+        raise ValueError("Extent should be a List of four integers!")
+
+    left_lon, right_lon, top_lat, bottom_lat = extent
+    x = np.linspace(left_lon, right_lon, data.shape[1])
+    y = np.linspace(top_lat, bottom_lat, data.shape[0])
+
+    ax = Figure().add_subplot(1, 1, 1)
+    filled = ax.contourf(x, y, data, levels=levels, extend='both')
+    lines = ax.contour(x, y, data, levels=levels)
+    return {"extent": list(extent), "levels": np.asarray(levels, dtype=float),
+            "filled": _level_paths(filled), "lines": _level_paths(lines)}
+
+
+def save(geometry: dict, path: str):
+    """
+    Saves geometry in a compact binary file: vertices (float32) and path codes (uint8) of all paths are concatenated,
+    with offsets of paths and of levels.
+    """
+    arrays = {"extent": np.asarray(geometry["extent"], dtype=float), "levels": geometry["levels"]}
+    for kind in KINDS:
+        paths = [path for level in geometry[kind] for path in level]
+        vertices = [path.vertices for path in paths]
+        codes = [path.codes if path.codes is not None else
+                 np.r_[Path.MOVETO, np.full(len(path.vertices) - 1, Path.LINETO)] for path in paths]
+        arrays[f"{kind}_vertices"] = np.concatenate(vertices).astype(np.float32) if paths else np.empty((0, 2),
+                                                                                                    np.float32)
+        arrays[f"{kind}_codes"] = np.concatenate(codes).astype(np.uint8) if paths else np.empty(0, np.uint8)
+        arrays[f"{kind}_paths"] = np.cumsum([0] + [len(v) for v in vertices])
+        arrays[f"{kind}_levels"] = np.cumsum([0] + [len(level) for level in geometry[kind]])
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load(path: str) -> dict:
+    """
+    Loads geometry saved by save.
+
+    :return: dict in the same format as returned by compute.
+    """
+    with np.load(path) as arrays:
+        geometry = {"extent": [int(value) if float(value).is_integer() else float(value)
+                               for value in arrays["extent"]],
+                    "levels": arrays["levels"]}
+        for kind in KINDS:
+            vertices, codes = arrays[f"{kind}_vertices"], arrays[f"{kind}_codes"]
+            offsets, level_offsets = arrays[f"{kind}_paths"], arrays[f"{kind}_levels"]
+            paths = [Path(vertices[start:end], codes[start:end]) for start, end in zip(offsets[:-1], offsets[1:])]
+            geometry[kind] = [paths[start:end] for start, end in zip(level_offsets[:-1], level_offsets[1:])]
+    return geometry
+
+
+def draw_filled(ax, geometry: dict, facecolors: list, alpha: float = None) -> PathCollection:
+    """
+    Draws filled contours on given axes.
+
+    :param facecolors: colours of bands, one more than levels (bands below the first and above the last level
+                       included).
+    :return: PathCollection of filled contours.
+    """
+    paths, colors = [], []
+    for level_paths, color in zip(geometry["filled"], facecolors):
+        if level_paths:
+            paths.append(Path.make_compound_path(*level_paths))
+            colors.append(color)
+    collection = PathCollection(paths, facecolors=colors, edgecolors='none', linewidths=0, antialiaseds=False,
+                                alpha=alpha, transform=ax.transData)
+    ax.add_collection(collection, autolim=False)
+    return collection
+
+
+def draw_lines(ax, geometry: dict, **kwargs) -> ContourSet:
+    """
+    Draws contour lines on given axes.
+
+    :param kwargs: keyword arguments of ContourSet (e.g. colors, linewidths, alpha).
+    :return: ContourSet (which can be labelled with clabel), or None if there are no lines.
+    """
+    if not any(geometry["lines"]):
+        return None
+    segments, kinds = [], []
+    for level in geometry["lines"]:
+        segments.append([])
+        kinds.append([])
+        for path in level:
+            if path.codes is None:
+                segments[-1].append(path.vertices)
+                kinds[-1].append(None)
+                continue
+            # lines of matplotlib < 3.8 ignore path codes, so compound paths (matplotlib >= 3.8) are split into lines
+            starts = np.flatnonzero(path.codes == Path.MOVETO)[1:]
+            segments[-1] += np.split(path.vertices, starts)
+            kinds[-1] += np.split(path.codes, starts)
+    return ContourSet(ax, geometry["levels"], segments, kinds, **kwargs)
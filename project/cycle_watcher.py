@@ -0,0 +1,180 @@
+import re
+import time
+import requests
+
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Iterator, List, Set, Tuple
+from project import downloader
+
+CYCLE_HOURS = [0, 6, 12, 18]
+RELEASE_DELAY = timedelta(hours=3, minutes=30)  # f000 of a cycle usually appears ~3.5 h after its base time
+EARLY_POLL = timedelta(minutes=15)  # polling starts this long before predicted release
+GIVE_UP_AFTER = timedelta(hours=4)  # forecast hours still missing this long after predicted release are skipped
+POLL_INTERVAL = 60  # [s]
+
+
+def cycle_time(date: str, hour: int) -> datetime:
+    """
+    :param date: given base date as string in format "YYYYMMDD"
+    :param hour: given base hour (UTC) as integer (available: 0, 6, 12, 18)
+    :return: base time of the cycle (naive datetime in UTC).
+    """
+    if type(date) != str:
+        raise TypeError("Date should be a string in format YYYYMMDD!")
+    if type(hour) != int:
+        raise TypeError("Hour should be a type of integer!")
+    if hour not in CYCLE_HOURS:
+        raise ValueError("Hour should be one of integers: 0, 6, 12, 18!")
+
+    return datetime.strptime(date, "%Y%m%d") + timedelta(hours=hour)
+
+
+def release_time(date: str, hour: int) -> datetime:
+    """
+    :return: predicted time (UTC) in which the first forecast file of given cycle is published.
+    """
+    return cycle_time(date, hour) + RELEASE_DELAY
+
+
+def latest_cycle(now: datetime = None) -> Tuple[str, int]:
+    """
+    :param now: current time (UTC), datetime.utcnow() by default.
+    :return: base date (str: "YYYYMMDD") and hour (int) of the newest cycle, which should be already published.
+    """
+    released = (now or datetime.utcnow()) - RELEASE_DELAY
+    hour = max(h for h in CYCLE_HOURS if h <= released.hour)
+    return released.strftime("%Y%m%d"), hour
+
+
+def following_cycle(date: str, hour: int) -> Tuple[str, int]:
+    """
+    :return: base date (str: "YYYYMMDD") and hour (int) of the cycle following given one.
+    """
+    following = cycle_time(date, hour) + timedelta(hours=6)
+    return following.strftime("%Y%m%d"), following.hour
+
+
+def cycle_path(date: str, hour: int) -> str:
+    """
+    Layout of NOMADS GFS directories, shared by the directory listing, the filter endpoint (its `dir` argument) and
+    direct downloads of forecast files.
+
+    :return: path of the directory with files of given cycle, e.g. "/gfs.20201012/06/atmos".
+    """
+    return f"/gfs.{date}/{hour:02}/atmos"
+
+
+def cycle_url(date: str, hour: int, data_url: str) -> str:
+    """
+    :return: address of the directory listing with files of given cycle.
+    """
+    return f"{data_url}{cycle_path(date, hour)}/"
+
+
+def parse_listing(text: str, hour: int) -> Set[int]:
+    """
+    Finds forecast hours available in the directory listing of a cycle. Forecast file counts as available when its
+    .idx inventory is published, which NCEP does after the GRIB file itself is complete.
+
+    :param text: HTML of the directory listing.
+    :param hour: base hour of the cycle.
+    :return: set of available forecast hours.
+    """
+    return {int(forecast) for forecast in re.findall(rf"gfs\.t{hour:02}z\.pgrb2\.0p25\.f(\d{{3}})\.idx\b", text)}
+
+
+class CycleWatcher:
+    """
+    Watches NOMADS for forecast files of a cycle. Polling starts shortly before the predicted release time and uses
+    conditional requests (ETag / Last-Modified), so an unchanged directory listing costs a single 304 response.
+    """
+
+    def __init__(self, data_url: str, session: requests.Session = None, interval: float = POLL_INTERVAL,
+                 clock: Callable[[], datetime] = datetime.utcnow, sleep: Callable[[float], None] = time.sleep):
+        """
+        :param data_url: address of NOMADS GFS data directory.
+        :param session: optional requests.Session (see downloader.make_session).
+        :param interval: number of seconds between polls.
+        :param clock: function returning current time (UTC).
+        :param sleep: function sleeping given number of seconds.
+        """
+        if not isinstance(interval, (int, float)):
+            raise TypeError("Interval should be a number!")
+        if interval <= 0:
+            raise ValueError("Interval should be a positive number!")
+
+        self.data_url = data_url
+        self.session = session or downloader.make_session()
+        self.interval = interval
+        self.clock = clock
+        self.sleep = sleep
+        self.requests = 0
+        self._listings = {}  # url -> (etag, last modified, available forecasts)
+
+    def available(self, date: str, hour: int) -> Set[int]:
+        """
+        Checks which forecast hours of given cycle are published.
+
+        :return: set of available forecast hours (empty if the cycle does not exist yet).
+        """
+        url = cycle_url(date, hour, self.data_url)
+        etag, modified, forecasts = self._listings.get(url, (None, None, set()))
+
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if modified:
+            headers["If-Modified-Since"] = modified
+
+        self.requests += 1
+        try:
+            r = self.session.get(url, headers=headers)
+        except (requests.exceptions.ConnectionError, requests.exceptions.RetryError) as e:
+            print(f"Could not check {url}: {e}")
+            return forecasts
+
+        if r.status_code == 304:
+            return forecasts
+        if r.status_code != 200:
+            return set()
+
+        forecasts = parse_listing(r.text, hour)
+        self._listings[url] = (r.headers.get("ETag"), r.headers.get("Last-Modified"), forecasts)
+        return forecasts
+
+    def wait_for_release(self, date: str, hour: int):
+        """
+        Sleeps until polling window of given cycle is open.
+        """
+        start = release_time(date, hour) - EARLY_POLL
+        seconds = (start - self.clock()).total_seconds()
+        if seconds > 0:
+            print(f"Waiting for {date} {hour:02}z cycle until {start:%Y-%m-%d %H:%M} UTC...")
+            self.sleep(seconds)
+
+    def watch(self, date: str, hour: int, forecasts: Iterable[int]) -> Iterator[List[int]]:
+        """
+        Waits for the release of given cycle and yields forecast hours as soon as they are published. Generator
+        ends when all forecast hours are published or GIVE_UP_AFTER has passed since predicted release time.
+
+        :param date: given base date as string in format "YYYYMMDD"
+        :param hour: given base hour (UTC) as integer (available: 0, 6, 12, 18)
+        :param forecasts: forecast hours to wait for.
+        :return: generator of sorted lists of newly published forecast hours.
+        """
+        wanted = set(forecasts)
+        seen = set()
+        deadline = release_time(date, hour) + GIVE_UP_AFTER
+
+        self.wait_for_release(date, hour)
+        while True:
+            new = sorted((self.available(date, hour) & wanted) - seen)
+            if new:
+                seen.update(new)
+                yield new
+            if seen == wanted:
+                return
+            if self.clock() >= deadline:
+                print(f"Giving up on forecast hours {sorted(wanted - seen)} of {date} {hour:02}z cycle.")
+                return
+            self.sleep(self.interval)
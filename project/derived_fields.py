@@ -0,0 +1,147 @@
+import numpy as np
+
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+ACCUMULATION_PERIOD = 6  # [h], GFS accumulations (e.g. APCP) are reset every 6 hours
+
+
+class Product(NamedTuple):
+    inputs: Tuple[str, ...]  # names of fields (see raw_data_visualization.FIELDS) or other products
+    expression: Callable[..., np.ndarray]  # function of input arrays, time is the last axis of stacked arrays
+    temporal: bool = False  # expression needs the whole time axis, forecast hours are passed as the first argument
+
+
+def wind_speed(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    return np.sqrt(u ** 2 + v ** 2)
+
+
+def wind_direction(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """
+    :return: direction the wind blows from [deg], 0 - north, 90 - east.
+    """
+    return np.mod(270.0 - np.degrees(np.arctan2(v, u)), 360.0)
+
+
+def relative_humidity(temperature: np.ndarray, dew_point: np.ndarray) -> np.ndarray:
+    """
+    :param temperature: ['C]
+    :param dew_point: ['C]
+    :return: relative humidity [%] (from saturation vapour pressures given by Magnus formula).
+    """
+    return np.clip(100.0 * np.exp(17.625 * dew_point / (243.04 + dew_point) -
+                                  17.625 * temperature / (243.04 + temperature)), 0.0, 100.0)
+
+
+def precipitation_rate(forecasts: np.ndarray, accumulation: np.ndarray) -> np.ndarray:
+    """
+    Computes mean precipitation rate between consecutive forecast hours. Accumulation of a forecast hour covers time
+    since the last reset (every ACCUMULATION_PERIOD hours), so the accumulation of the previous forecast hour is
+    subtracted when both hours are in the same period; otherwise the rate is the mean since the reset.
+
+    :param forecasts: forecast hours (time axis).
+    :param accumulation: accumulated precipitation [kg/m^2], time is the last axis.
+    :return: precipitation rate [kg/m^2/h], NaN where it is unknown (e.g. at analysis).
+    """
+    hours = np.asarray(forecasts, dtype=float)
+    reset = np.maximum((hours - 1) // ACCUMULATION_PERIOD * ACCUMULATION_PERIOD, 0)
+    previous = np.r_[-np.inf, hours[:-1]]
+    same_period = previous > reset
+    begin = np.where(same_period, previous, reset)
+
+    earlier = np.concatenate([np.zeros_like(accumulation[..., :1]), accumulation[..., :-1]], axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = (accumulation - np.where(same_period, earlier, 0)) / (hours - begin)
+    return np.where(hours > begin, np.maximum(rate, 0), np.nan)
+
+
+# product name: Product
+PRODUCTS = {
+    "Wind 10m speed": Product(("Wind 10m u", "Wind 10m v"), wind_speed),  # [m/s]
+    "Wind 10m direction": Product(("Wind 10m u", "Wind 10m v"), wind_direction),  # [deg]
+    "Wind 250hPa speed": Product(("Wind 250hPa u", "Wind 250hPa v"), wind_speed),  # [m/s]
+    "Wind 250hPa direction": Product(("Wind 250hPa u", "Wind 250hPa v"), wind_direction),  # [deg]
+    "Pressure sea lvl hPa": Product(("Pressure sea lvl",), lambda pressure: pressure / 100.0),  # [hPa]
+    "Relative humidity 2m": Product(("Temperature 2m", "Dew point 2m"), relative_humidity),  # [%]
+    "Precipitation rate": Product(("Precipitation ground 6h",), precipitation_rate, temporal=True),  # [kg/m^2/h]
+}
+
+
+def register(name: str, inputs: List[str], expression: Callable[..., np.ndarray], temporal: bool = False):
+    """
+    Adds derived product (or changes existing one).
+
+    :param name: product name.
+    :param inputs: names of fields or products the product is computed from.
+    :param expression: function of input arrays (in order of inputs) returning the product, it should work on 2D
+                       fields of one forecast hour as well as on fields stacked along the last (time) axis.
+    :param temporal: expression needs the whole time axis (forecast hours are passed as its first argument).
+    """
+    if type(name) != str:
+        raise TypeError("Product name should be a string!")
+    if not isinstance(inputs, list):
+        raise TypeError("Inputs should be a list of field names!")
+    if not callable(expression):
+        raise TypeError("Expression should be a function!")
+    if not inputs:
+        raise ValueError("Inputs should not be empty!")
+    if name in inputs:
+        raise ValueError("Product can not be computed from itself!")
+
+    PRODUCTS[name] = Product(tuple(inputs), expression, temporal)
+
+
+def inputs(name: str) -> List[str]:
+    """
+    :return: names of fields needed to compute given product (or [name] if it is not a product).
+    """
+    if name not in PRODUCTS:
+        return [name]
+    fields = []
+    for input_name in PRODUCTS[name].inputs:
+        fields += [field for field in inputs(input_name) if field not in fields]
+    return fields
+
+
+def is_temporal(name: str) -> bool:
+    """
+    :return: True if given product (or any product it is computed from) needs the whole time axis.
+    """
+    if name not in PRODUCTS:
+        return False
+    return PRODUCTS[name].temporal or any(is_temporal(input_name) for input_name in PRODUCTS[name].inputs)
+
+
+def evaluate(names: List[str], fields: Dict[str, np.ndarray], forecasts: List[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Computes products from fields. Every product is evaluated once, as vector operations on whole arrays, so fields
+    of all forecast hours of a cycle stacked along the last axis are computed in one call.
+
+    :param names: names of products (names of fields in `fields` are returned as they are).
+    :param fields: dict {field name: np.ndarray}, 2D fields of one forecast hour or fields stacked along time axis.
+    :param forecasts: forecast hours of the time axis (needed by temporal products only).
+    :return: dict {name: np.ndarray}.
+    """
+    if not isinstance(names, list):
+        raise TypeError("Names should be a list of strings!")
+    if not isinstance(fields, dict):
+        raise TypeError("Fields should be a dict of arrays!")
+
+    values = dict(fields)
+
+    def value(name):
+        if name in values:
+            return values[name]
+        if name not in PRODUCTS:
+            raise ValueError(f"Field \"{name}\" is missing!")
+        product = PRODUCTS[name]
+        arguments = [value(input_name) for input_name in product.inputs]
+        if product.temporal:
+            if forecasts is None:
+                raise ValueError(f"Product \"{name}\" needs forecast hours!")
+            if len(forecasts) != arguments[0].shape[-1]:
+                raise ValueError("Forecast hours should match the last axis of fields!")
+            arguments.insert(0, forecasts)
+        values[name] = product.expression(*arguments)
+        return values[name]
+
+    return {name: value(name) for name in names}
@@ -0,0 +1,288 @@
+import os
+import threading
+import time
+import requests
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Callable, Dict, Hashable, Iterable, List, Tuple
+from project import metrics
+
+MAX_WORKERS = 8
+MAX_PER_HOST = 4  # NOMADS blocks clients which open too many connections at once
+RETRIES = 3
+BACKOFF_FACTOR = 1.0  # [s], sleeps 0, 2, 4... seconds between retries
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+CHUNK_SIZE = 1024 * 1024  # [B], downloaded files are written in chunks of this size
+
+STATUS_OK = "ok"
+STATUS_EXISTS = "exists"
+STATUS_MISSING = "missing"
+STATUS_CANCELLED = "cancelled"
+
+
+def make_session(max_per_host: int = MAX_PER_HOST, retries: int = RETRIES,
+                 backoff_factor: float = BACKOFF_FACTOR) -> requests.Session:
+    """
+    Prepares HTTP session shared by all download workers. Connections are kept alive between requests, number of
+    simultaneous connections to one host is limited by the size of connection pool and failed requests are retried
+    with exponential backoff.
+
+    :param max_per_host: maximal number of simultaneous connections to a single host.
+    :param retries: how many times failed request is repeated.
+    :param backoff_factor: base of exponential backoff between retries [s].
+    :return: requests.Session object.
+    """
+
+    if type(max_per_host) != int or type(retries) != int:
+        raise TypeError("Connection limit and retries should be integers!")
+    if max_per_host <= 0:
+        raise ValueError("Connection limit should be a positive integer!")
+    if retries < 0:
+        raise ValueError("Retries should be a non-negative integer!")
+
+    retry = Retry(total=retries, connect=retries, read=retries, status=retries, backoff_factor=backoff_factor,
+                  status_forcelist=RETRY_STATUSES, raise_on_status=False)
+    # pool_block makes a worker wait for a free connection, so pool_maxsize is a hard per-host limit
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_per_host, pool_block=True, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class Progress:
+    """
+    Thread safe progress counter, which prints number of finished jobs, throughput and estimated time of arrival.
+    """
+
+    def __init__(self, total: int, name: str = "Download"):
+        self.total = total
+        self.name = name
+        self.done = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def eta(self) -> float:
+        """
+        :return: estimated number of seconds left (float('inf') if nothing has finished yet).
+        """
+        elapsed = time.monotonic() - self.started
+        if self.done == 0:
+            return float('inf')
+        return elapsed / self.done * (self.total - self.done)
+
+    def update(self, job: str, status: str):
+        """
+        Marks one job as finished and prints progress report.
+
+        :param job: finished job description.
+        :param status: status of finished job.
+        """
+        with self._lock:
+            self.done += 1
+            elapsed = time.monotonic() - self.started
+            eta = self.eta()
+            eta_text = "--:--:--" if eta == float('inf') else time.strftime("%H:%M:%S", time.gmtime(eta))
+            print(f"{self.name} [{self.done}/{self.total}] {job}: {status}, "
+                  f"{self.done / max(elapsed, 1e-9):.2f} files/s, ETA {eta_text}")
+
+
+def download_all(jobs: Iterable[Hashable], fetch: Callable[[Hashable], None], workers: int = MAX_WORKERS,
+                 progress: Progress = None, on_done: Callable[[Hashable, str], None] = None) -> Dict[Hashable, str]:
+    """
+    Runs fetch(job) for every job in a bounded pool of worker threads. Jobs are submitted in order and no more than
+    `workers` of them are in progress at once, so a slow on_done callback holds back the following downloads.
+
+    Per-file semantics are the same as in sequential download: FileExistsError means that file is already
+    downloaded, EOFError means that data is not prepared yet. After the first EOFError no new jobs are started.
+    Any other exception stops starting new jobs and is raised again.
+
+    :param jobs: jobs to be done (e.g. forecast hours).
+    :param fetch: function which downloads single job.
+    :param workers: maximal number of simultaneous jobs.
+    :param progress: optional Progress object, created automatically if not given.
+    :param on_done: optional function called with (job, status) right after each job is finished.
+    :return: dict {job: status}, where status is one of STATUS_OK, STATUS_EXISTS, STATUS_MISSING, STATUS_CANCELLED.
+    """
+
+    if type(workers) != int:
+        raise TypeError("Workers should be an integer!")
+    if workers <= 0:
+        raise ValueError("Workers should be a positive integer!")
+
+    jobs = list(jobs)
+    statuses = {job: STATUS_CANCELLED for job in jobs}
+    if progress is None:
+        progress = Progress(len(jobs))
+
+    pending = iter(jobs)
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit_next():
+            for job in pending:
+                running[executor.submit(fetch, job)] = (job, time.perf_counter())
+                return
+
+        for _ in range(workers):
+            submit_next()
+
+        stop = False
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, started = running.pop(future)
+                try:
+                    future.result()
+                    statuses[job] = STATUS_OK
+                except FileExistsError:
+                    statuses[job] = STATUS_EXISTS
+                except EOFError:
+                    statuses[job] = STATUS_MISSING
+                    stop = True
+                metrics.inc("gfs_downloads_total", status=statuses[job])
+                metrics.observe("gfs_download_seconds", time.perf_counter() - started, status=statuses[job])
+                progress.update(str(job), statuses[job])
+                if on_done is not None:
+                    on_done(job, statuses[job])
+                if not stop:
+                    submit_next()
+
+    return statuses
+
+
+def parse_idx(text: str) -> List[Tuple[int, int, str]]:
+    """
+    Parses GRIB inventory (.idx file), in which every line looks like: "415:18224433:d=2020101206:TMP:2 m above
+    ground:3 hour fcst:".
+
+    :param text: content of .idx file.
+    :return: list of (message number, byte offset, description) tuples.
+    """
+    inventory = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        fields = line.split(":", 2)
+        if len(fields) < 3:
+            raise ValueError(f"Incorrect inventory line: \"{line}\"!")
+        inventory.append((int(fields[0]), int(fields[1]), fields[2]))
+    return inventory
+
+
+def message_ranges(inventory: List[Tuple[int, int, str]], messages: Iterable[int]) -> List[Tuple[int, int]]:
+    """
+    Finds byte ranges of given GRIB messages. Ranges of neighbouring messages are merged.
+
+    :param inventory: parsed inventory (see parse_idx).
+    :param messages: numbers of wanted messages.
+    :return: list of (first byte, last byte) tuples; last byte is None for range reaching end of file.
+    """
+    messages = set(messages)
+    offsets = {number: offset for number, offset, description in inventory}
+    missing = messages - set(offsets.keys())
+    if missing:
+        raise KeyError(f"Messages {sorted(missing)} not found in inventory!")
+
+    ordered = sorted(inventory, key=lambda entry: entry[1])
+    ranges = []
+    for i, (number, offset, description) in enumerate(ordered):
+        if number not in messages:
+            continue
+        end = ordered[i + 1][1] - 1 if i + 1 < len(ordered) else None
+        if ranges and ranges[-1][1] is not None and ranges[-1][1] + 1 == offset:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((offset, end))
+    return ranges
+
+
+def fetch_ranges(session: requests.Session, url: str, ranges: List[Tuple[int, int]], path: str):
+    """
+    Downloads given byte ranges of remote file (HTTP Range requests) and saves them concatenated in one file.
+
+    :param session: requests.Session (see make_session).
+    :param url: address of remote file.
+    :param ranges: list of (first byte, last byte) tuples (see message_ranges).
+    :param path: path of output file.
+    """
+    with open(path, 'wb') as f:
+        for start, end in ranges:
+            r = session.get(url, headers={"Range": f"bytes={start}-{'' if end is None else end}"})
+            if r.status_code != 206:
+                raise EOFError(f"Server did not return requested range of {url} (HTTP {r.status_code}).")
+            f.write(r.content)
+            metrics.inc("gfs_download_bytes_total", len(r.content))
+
+
+def stream_to_file(session: requests.Session, url: str, path: str, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Downloads remote file in chunks, so memory use does not depend on file size. If `path` already holds the
+    beginning of the file (e.g. after a broken download), only the rest of it is requested (HTTP Range); when the
+    server does not support ranges, the file is downloaded again from the beginning.
+
+    :param session: requests.Session (see make_session).
+    :param url: address of remote file.
+    :param path: path of (partial) output file.
+    :param chunk_size: size of written chunks [B].
+    :return: size of the file [B].
+    """
+    offset = os.path.getsize(path) if os.path.isfile(path) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+    with session.get(url, headers=headers, stream=True) as r:
+        if offset and r.status_code == 416:
+            return offset  # nothing left to download
+        if r.status_code not in [200, 206]:
+            raise EOFError(f"Could not download {url} (HTTP {r.status_code}).")
+        if r.status_code == 200:
+            offset = 0
+        with open(path, 'ab' if offset else 'wb') as f:
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                offset += len(chunk)
+                metrics.inc("gfs_download_bytes_total", len(chunk))
+    return offset
+
+
+def validate_grib(path: str, min_messages: int = 1) -> int:
+    """
+    Checks structure of GRIB2 file without decoding it: every message should start with 'GRIB' indicator section of
+    edition 2, which holds message length, and end with '7777'. Only 16 bytes at the beginning and 4 bytes at the end
+    of every message are read.
+
+    :param path: path of GRIB2 file.
+    :param min_messages: minimal number of messages.
+    :return: number of messages.
+    :raises EOFError: if file ends inside a message (download is not complete).
+    :raises ValueError: if file is not a correct GRIB2 file or has too few messages.
+    """
+    size = os.path.getsize(path)
+    count = 0
+    offset = 0
+    with open(path, 'rb') as f:
+        while offset < size:
+            f.seek(offset)
+            header = f.read(16)
+            if len(header) < 16:
+                raise EOFError(f"File ends inside indicator section of message {count + 1}.")
+            if header[:4] != b"GRIB":
+                raise ValueError(f"Message {count + 1} does not start with 'GRIB' (offset {offset}).")
+            if header[7] != 2:
+                raise ValueError(f"Message {count + 1} is not a GRIB2 message (edition {header[7]}).")
+            length = int.from_bytes(header[8:16], 'big')
+            if length < 20:
+                raise ValueError(f"Incorrect length of message {count + 1}: {length}.")
+            if offset + length > size:
+                raise EOFError(f"File ends inside message {count + 1}.")
+            f.seek(offset + length - 4)
+            if f.read(4) != b"7777":
+                raise ValueError(f"Message {count + 1} does not end with '7777' (offset {offset}).")
+            offset += length
+            count += 1
+
+    if count < min_messages:
+        raise ValueError(f"File has {count} messages, at least {min_messages} expected.")
+    return count
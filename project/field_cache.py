@@ -0,0 +1,140 @@
+import os
+import hashlib
+import tempfile
+import numpy as np
+
+from typing import List
+
+CACHE_DIR = os.path.dirname(__file__) + "/../data/fields"
+MAX_CACHE_BYTES = 2 * 1024 ** 3
+RESCAN_PUTS = 1000  # puts after which cache size is counted on disk again (other processes write to the cache too)
+
+
+class FieldCache:
+    """
+    Content-addressed disk cache of decoded GRIB fields. Every field is kept as a float32 .npy file named after the
+    hash of (date, hour, forecast, band, extent) and is loaded memory-mapped. When total size of the cache exceeds
+    max_bytes, least recently used files are removed (file modification time is used as the access time, so the
+    cache can be shared by many processes). Total size is kept in memory and updated by put, so the cache directory
+    is scanned only to evict fields and every RESCAN_PUTS puts (to count fields written by other processes).
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES):
+        if type(directory) != str:
+            raise TypeError("Directory should be a string!")
+        if type(max_bytes) != int:
+            raise TypeError("Cache size should be an integer!")
+        if max_bytes <= 0:
+            raise ValueError("Cache size should be a positive integer!")
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = None  # total size of cached fields, None until counted
+        self._puts = 0
+
+    @staticmethod
+    def key(date: str, hour: int, forecast: int, band: str, extent: List[int]) -> str:
+        """
+        :return: hex digest identifying given field.
+        """
+        text = f"{date}|{hour:02}|{forecast:03}|{band}|{','.join(str(x) for x in extent)}"
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".npy")
+
+    def get(self, date: str, hour: int, forecast: int, band: str, extent: List[int]):
+        """
+        Loads field from cache.
+
+        :return: read-only memory-mapped np.ndarray or None if field is not cached.
+        """
+        path = self.path(self.key(date, hour, forecast, band, extent))
+        try:
+            data = np.load(path, mmap_mode='r')
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, date: str, hour: int, forecast: int, band: str, extent: List[int], data: np.ndarray):
+        """
+        Saves field in cache (as float32) and evicts least recently used fields if cache is too big.
+
+        :return: the saved field, memory-mapped from cache.
+        """
+        path = self.path(self.key(date, hour, forecast, band, extent))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.asarray(data, dtype=np.float32))
+            try:
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._puts += 1
+        if self._bytes is None or self._puts % RESCAN_PUTS == 0:
+            self._bytes = self.size()
+        else:
+            self._bytes += os.path.getsize(path) - replaced
+        if self._bytes > self.max_bytes:
+            self.evict()
+        return np.load(path, mmap_mode='r')
+
+    def size(self) -> int:
+        """
+        :return: total size of cached fields in bytes.
+        """
+        return sum(size for path, size, mtime in self._entries())
+
+    def evict(self):
+        """
+        Removes least recently used fields until cache fits in max_bytes.
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for path, size, mtime in entries)
+        for path, size, mtime in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._bytes = total
+
+    def clear(self):
+        for path, size, mtime in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._bytes = 0
+
+    def _entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for subdir in os.scandir(self.directory):
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir.path):
+                if entry.name.endswith(".npy"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((entry.path, stat.st_size, stat.st_mtime_ns))
+        return entries
@@ -0,0 +1,117 @@
+import os
+import hashlib
+import threading
+
+from collections import OrderedDict
+from PIL import Image
+
+# variant name: width of the picture in pixels
+SIZES = {
+    "small": 720,
+    "medium": 1280,
+}
+FORMATS = ["png", "webp"]
+
+WEBP_QUALITY = 80
+MAX_ETAGS = 4096  # number of file hashes kept in memory
+
+_etags = OrderedDict()  # LRU: path -> (modification time, size, hex digest)
+_etags_lock = threading.Lock()
+_pending = {}  # variant path: lock held by the thread making it
+_pending_lock = threading.Lock()
+
+
+def variant_path(png_path: str, size: str, fmt: str) -> str:
+    """
+    :param png_path: path to full size chart.
+    :param size: one of SIZES keys or "full".
+    :param fmt: one of FORMATS.
+    :return: path of given variant of the chart (full size png is the chart itself).
+    """
+
+    if size != "full" and size not in SIZES:
+        raise ValueError("Size should be one of SIZES keys or \"full\"!")
+    if fmt not in FORMATS:
+        raise ValueError("Format should be one of FORMATS!")
+
+    if size == "full" and fmt == "png":
+        return png_path
+    directory, name = os.path.split(png_path)
+    return os.path.join(directory, "variants", f"{os.path.splitext(name)[0]}.{size}.{fmt}")
+
+
+def make_variant(png_path: str, size: str, fmt: str) -> str:
+    """
+    Makes single variant of a chart (if it does not exist yet). Safe to call from many threads: concurrent requests
+    for the same variant wait for the one thread making it instead of encoding it again.
+
+    :return: path of the variant.
+    """
+    path = variant_path(png_path, size, fmt)
+    if os.path.isfile(path):
+        return path
+
+    with _pending_lock:
+        lock = _pending.setdefault(path, threading.Lock())
+    try:
+        with lock:
+            if not os.path.isfile(path):
+                _encode(png_path, path, size, fmt)
+    finally:
+        with _pending_lock:
+            _pending.pop(path, None)
+    return path
+
+
+def _encode(png_path: str, path: str, size: str, fmt: str):
+    with Image.open(png_path) as image:
+        image = image.convert("RGBA") if fmt == "webp" else image.copy()
+        if size != "full":
+            width = SIZES[size]
+            image.thumbnail((width, round(width * image.height / image.width)), Image.LANCZOS)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if fmt == "webp":
+            image.save(tmp_path, format="WEBP", quality=WEBP_QUALITY, method=4)
+        else:
+            image.save(tmp_path, format="PNG", optimize=True)
+        os.replace(tmp_path, path)
+
+
+def make_variants(png_path: str):
+    """
+    Pre-generates all size and format variants of a chart.
+
+    :param png_path: path to full size chart.
+    """
+    if not os.path.isfile(png_path):
+        raise FileNotFoundError(f"Could not find chart ({png_path}).")
+    for size in list(SIZES.keys()) + ["full"]:
+        for fmt in FORMATS:
+            make_variant(png_path, size, fmt)
+
+
+def file_etag(path: str) -> str:
+    """
+    Strong ETag of a file - hash of its content. Hashes are remembered (LRU of MAX_ETAGS files) as long as file size
+    and modification time do not change, so every file is read only once.
+
+    :param path: path to file.
+    :return: hex digest of file content.
+    """
+    stat = os.stat(path)
+    with _etags_lock:
+        if path in _etags and _etags[path][:2] == (stat.st_mtime_ns, stat.st_size):
+            _etags.move_to_end(path)
+            return _etags[path][2]
+
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+
+    with _etags_lock:
+        _etags[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        _etags.move_to_end(path)
+        while len(_etags) > MAX_ETAGS:
+            _etags.popitem(last=False)
+    return digest
@@ -0,0 +1,292 @@
+import os
+import re
+import glob
+import json
+import math
+import time
+import threading
+
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+METRICS_DIR = os.path.dirname(__file__) + "/../data/metrics"
+
+FLUSH_INTERVAL = 1.0  # [s], how often long-running processes (web workers) save their snapshot, see flush_if_due
+STALE_AFTER = 60.0  # [s], snapshots of finished processes are removed by collect when they are older than this
+
+# upper bounds of histogram buckets [s]
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _key(name: str, labels: dict) -> Tuple[str, tuple]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Registry:
+    """
+    Thread safe store of counters, gauges and histograms of one process. Updates take a lock and change a dict
+    entry, so they are cheap enough for hot paths.
+    """
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}  # key -> [count in bucket 1, ..., count in bucket n, count in +Inf, sum]
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        i = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[i] += 1
+            histogram[-1] += value
+
+    def snapshot(self) -> dict:
+        """
+        :return: JSON serializable copy of all metrics.
+        """
+        with self._lock:
+            return {kind: [[name, list(labels), value if kind != "histograms" else list(value)]
+                           for (name, labels), value in getattr(self, kind).items()]
+                    for kind in ["counters", "gauges", "histograms"]}
+
+    def merge(self, snapshot: dict):
+        """
+        Adds metrics from snapshot of another process: counters and histograms are summed, gauges are overwritten.
+        """
+        with self._lock:
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(tuple(label) for label in labels))
+                self.counters[key] = self.counters.get(key, 0.0) + value
+            for name, labels, value in snapshot["gauges"]:
+                self.gauges[(name, tuple(tuple(label) for label in labels))] = value
+            for name, labels, value in snapshot["histograms"]:
+                key = (name, tuple(tuple(label) for label in labels))
+                histogram = self.histograms.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+                for i, count in enumerate(value):
+                    histogram[i] += count
+
+
+REGISTRY = Registry()
+_role = "process"
+_last_flush = None
+_flush_lock = threading.Lock()
+
+
+def configure(role: str):
+    """
+    Sets name of this process' role (e.g. "pipeline", "render"), used in the name of its snapshot file.
+    """
+    global _role
+    _role = role
+
+
+def inc(name: str, value: float = 1.0, **labels):
+    """
+    Increases counter, e.g. inc("gfs_downloads_total", status="ok").
+    """
+    REGISTRY.inc(name, value, **labels)
+
+
+def set_gauge(name: str, value: float, **labels):
+    """
+    Sets gauge to given value.
+    """
+    REGISTRY.set(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels):
+    """
+    Adds value (usually duration in seconds) to histogram.
+    """
+    REGISTRY.observe(name, value, **labels)
+
+
+@contextmanager
+def span(name: str, **labels):
+    """
+    Measures duration of the block: it is added to "<name>_seconds" histogram and saved in "<name>_last_seconds"
+    gauge, so duration of the latest run (e.g. of the latest cycle) can be read directly.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        REGISTRY.observe(f"{name}_seconds", seconds, **labels)
+        REGISTRY.set(f"{name}_last_seconds", seconds, **labels)
+
+
+def flush(directory: str = METRICS_DIR):
+    """
+    Saves snapshot of this process' metrics, so they can be exported by another process (see collect).
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{_role}-{os.getpid()}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(REGISTRY.snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def flush_if_due(interval: float = FLUSH_INTERVAL, directory: str = METRICS_DIR) -> bool:
+    """
+    Saves snapshot of this process' metrics (see flush) if the last one is older than `interval` seconds. Cheap
+    enough to be called after every request of a web worker.
+
+    :return: True if the snapshot was saved.
+    """
+    global _last_flush
+    now = time.monotonic()
+    with _flush_lock:
+        if _last_flush is not None and now - _last_flush < interval:
+            return False
+        _last_flush = now
+    flush(directory)
+    return True
+
+
+def snapshot_pid(path: str):
+    """
+    :return: pid of the process which saved snapshot "<role>-<pid>.json" (None for merged "<role>.json").
+    """
+    match = re.fullmatch(r".+-(\d+)\.json", os.path.basename(path))
+    return int(match.group(1)) if match else None
+
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def remove_snapshots(roles: List[str], directory: str = METRICS_DIR):
+    """
+    Removes snapshots saved by processes of given roles (e.g. at start of the pipeline).
+    """
+    for role in roles:
+        for path in glob.glob(os.path.join(directory, f"{role}-*.json")) + [os.path.join(directory, f"{role}.json")]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def merge_snapshots(role: str, directory: str = METRICS_DIR):
+    """
+    Merges snapshots of finished processes of given role (e.g. render workers, after their pool is shut down) into
+    one <role>.json file and removes them, so the number of snapshot files does not grow with every worker pool.
+    """
+    merged_path = os.path.join(directory, f"{role}.json")
+    paths = sorted(glob.glob(os.path.join(directory, f"{role}-*.json")), key=os.path.getmtime)
+    if not paths:
+        return
+
+    registry = Registry(REGISTRY.buckets)
+    for path in [merged_path] + paths:
+        try:
+            with open(path) as f:
+                registry.merge(json.load(f))
+        except (FileNotFoundError, ValueError):
+            continue
+
+    tmp_path = f"{merged_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp_path, merged_path)
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def collect(directory: str = METRICS_DIR) -> Registry:
+    """
+    Snapshots of processes which are no longer alive are removed once they are older than STALE_AFTER seconds
+    (render workers' snapshots are merged by merge_snapshots before that), so metrics of old processes are not summed
+    forever.
+
+    :return: Registry with metrics of this process and of snapshots saved by other processes.
+    """
+    registry = Registry(REGISTRY.buckets)
+    own = os.path.join(directory, f"{_role}-{os.getpid()}.json")
+    paths = sorted(glob.glob(os.path.join(directory, "*.json")), key=os.path.getmtime)
+    now = time.time()
+    for path in paths:
+        if path == own:
+            continue
+        pid = snapshot_pid(path)
+        try:
+            if pid is not None and not process_alive(pid) and now - os.path.getmtime(path) > STALE_AFTER:
+                os.remove(path)
+                continue
+        except FileNotFoundError:
+            continue
+        try:
+            with open(path) as f:
+                registry.merge(json.load(f))
+        except (FileNotFoundError, ValueError):
+            continue
+    registry.merge(REGISTRY.snapshot())
+    return registry
+
+
+def _labels(labels: tuple, extra: Dict[str, str] = None) -> str:
+    pairs = list(labels) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = [(k, str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")) for k, v in pairs]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def exposition(registry: Registry) -> str:
+    """
+    :return: metrics in Prometheus text format (version 0.0.4).
+    """
+    lines = []
+    for kind, metric_type in [("counters", "counter"), ("gauges", "gauge")]:
+        metrics = getattr(registry, kind)
+        for name in sorted({name for name, labels in metrics}):
+            lines.append(f"# TYPE {name} {metric_type}")
+            for (metric, labels), value in sorted(metrics.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+    for name in sorted({name for name, labels in registry.histograms}):
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, labels), value in sorted(registry.histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(list(registry.buckets) + [math.inf], value[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels, {'le': _number(bound)})} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+
+    return "\n".join(lines) + "\n"
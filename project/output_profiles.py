@@ -0,0 +1,77 @@
+import os
+
+from typing import NamedTuple
+
+
+class OutputProfile(NamedTuple):
+    dpi: float
+    format: str  # "png", "webp" or "jpeg"
+    quality: int = None  # WebP and JPEG quality (1-100)
+    compress_level: int = None  # PNG (zlib) compression level (0-9)
+
+
+# profile name: output settings; charts of the "standard" profile are served by the web app
+PROFILES = {
+    "preview": OutputProfile(dpi=72, format="webp", quality=70),
+    "standard": OutputProfile(dpi=200, format="png", compress_level=3),
+    "print": OutputProfile(dpi=300, format="png", compress_level=9),
+}
+DEFAULT_PROFILES = ["standard"]
+EXTENSIONS = {"png": "png", "webp": "webp", "jpeg": "jpg"}
+PIL_FORMATS = {"png": "PNG", "webp": "WEBP", "jpeg": "JPEG"}
+
+
+def register(name: str, dpi: float, fmt: str, quality: int = None, compress_level: int = None):
+    """
+    Adds output profile (or changes existing one).
+
+    :param name: profile name (used in output file names).
+    :param dpi: resolution of the chart (200 gives 2160 x 1440 px figure).
+    :param fmt: one of EXTENSIONS keys.
+    :param quality: WebP and JPEG quality (1-100).
+    :param compress_level: PNG compression level (0-9).
+    """
+    if type(name) != str:
+        raise TypeError("Profile name should be a string!")
+    if not isinstance(dpi, (int, float)):
+        raise TypeError("Dpi should be a number!")
+    if not name or "/" in name or "." in name:
+        raise ValueError("Incorrect profile name!")
+    if dpi <= 0:
+        raise ValueError("Dpi should be positive!")
+    if fmt not in EXTENSIONS:
+        raise ValueError("Format should be one of EXTENSIONS keys!")
+    if quality is not None and not 1 <= quality <= 100:
+        raise ValueError("Quality should be in range 1-100!")
+    if compress_level is not None and not 0 <= compress_level <= 9:
+        raise ValueError("Compression level should be in range 0-9!")
+
+    PROFILES[name] = OutputProfile(dpi, fmt, quality, compress_level)
+
+
+def output_path(img_path: str, chart: str, profile: str) -> str:
+    """
+    :param img_path: directory with charts of a forecast hour.
+    :return: path of a chart rendered with given profile (<chart>.png for "standard" profile, which is served by the
+             web app, profiles/<chart>.<profile>.<extension> for other ones).
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown output profile: \"{profile}\"!")
+    if profile == "standard":
+        return os.path.join(img_path, f"{chart}.png")
+    return os.path.join(img_path, "profiles", f"{chart}.{profile}.{EXTENSIONS[PROFILES[profile].format]}")
+
+
+def image_kwargs(profile: str) -> dict:
+    """
+    Charts are encoded with Pillow (matplotlib 3.1 can not save WebP nor set PNG compression level).
+
+    :return: keyword arguments of PIL.Image.Image.save for given profile.
+    """
+    settings = PROFILES[profile]
+    kwargs = {"format": PIL_FORMATS[settings.format], "dpi": (settings.dpi, settings.dpi)}
+    if settings.quality is not None and settings.format != "png":
+        kwargs["quality"] = settings.quality
+    if settings.compress_level is not None and settings.format == "png":
+        kwargs["compress_level"] = settings.compress_level
+    return kwargs
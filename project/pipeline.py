@@ -0,0 +1,132 @@
+import queue
+import threading
+import time
+
+from concurrent.futures import wait
+from datetime import timezone
+from typing import Dict, List, Tuple
+from project import cycle_watcher, downloader, metrics, regions, render_scheduler
+from project import raw_data_visualization as rdv
+
+QUEUE_SIZE = 4  # downloaded files waiting for rendering; when full, downloads are held back
+
+
+def run_cycle(date: str, hour: int, forecasts: List[int] = rdv.FORECAST_HOURS, region_names: List[str] = None,
+              download_workers: int = downloader.MAX_WORKERS, render_workers: int = render_scheduler.RENDER_WORKERS,
+              queue_size: int = QUEUE_SIZE, partial: bool = False, watcher: cycle_watcher.CycleWatcher = None) \
+        -> Tuple[Dict[int, str], List[render_scheduler.RenderResult]]:
+    """
+    Downloads and renders one cycle as a producer/consumer pipeline: every forecast file is queued for rendering
+    (and its charts are published in the catalogue) as soon as it is downloaded, while later forecast hours are
+    still being downloaded. Queue is bounded and a file is taken from it only when a render worker is free, so
+    downloads cannot run far ahead of rendering.
+
+    Without a watcher all forecast files are requested at once. With a watcher every file is requested as soon as
+    the watcher sees it published (see cycle_watcher.CycleWatcher.watch).
+
+    :param date: given base date as string in format "YYYYMMDD"
+    :param hour: given base hour (UTC) as integer (available: 0, 6, 12, 18)
+    :param forecasts: list of forecast hours.
+    :param region_names: names of rendered regions (all registered regions by default, see regions.REGIONS). One
+                         file covering all of them is downloaded for every forecast hour.
+    :param download_workers: number of forecast files downloaded at the same time.
+    :param render_workers: number of render worker processes.
+    :param queue_size: maximal number of downloaded files waiting for rendering.
+    :param partial: flag (boolean) if only bands used by charts should be downloaded.
+    :param watcher: optional CycleWatcher, which waits for the release of forecast files.
+    :return: dict {forecast: download status} and list of RenderResult.
+    """
+
+    if type(queue_size) != int:
+        raise TypeError("Queue size should be an integer!")
+    if queue_size <= 0:
+        raise ValueError("Queue size should be a positive integer!")
+
+    extents = regions.extents(region_names)
+    extent = regions.superset_extent(extents)
+    files = queue.Queue(maxsize=queue_size)
+    statuses = {}
+    errors = []
+    stop = threading.Event()  # set when rendering has ended, remaining downloads are cancelled then
+
+    def on_downloaded(forecast, status):
+        if stop.is_set():
+            # stops download_all from starting new files
+            raise RuntimeError("Rendering has stopped, downloads are cancelled!")
+        if status in [downloader.STATUS_OK, downloader.STATUS_EXISTS]:
+            files.put(forecast)
+
+    def produce():
+        try:
+            batches = [forecasts] if watcher is None else watcher.watch(date, hour, forecasts)
+            with metrics.span("gfs_cycle_download"):
+                for batch in batches:
+                    if stop.is_set():
+                        break
+                    statuses.update(rdv.gfs_download_cycle(date, hour, batch, extent, download_workers,
+                                                           partial=partial, on_done=on_downloaded))
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            files.put(None)
+
+    total = sum(len(rdv.CHARTS if forecast == 0 else rdv.CHARTS_NONZERO) for forecast in forecasts) * len(extents)
+    results = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    first_chart = []
+
+    def on_rendered(future):
+        slots.release()
+        extract_seconds, file_results = future.result()
+        with lock:
+            results.extend(file_results)
+            if not first_chart and any(r.status == render_scheduler.STATUS_OK for r in file_results):
+                first_chart.append(time.perf_counter() - start)
+                metrics.set_gauge("gfs_cycle_first_chart_seconds", first_chart[0])
+                print(f"First chart of {date} {hour:02}z is available after {first_chart[0]:.1f}s.")
+            render_scheduler.report(extract_seconds, file_results, len(results), total)
+        metrics.flush()
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    slots = threading.Semaphore(render_workers)
+    futures = []
+    try:
+        with render_scheduler.make_pool(render_workers, extents) as pool:
+            while True:
+                slots.acquire()
+                forecast = files.get()
+                if forecast is None:
+                    break
+                future = pool.submit(render_scheduler.render_file,
+                                     render_scheduler.file_jobs(date, hour, forecast, region_names))
+                future.add_done_callback(on_rendered)
+                futures.append(future)
+            wait(futures)
+    finally:
+        # if rendering failed (e.g. pool.submit raised BrokenProcessPool), the producer must not download the rest
+        # of the cycle or stay blocked on the full queue
+        stop.set()
+        while producer.is_alive():
+            try:
+                files.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        producer.join()
+    metrics.merge_snapshots("render")
+
+    wall = time.perf_counter() - start
+    render_scheduler.summary(results, wall, render_workers)
+    metrics.observe("gfs_cycle_seconds", wall)
+    metrics.set_gauge("gfs_cycle_last_seconds", wall)
+    metrics.set_gauge("gfs_cycle_base_timestamp", cycle_watcher.cycle_time(date, hour).replace(
+        tzinfo=timezone.utc).timestamp())
+    metrics.flush()
+    if errors:
+        raise errors[0]
+    for future in futures:
+        future.result()
+
+    return statuses, results
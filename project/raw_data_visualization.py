@@ -1,3 +1,4 @@
+import io
 import os
 import re
 import time
@@ -6,50 +7,56 @@ from numpy.core._multiarray_umath import ndarray
 
 os.environ["PROJ_LIB"] = "C:\\Python\\Anaconda\\Library\\share"
 import requests, gdal, csv
+import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
 import pickle
 from mpl_toolkits.basemap import Basemap
-from scipy.ndimage import convolve
-from typing import List
+from typing import Dict, List
 from datetime import datetime, timedelta
+from urllib.parse import quote
+from matplotlib import colors, ticker
+from matplotlib.artist import Artist
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PathCollection
+from matplotlib.contour import ContourSet
+from matplotlib.figure import Figure
+from matplotlib.transforms import Bbox
+from PIL import Image
+from project import band_resolver, contours, cycle_watcher, derived_fields, downloader, field_cache, metrics, \
+    output_profiles, regions, resampling, tiles, timeseries
 
 BASE_DIR = os.path.dirname(__file__) + "/.."
 
-EXTENT_POLAND = [13, 25, 56, 48]
-
-BANDS = {
-    "Wind gust ground": 11,  # [m/s]
-    "Wind 250hPa": [146, 147],
-    # "u-component 250hPa": 146,     # [m/s]
-    # "v-component 250hPa": 147,     # [m/s]
-    "Temperature 2m": 415,  # ['C]
-    "Dew point 2m": 417,  # ['C]
-    "Wind 10m": [420, 421],
-    # "u-component 10m": 420,        # [m/s]
-    # "v-component 10m": 421,        # [m/s]
-    # "Precipitation ground": 424,   # [kg/m^2 s]
-    "LI surface": 432,  # ['C]
-    "CAPE surface": 433,  # [J/kg]
-    "CIN surface": 434,  # [J/kg]
-    "Pressure sea lvl": 520  # [Pa]
-}
-
-BANDS_NONZERO = {
-    "Wind gust ground": 11,  # [m/s]
-    "Wind 250hPa": [149, 150],
-    # "u-component 250hPa": 146,     # [m/s]
-    # "v-component 250hPa": 147,     # [m/s]
-    "Temperature 2m": 435,  # ['C]
-    "Dew point 2m": 437,  # ['C]
-    "Wind 10m": [442, 443],
-    # "u-component 10m": 420,        # [m/s]
-    # "v-component 10m": 421,        # [m/s]
-    "Precipitation ground 6h": 450,  # [kg/m^2 s]
-    "LI surface": 473,  # ['C]
-    "CAPE surface": 474,  # [J/kg]
-    "CIN surface": 475,  # [J/kg]
-    "Pressure sea lvl": 586  # [Pa]
+_BASEMAPS = {}  # basemaps already loaded by this process, keyed by extent
+_BASEMAP_LAYERS = {}  # rasterized coastlines, borders and shapefiles, keyed by extent, size and dpi
+_CHART_FIGURE = None  # figure reused by all charts rendered by this process (see chart_figure)
+
+NOMADS_FILTER_URL = "https://nomads.ncep.noaa.gov/cgi-bin/filter_gfs_0p25.pl"
+NOMADS_DATA_URL = "https://nomads.ncep.noaa.gov/pub/data/nccf/com/gfs/prod"
+
+FIELD_CACHE = field_cache.FieldCache(BASE_DIR + "/data/fields")
+BAND_RESOLVER = band_resolver.BandResolver()
+
+EXTENT_POLAND = regions.REGIONS["poland"]
+UPSAMPLE_FACTOR = 10  # fields are upsampled and smoothed before contouring
+
+# field name: (variable, level, time range) of its GRIB message (see band_resolver). Vector charts (wind) are made
+# of two fields: "<chart> u" and "<chart> v". Time range of statistics is the period of their resets (see
+# band_resolver.forecast_key).
+FIELDS = {
+    "Wind gust ground": ("GUST", "surface", "fcst"),  # [m/s]
+    "Wind 250hPa u": ("UGRD", "250 mb", "fcst"),  # [m/s]
+    "Wind 250hPa v": ("VGRD", "250 mb", "fcst"),  # [m/s]
+    "Temperature 2m": ("TMP", "2 m above ground", "fcst"),  # ['C]
+    "Dew point 2m": ("DPT", "2 m above ground", "fcst"),  # ['C]
+    "Wind 10m u": ("UGRD", "10 m above ground", "fcst"),  # [m/s]
+    "Wind 10m v": ("VGRD", "10 m above ground", "fcst"),  # [m/s]
+    "Precipitation ground 6h": ("APCP", "surface", "acc 6h"),  # [kg/m^2]
+    "LI surface": ("LFTX", "surface", "fcst"),  # ['C]
+    "CAPE surface": ("CAPE", "surface", "fcst"),  # [J/kg]
+    "CIN surface": ("CIN", "surface", "fcst"),  # [J/kg]
+    "Pressure sea lvl": ("PRMSL", "mean sea level", "fcst")  # [Pa]
 }
 
 CHARTS = {
@@ -61,7 +68,8 @@ CHARTS = {
     "LI surface": "LI surface",
     "CAPE surface": "CAPE surface",
     "CIN surface": "CIN surface",
-    "Pressure sea lvl": "Pressure sea lvl"
+    "Pressure sea lvl": "Pressure sea lvl",
+    "Relative humidity 2m": "Relative humidity 2m"
 }
 
 CHARTS_NONZERO = {
@@ -74,7 +82,17 @@ CHARTS_NONZERO = {
     "LI surface": "LI surface",
     "CAPE surface": "CAPE surface",
     "CIN surface": "CIN surface",
-    "Pressure sea lvl": "Pressure sea lvl"
+    "Pressure sea lvl": "Pressure sea lvl",
+    "Relative humidity 2m": "Relative humidity 2m"
+}
+
+# chart name: name of field or derived product (see derived_fields) shown on the chart; charts not listed here show
+# field of the same name
+CHART_PRODUCTS = {
+    "Wind 250hPa": "Wind 250hPa speed",
+    "Wind 10m": "Wind 10m speed",
+    "Pressure sea lvl": "Pressure sea lvl hPa",
+    "Relative humidity 2m": "Relative humidity 2m"
 }
 
 CHARTS_NAMES = {
@@ -87,9 +105,14 @@ CHARTS_NAMES = {
     "LI surface": "Lifted index ['C] \nSurface based",
     "CAPE surface": "Convective available potential energy [J/kg]\nSurface based",
     "CIN surface": "Convective inhibition [J/kg]\nSurface based",
-    "Pressure sea lvl": "Pressure reduced to mean sea level [hPa]"
+    "Pressure sea lvl": "Pressure reduced to mean sea level [hPa]",
+    "Relative humidity 2m": "Relative humidity at 2[m] [%]"
 }
 
+# Fields (keys as in FIELDS) downloaded in partial mode (see gfs_get_partial_data) in addition to fields of charts
+EXTRA_FIELDS = []
+EXTRA_FIELDS_NONZERO = []
+
 FORECAST_HOURS = [0, 3, 6, 9, 12, 15, 18, 21, 24, 27,
                   30, 33, 36, 39, 42, 45, 48, 51, 54, 57,
                   60, 66, 72, 78, 84, 90, 96, 102, 108, 114,
@@ -107,7 +130,8 @@ LEVELS = {
     "LI surface": np.arange(-15, 15, 0.5),  # ['C]
     "CAPE surface": np.arange(100, 4000, 100),  # [J/kg]
     "CIN surface": np.arange(-300, 0, 20),  # [J/kg]
-    "Pressure sea lvl": np.arange(950, 1060, 2)  # [hPa]
+    "Pressure sea lvl": np.arange(950, 1060, 2),  # [hPa]
+    "Relative humidity 2m": np.arange(10, 100, 5)  # [%]
 }
 
 
@@ -132,7 +156,8 @@ def choose_levels(chart: str):
         "LI surface": 'RdBu_r',
         "CAPE surface": 'PuRd',
         "CIN surface": 'BuPu_r',
-        "Pressure sea lvl": 'cool_r'
+        "Pressure sea lvl": 'cool_r',
+        "Relative humidity 2m": 'YlGnBu'
     }
 
     levels: ndarray = LEVELS[chart]
@@ -160,22 +185,23 @@ def gfs_scan_bands(filepath: str):
         csvfile.close()
 
 
-def gfs_download_newest_data(forecasts: List[int] = FORECAST_HOURS, extent: List[int] = EXTENT_POLAND):
+def gfs_find_newest_cycle(session: requests.Session = None, base_url: str = NOMADS_FILTER_URL):
     """
-    Checks if new data is availale on NCEP servers and downloads it.
+    Finds base date and hour of the newest data available on NCEP servers.
 
-    :param forecasts: list of forecast hours to download.
-    :param extent: list of geographical coordinates which are boundaries of forecasted area in format: [left_lon, right_lon, top_lat, bottom_lat].
-    :return: Base date (str: "YYYYMMDD") and hour (int) of new data; flag (boolean) if new data is downloaded completely.
+    :param session: optional requests.Session (see downloader.make_session).
+    :param base_url: address of NOMADS filter endpoint.
+    :return: Base date (str: "YYYYMMDD") and hour (int) of the newest data.
     """
-    url = "https://nomads.ncep.noaa.gov/cgi-bin/filter_gfs_0p25.pl"
+    url = base_url
     regex = r"(?i)\b((?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)(?:[^\s()<>]+|\(([^\s()<>]+|(\([^\s()<>]+\)))*\))+(?:\(([^\s()<>]+|(\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:'\".,<>?«»“”‘’]))"
 
-    print("Getting the newest data...")
     print("Finding date and hour...")
 
+    session = session or downloader.make_session()
+
     try:
-        r = requests.get(url)
+        r = session.get(url)
     except requests.exceptions.ConnectionError:
         raise ConnectionError
 
@@ -183,36 +209,85 @@ def gfs_download_newest_data(forecasts: List[int] = FORECAST_HOURS, extent: List
     url = urls[0][0]
     date = url[-8::]
 
-    r = requests.get(url)
+    r = session.get(url)
     urls = re.findall(regex, r.content.decode('utf-8'))
     hour = int((urls[0][0])[-2::])
 
     print("Found the newest data from: {date}, {hour} UTC.".format(date=date, hour=hour))
+    return date, hour
+
+
+def gfs_download_cycle(date: str, hour: int, forecasts: List[int] = FORECAST_HOURS,
+                       extent: List[int] = EXTENT_POLAND, workers: int = downloader.MAX_WORKERS,
+                       base_url: str = NOMADS_FILTER_URL, partial: bool = False, data_url: str = NOMADS_DATA_URL,
+                       session: requests.Session = None, on_done=None) -> Dict[int, str]:
+    """
+    Downloads forecast files of one cycle concurrently.
+
+    :param date: given base date as string in format "YYYYMMDD"
+    :param hour: given base hour (UTC) as integer (available: 0, 6, 12, 18)
+    :param forecasts: list of forecast hours to download.
+    :param extent: given extent as List[int] in format: [left_lon, right_lon, top_lat, bottom_lat]
+    :param workers: number of forecast files downloaded at the same time.
+    :param base_url: address of NOMADS filter endpoint.
+    :param partial: flag (boolean) if only bands used by charts should be downloaded (see gfs_get_partial_data).
+    :param data_url: address of NOMADS GFS data directory (used in partial mode).
+    :param session: optional requests.Session shared between downloads (see downloader.make_session).
+    :param on_done: optional function called with (forecast, status) as soon as each file is finished.
+    :return: dict {forecast: status} (see downloader.download_all).
+    """
+    session = session or downloader.make_session()
+
+    if partial:
+        def fetch(forecast):
+            gfs_get_partial_data(date, hour, forecast, session=session, base_url=data_url)
+    else:
+        def fetch(forecast):
+            gfs_get_raw_data(date, hour, forecast, extent, session=session, base_url=base_url)
+
+    return downloader.download_all(forecasts, fetch, workers=workers, on_done=on_done)
+
+
+def gfs_download_newest_data(forecasts: List[int] = FORECAST_HOURS, extent: List[int] = EXTENT_POLAND,
+                             workers: int = downloader.MAX_WORKERS, base_url: str = NOMADS_FILTER_URL,
+                             partial: bool = False, data_url: str = NOMADS_DATA_URL):
+    """
+    Checks if new data is availale on NCEP servers and downloads it. Forecast files are downloaded concurrently.
+
+    :param forecasts: list of forecast hours to download.
+    :param extent: list of geographical coordinates which are boundaries of forecasted area in format: [left_lon, right_lon, top_lat, bottom_lat].
+    :param workers: number of forecast files downloaded at the same time.
+    :param base_url: address of NOMADS filter endpoint.
+    :param partial: flag (boolean) if only bands used by charts should be downloaded (see gfs_get_partial_data).
+    :param data_url: address of NOMADS GFS data directory (used in partial mode).
+    :return: Base date (str: "YYYYMMDD") and hour (int) of new data; flag (boolean) if new data is downloaded completely.
+    """
+    print("Getting the newest data...")
+
+    session = downloader.make_session()
+    date, hour = gfs_find_newest_cycle(session, base_url)
 
     path = os.path.join(BASE_DIR, "data/gfs/{}/{:02}z".format(date, hour))
 
-    if os.path.isdir(path) and [int(x[-3:]) for x in os.listdir(path)] == sorted(forecasts):
+    if os.path.isdir(path) and sorted(int(x[-3:]) for x in os.listdir(path)
+                                      if re.fullmatch(r"gfs\.pgrb2\.0p25\.f\d{3}", x)) == sorted(forecasts):
         print("Data is already downloaded!")
         is_new_data = False
 
     else:
         print("Downloading data... It might take some minutes.")
-        is_new_data = True
-
-        for forecast in forecasts:
-            try:
-                gfs_get_raw_data(date, hour, forecast, extent)
-            except EOFError:
-                print("Data is not prepared yet!")
-                is_new_data = False
-                break
-            except FileExistsError:
-                pass
+
+        statuses = gfs_download_cycle(date, hour, forecasts, extent, workers, base_url, partial, data_url, session)
+
+        is_new_data = downloader.STATUS_MISSING not in statuses.values()
+        if not is_new_data:
+            print("Data is not prepared yet!")
 
     return date, hour, is_new_data
 
 
-def gfs_get_raw_data(date: str, hour: int, forecast: int, extent: List[int]):
+def gfs_get_raw_data(date: str, hour: int, forecast: int, extent: List[int], session: requests.Session = None,
+                     base_url: str = NOMADS_FILTER_URL):
     """
     Gets raw GFS data for given date, hour and longitude and latitude extent.
 
@@ -220,6 +295,8 @@ def gfs_get_raw_data(date: str, hour: int, forecast: int, extent: List[int]):
     :param hour: given base hour (UTC) as integer (available: 0, 6, 12, 18)
     :param forecast: given forecast hour as integer (available integers 0-392)
     :param extent: given extent as List[int] in format: [left_lon, right_lon, top_lat, bottom_lat]
+    :param session: optional requests.Session shared between downloads (see downloader.make_session).
+    :param base_url: address of NOMADS filter endpoint.
     """
 
     if type(date) != str:
@@ -252,41 +329,157 @@ def gfs_get_raw_data(date: str, hour: int, forecast: int, extent: List[int]):
         os.makedirs(path)
 
     if os.path.isfile(os.path.join(path, filename)):
-        size = os.path.getsize(os.path.join(path, filename))
-        if size > 10 * 1024:
-            raise FileExistsError("File already downloaded!")
-        else:
-            print("Deleting old file.")
-            os.remove(os.path.join(path, filename))
-
-    url = f"https://nomads.ncep.noaa.gov/cgi-bin/filter_gfs_0p25.pl?file=gfs.t{hour:02}z." \
+        raise FileExistsError("File already downloaded!")
+
+    url = f"{base_url}?file=gfs.t{hour:02}z." \
           f"pgrb2.0p25.f{forecast:03}" \
           f"&all_lev=on&all_var=on&subregion=&leftlon={left_lon}" \
           f"&rightlon={right_lon}&" \
           f"toplat={top_lat}" \
           f"&bottomlat={bottom_lat}&" \
-          f"dir=%2Fgfs.{date}%2F{hour:02}"
+          f"dir={quote(cycle_watcher.cycle_path(date, hour), safe='')}"
 
     print(f"\nTrying to get data from {date} hour {hour:02}, forecast:{forecast:03}...")
     print("URL: " + url)
     print("File {filename} will be saved at {path}".format(filename=filename, path=path))
 
+    # file is written in chunks to a temporary file, which gets its final name only after it is validated;
+    # a broken download is kept and resumed next time
+    tmp_path = os.path.join(path, filename + ".part")
     try:
-        r = requests.get(url)
-    except requests.exceptions.ConnectionError:
+        downloader.stream_to_file(session or requests, url, tmp_path)
+    except requests.exceptions.RequestException:
         raise EOFError
 
-    with open(os.path.join(path, filename), 'wb') as f:
-        f.write(r.content)
-        f.close()
+    try:
+        count = downloader.validate_grib(tmp_path, min_messages=len(needed_fields(forecast)))
+    except EOFError as e:
+        print("File {filename} not downloaded completely: {error}".format(filename=filename, error=e))
+        raise EOFError
+    except ValueError as e:
+        print("File {filename} not downloaded: {error}".format(filename=filename, error=e))
+        os.remove(tmp_path)
+        raise EOFError
 
-    size = os.path.getsize(os.path.join(path, filename))
-    if size > 10 * 1024:
-        print("File {filename} downloaded and saved at {path}.".format(filename=filename, path=path))
-    else:
-        print("File {filename} not downloaded!".format(filename=filename))
+    os.replace(tmp_path, os.path.join(path, filename))
+    print("File {filename} ({count} messages) downloaded and saved at {path}.".format(filename=filename, count=count,
+                                                                                    path=path))
+
+
+def gfs_get_partial_data(date: str, hour: int, forecast: int, session: requests.Session = None,
+                         base_url: str = NOMADS_DATA_URL):
+    """
+    Gets only those GRIB messages of a GFS file, which are used by charts (see needed_fields). Messages are found in
+    the .idx inventory by their (variable, level, time range) and downloaded with HTTP Range requests. Messages cover
+    the whole globe - gfs_extract_fields cuts the extent out of them.
+
+    :param date: given base date as string in format "YYYYMMDD"
+    :param hour: given base hour (UTC) as integer (available: 0, 6, 12, 18)
+    :param forecast: given forecast hour as integer (available integers 0-392)
+    :param session: optional requests.Session shared between downloads (see downloader.make_session).
+    :param base_url: address of NOMADS GFS data directory.
+    """
+
+    if type(date) != str:
+        raise TypeError("Date should be a string in format YYYYMMDD!")
+    if type(hour) != int:
+        raise TypeError("Hour should be a type of integer!")
+    if type(forecast) != int:
+        raise TypeError("Forecast should be a type of integer!")
+
+    if len(date) != 8 or not date.isnumeric():
+        raise ValueError("Date should be a string in format YYYYMMDD!")
+    if hour not in [0, 6, 12, 18]:
+        raise ValueError("Hour should be one of integers: 0, 6, 12, 18!")
+    if forecast not in [num for num in range(0, 393)]:
+        raise ValueError("Forecast should be one of integers in range 0-392!")
+
+    path = os.path.join(BASE_DIR, "data/gfs/{}/{:02}z".format(date, hour))
+    filename = "gfs.pgrb2.0p25.f{:03}".format(forecast)
+
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+    if os.path.isfile(os.path.join(path, filename)):
+        raise FileExistsError("File already downloaded!")
+
+    keys = needed_fields(forecast)
+
+    url = f"{base_url}{cycle_watcher.cycle_path(date, hour)}/gfs.t{hour:02}z.pgrb2.0p25.f{forecast:03}"
+    print(f"\nTrying to get {len(keys)} bands from {date} hour {hour:02}, forecast:{forecast:03}...")
+    print("URL: " + url)
+
+    session = session or requests.Session()
+    try:
+        r = session.get(url + ".idx")
+    except (requests.exceptions.ConnectionError, requests.exceptions.RetryError):
+        raise EOFError
+    if r.status_code != 200:
+        print("Inventory of {filename} not found!".format(filename=filename))
+        raise EOFError
+
+    try:
+        inventory = downloader.parse_idx(r.content.decode('utf-8'))
+        ranges = downloader.message_ranges(inventory, band_resolver.inventory_messages(inventory, keys).values())
+    except (KeyError, ValueError) as e:
+        print("Inventory of {filename} is not complete: {error}".format(filename=filename, error=e))
+        raise EOFError
+
+    tmp_path = os.path.join(path, filename + ".part")
+    try:
+        downloader.fetch_ranges(session, url, ranges, tmp_path)
+        downloader.validate_grib(tmp_path, min_messages=len(keys))
+    except (requests.exceptions.RequestException, EOFError, ValueError) as e:
+        print("File {filename} not downloaded: {error}".format(filename=filename, error=e))
+        if os.path.isfile(tmp_path):
+            os.remove(tmp_path)
         raise EOFError
 
+    os.replace(tmp_path, os.path.join(path, filename))
+    print("File {filename} downloaded and saved at {path}.".format(filename=filename, path=path))
+
+
+def needed_fields(forecast: int) -> List[band_resolver.Key]:
+    """
+    Lists GRIB fields used by charts of given forecast hour (and EXTRA_FIELDS or EXTRA_FIELDS_NONZERO).
+
+    :param forecast: given forecast hour as integer (available integers 0-392)
+    :return: sorted list of (variable, level, time range) keys.
+    """
+    keys = [band_resolver.forecast_key(FIELDS[field], forecast)
+            for field in (EXTRA_FIELDS if forecast == 0 else EXTRA_FIELDS_NONZERO)]
+    for chart in (CHARTS if forecast == 0 else CHARTS_NONZERO):
+        keys += chart_fields(chart, forecast).values()
+    return sorted(set(keys))
+
+
+def extent_window(geotransform: tuple, xsize: int, ysize: int, extent: List[int]) -> List[tuple]:
+    """
+    Helper function to find pixel window of given extent in a raster. Global rasters (0-360 longitude) are wrapped,
+    so an extent crossing 0 meridian gives two windows.
+
+    :param geotransform: GDAL geotransform of the raster.
+    :param xsize: raster width in pixels.
+    :param ysize: raster height in pixels.
+    :param extent: given extent as List[int] in format: [left_lon, right_lon, top_lat, bottom_lat]
+    :return: list of (xoff, yoff, width, height) windows, to be concatenated horizontally.
+    """
+    left_lon, right_lon, top_lat, bottom_lat = extent
+    x0 = int(round((left_lon - geotransform[0]) / geotransform[1] - 0.5))
+    x1 = int(round((right_lon - geotransform[0]) / geotransform[1] - 0.5))
+    y0 = int(round((top_lat - geotransform[3]) / geotransform[5] - 0.5))
+    y1 = int(round((bottom_lat - geotransform[3]) / geotransform[5] - 0.5))
+
+    is_global = abs(xsize * geotransform[1] - 360) < geotransform[1]
+    if is_global:
+        x0, x1 = x0 % xsize, x1 % xsize
+        if x1 < x0:
+            return [(x0, y0, xsize - x0, y1 - y0 + 1), (0, y0, x1 + 1, y1 - y0 + 1)]
+
+    if x0 < 0 or y0 < 0 or x1 >= xsize or y1 >= ysize:
+        raise ValueError("Extent is out of the raster!")
+    return [(x0, y0, x1 - x0 + 1, y1 - y0 + 1)]
+
 
 def matrix_resize(data_in: np.ndarray, factor: int) -> np.ndarray:
     """
@@ -302,18 +495,162 @@ def matrix_resize(data_in: np.ndarray, factor: int) -> np.ndarray:
     if factor <= 0:
         raise ValueError("Factor should be a positive integer!")
 
-    result = np.zeros(np.array(data_in.shape) * factor)
-    for i in range(data_in.shape[0]):
-        for j in range(data_in.shape[1]):
-            result[i * factor:(i + 1) * factor, j * factor:(j + 1) * factor] = data_in[i, j]
+    return resampling.block_upsample(data_in, factor)
+
+
+def chart_fields(chart: str, forecast: int) -> Dict[str, band_resolver.Key]:
+    """
+    Lists GRIB fields needed to build given chart (inputs of its product, see CHART_PRODUCTS). Vector charts (wind)
+    are made of two fields: "<chart> u" and "<chart> v".
+
+    :param chart: chart name
+    :param forecast: given forecast hour as integer (available integers 0-392)
+    :return: dict {field name: (variable, level, time range)}.
+    """
+
+    if chart not in (CHARTS if forecast == 0 else CHARTS_NONZERO).keys():
+        raise ValueError("Chart should be one of CHARTS or CHARTS_NONZERO keys!")
+
+    return {field: band_resolver.forecast_key(FIELDS[field], forecast)
+            for field in derived_fields.inputs(CHART_PRODUCTS.get(chart, chart))}
+
+
+def chart_field(chart: str, fields: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Returns field shown on given chart (see CHART_PRODUCTS). Products of charts are evaluated by gfs_extract_fields
+    once per forecast hour; they are computed here only if they are missing in given fields.
+
+    :param chart: chart name
+    :param fields: fields read by gfs_extract_fields.
+    :return: 2D np.ndarray.
+    """
+    name = CHART_PRODUCTS.get(chart, chart)
+    return derived_fields.evaluate([name], fields)[name]
+
+
+def chart_contours(date: str, hour: int, forecast: int, chart: str, extent: List[int] = EXTENT_POLAND,
+                   fields: Dict[str, np.ndarray] = None, use_cache: bool = True) -> dict:
+    """
+    Returns contour geometry of a chart (see contours.compute). Geometry is computed once per field and saved in
+    data/contours, so all outputs of the chart (regions, sizes) are drawn from it without contouring again.
+
+    :param date: given base date as string in format "YYYYMMDD"
+    :param hour: given base hour (UTC) as integer (available: 0, 6, 12, 18)
+    :param forecast: given forecast hour as integer (available integers 0-392)
+    :param chart: chart name
+    :param extent: given extent as List[int] in format: [left_lon, right_lon, top_lat, bottom_lat]
+    :param fields: fields of given extent read by gfs_extract_fields (read when geometry is not saved yet).
+    :param use_cache: load saved geometry and save computed one.
+    :return: dict with contour geometry.
+    """
+    path = contours.contours_path(date, hour, forecast, chart, extent, contours.CONTOURS_DIR)
+    if use_cache and os.path.isfile(path):
+        return contours.load(path)
 
-    return result
+    if fields is None:
+        fields = gfs_extract_fields(date, hour, forecast, [chart], extent)
+    data = resampling.upsample_smooth(chart_field(chart, fields), UPSAMPLE_FACTOR)
+    geometry = contours.compute(data, extent, choose_levels(chart)[0])
+    if use_cache:
+        contours.save(geometry, path)
+    return geometry
+
+
+def gfs_extract_fields(date: str, hour: int, forecast: int, charts: List[str] = None,
+                       extent: List[int] = EXTENT_POLAND, use_cache: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Reads all bands needed by given charts. Fields are taken from FIELD_CACHE first; GRIB file is opened (once) only
+    if some of them are missing, and decoded fields are saved in cache. Derived products of the charts (see
+    CHART_PRODUCTS) are evaluated once and returned with the fields.
+
+    :param date: given base date as string in format "YYYYMMDD"
+    :param hour: given base hour (UTC) as integer (available: 0, 6, 12, 18)
+    :param forecast: given forecast hour as integer (available integers 0-392)
+    :param charts: list of chart names (all charts available for this forecast hour by default).
+    :param extent: given extent as List[int] in format: [left_lon, right_lon, top_lat, bottom_lat]
+    :param use_cache: flag (boolean) if FIELD_CACHE should be used.
+    :return: dict {field or product name: np.ndarray} (see chart_fields and CHART_PRODUCTS).
+    """
+
+    if charts is None:
+        charts = list(CHARTS.keys()) if forecast == 0 else list(CHARTS_NONZERO.keys())
+
+    bands = {}
+    for chart in charts:
+        bands.update(chart_fields(chart, forecast))
+    products = [CHART_PRODUCTS[chart] for chart in charts if chart in CHART_PRODUCTS]
+
+    fields = {}
+    if use_cache:
+        for field in bands:
+            data = FIELD_CACHE.get(date, hour, forecast, field, extent)
+            if data is not None:
+                fields[field] = data
+        if len(fields) == len(bands):
+            fields.update(derived_fields.evaluate(products, fields))
+            return fields
+
+    filedir = BASE_DIR + f"/data/gfs/{date}/{hour:02}z/"
+    filename = f"gfs.pgrb2.0p25.f{forecast:03}"
+    filepath = filedir + filename
+
+    if not os.path.isfile(filepath):
+        raise FileNotFoundError(f"Could not find particular GRIB file({filename}.")
+
+    print(f"Opening GRIB file: {filename}")
+    grib = gdal.Open(filepath)
+    windows = extent_window(grib.GetGeoTransform(), grib.RasterXSize, grib.RasterYSize, extent)
+    resolved = BAND_RESOLVER.bands(grib, [key for field, key in bands.items() if field not in fields])
+
+    for field, key in bands.items():
+        if field in fields:
+            continue
+        band = resolved[key]
+        print(f"Reading \"{field}\" data.\n" +
+              "Band name:   {name}.\n".format(name=band.GetMetadata()['GRIB_COMMENT']) +
+              "Description: {description}.".format(description=band.GetDescription()))
+        data = np.hstack([band.ReadAsArray(*window) for window in windows]).astype(np.float32)
+        fields[field] = FIELD_CACHE.put(date, hour, forecast, field, extent, data) if use_cache else data
+
+    fields.update(derived_fields.evaluate(products, fields))
+    return fields
+
+
+def gfs_build_cube(date: str, hour: int, forecasts: List[int] = FORECAST_HOURS, extent: List[int] = EXTENT_POLAND,
+                   cubes_dir: str = timeseries.CUBES_DIR) -> str:
+    """
+    Packs all fields of CHARTS_NONZERO of a cycle and derived products computed from them (see
+    derived_fields.PRODUCTS) into time series cube used by point forecasts (see timeseries.write_cube). Fields are
+    read by gfs_extract_fields, so after rendering they come from FIELD_CACHE. Forecast hours without GRIB file are
+    left empty.
+
+    :param date: given base date as string in format "YYYYMMDD"
+    :param hour: given base hour (UTC) as integer (available: 0, 6, 12, 18)
+    :param forecasts: list of forecast hours.
+    :param extent: given extent as List[int] in format: [left_lon, right_lon, top_lat, bottom_lat]
+    :param cubes_dir: directory with cubes.
+    :return: directory of the written cube.
+    """
+    names = []
+    for chart in CHARTS_NONZERO:
+        names += [field for field in chart_fields(chart, 1) if field not in names]
+    products = [product for product in derived_fields.PRODUCTS if set(derived_fields.inputs(product)) <= set(names)]
+
+    def fields_of(forecast):
+        try:
+            return gfs_extract_fields(date, hour, forecast, extent=extent)
+        except FileNotFoundError:
+            return None
+
+    print(f"Building time series cube of {date} {hour:02}z...")
+    return timeseries.write_cube(date, hour, list(forecasts), names, extent, fields_of, cubes_dir, products)
 
 
 def gfs_build_visualization_map(date: str, hour: int, forecast: int, chart: str, extent: List[int] = EXTENT_POLAND,
-                                img_path: str = BASE_DIR + "/data/pics/0"):
+                                img_path: str = BASE_DIR + "/data/pics/0", fields: Dict[str, np.ndarray] = None,
+                                geometry: dict = None, profiles: List[str] = None):
     """
-    Prepares data, makes map with visualization and saves it to file.
+    Prepares data, makes map with visualization and saves it to file (one file per output profile).
 
     :param date: given base date as string in format "YYYYMMDD"
     :param hour: given base hour (UTC) as integer (available: 0, 6, 12, 18)
@@ -321,6 +658,10 @@ def gfs_build_visualization_map(date: str, hour: int, forecast: int, chart: str,
     :param chart: str - name of chart to be visualized (one from CHARTS or CHARTS_NONZERO)
     :param extent: given extent as List[int] in format: [left_lon, right_lon, top_lat, bottom_lat]
     :param img_path: path to directory where map will be saved.
+    :param fields: fields already read by gfs_extract_fields (they are taken from cache or GRIB file if not given).
+    :param geometry: contour geometry of the chart covering given extent (see chart_contours, it is loaded or
+                     computed if not given).
+    :param profiles: names of output profiles to save (see output_profiles, DEFAULT_PROFILES by default).
     """
 
     if type(date) != str:
@@ -335,6 +676,12 @@ def gfs_build_visualization_map(date: str, hour: int, forecast: int, chart: str,
         raise TypeError("Extent should be a type of list of integers!")
     if type(img_path) != str:
         raise TypeError("Path should be a string!")
+    if fields is not None and not isinstance(fields, dict):
+        raise TypeError("Fields should be a dict of arrays!")
+    if geometry is not None and not isinstance(geometry, dict):
+        raise TypeError("Geometry should be a dict!")
+    if profiles is not None and not isinstance(profiles, list):
+        raise TypeError("Profiles should be a list of strings!")
 
     if len(date) != 8 or not date.isnumeric():
         raise ValueError("Date should be a string in format YYYYMMDD!")
@@ -347,52 +694,33 @@ def gfs_build_visualization_map(date: str, hour: int, forecast: int, chart: str,
     if len(extent) != 4:
         raise ValueError("Extent should be a List of four integers!")
 
-    factor = 10
+    factor = UPSAMPLE_FACTOR
 
     left_lon = extent[0]
     right_lon = extent[1]
     top_lat = extent[2]
     bottom_lat = extent[3]
 
-    filedir = BASE_DIR + f"/data/gfs/{date}/{hour:02}z/"
-    filename = f"gfs.pgrb2.0p25.f{forecast:03}"
-    filepath = filedir + filename
-
-    if not os.path.isfile(filepath):
-        raise FileNotFoundError(f"Could not find particular GRIB file({filename}.")
-
-    if os.path.isfile(f"{img_path}/{chart}.png"):
+    if profiles is None:
+        profiles = output_profiles.DEFAULT_PROFILES
+    outputs = {profile: output_profiles.output_path(img_path, chart, profile) for profile in profiles}
+    outputs = {profile: path for profile, path in outputs.items() if not os.path.isfile(path)}
+    if not outputs:
         raise FileExistsError(f"Demanded graph ({chart}.png)already exists.")
 
-    print(f"Opening GRIB file: {filename}")
-    grib = gdal.Open(filepath)
-
-    print(f"Reading \"{chart}\" data.")
-    if chart in ["Wind 250hPa", "Wind 10m"]:
-        data_u = grib.GetRasterBand(BANDS[chart][0]) if forecast is 0 else grib.GetRasterBand(BANDS_NONZERO[chart][0])
-        data_v = grib.GetRasterBand(BANDS[chart][1]) if forecast is 0 else grib.GetRasterBand(BANDS_NONZERO[chart][1])
-        print("Band name:   {name}.\n".format(name=data_u.GetMetadata()['GRIB_COMMENT']) +
-              "Description: {description}.".format(description=data_u.GetDescription()))
-        print("Band name:   {name}.\n".format(name=data_v.GetMetadata()['GRIB_COMMENT']) +
-              "Description: {description}.".format(description=data_v.GetDescription()))
-
-        wind_u = data_u.ReadAsArray() * 1.0
-        wind_v = data_v.ReadAsArray() * 1.0
-        data = np.sqrt(wind_u ** 2 + wind_v ** 2)
-
-        wind_u = convolve(matrix_resize((wind_u / data), factor), np.ones([factor, factor]) / (factor ** 2))
-        wind_v = convolve(matrix_resize((wind_v / data), factor), np.ones([factor, factor]) / (factor ** 2))
-
-    else:
-        data = grib.GetRasterBand(BANDS[chart]) if forecast is 0 else grib.GetRasterBand(BANDS_NONZERO[chart])
-        print("Band name:   {name}.\n".format(name=data.GetMetadata()['GRIB_COMMENT']) +
-              "Description: {description}.".format(description=data.GetDescription()))
+    if fields is None:
+        fields = gfs_extract_fields(date, hour, forecast, [chart], extent)
+    elif not set(chart_fields(chart, forecast).keys()) <= set(fields.keys()):
+        raise ValueError(f"Fields needed by \"{chart}\" chart are missing!")
 
-        data = data.ReadAsArray() * 1.0
-        if chart == "Pressure sea lvl":
-            data = data / 100.0
+    if geometry is None:
+        geometry = chart_contours(date, hour, forecast, chart, extent, fields)
 
-    data = convolve(matrix_resize(data, factor), np.ones([factor, factor]) / (factor ** 2))
+    data = chart_field(chart, fields)
+    if chart in ["Wind 250hPa", "Wind 10m"]:
+        wind_u = resampling.upsample_smooth(fields[f"{chart} u"] / data, factor)
+        wind_v = resampling.upsample_smooth(fields[f"{chart} v"] / data, factor)
+    shape = (data.shape[0] * factor, data.shape[1] * factor)
 
     # # USE FOR MAKE VISUALIZATION OF PARTIALLY PREPARED MAP
     # # ===============================================================================
@@ -408,48 +736,230 @@ def gfs_build_visualization_map(date: str, hour: int, forecast: int, chart: str,
     # # ===============================================================================
 
     # Prepare meshgrid
-    x = np.linspace(left_lon, right_lon, data.shape[1])
-    y = np.linspace(bottom_lat, top_lat, data.shape[0])
+    x = np.linspace(left_lon, right_lon, shape[1])
+    y = np.linspace(bottom_lat, top_lat, shape[0])
     xx, yy = np.meshgrid(x, y)
 
     # Prepare contour levels and colormap
     levels, cmap = choose_levels(chart)
 
-    fig = plt.figure(figsize=(10.8, 7.2), dpi=200)
+    # Reuse figure, map axes and colorbar of this process - only data artists are replaced
+    chart_fig = chart_figure()
+    chart_fig.clear()
+    chart_fig.set_extent(extent)
+    facecolors = chart_fig.set_scale(levels, cmap)
+    ax = chart_fig.ax
 
-    # Prepare map contours
-    bmap = prepare_basemap_pickle(extent)
-    bmap.drawcoastlines(linewidth=1.5)
-    bmap.drawcountries(linewidth=1.5)
-    if extent == EXTENT_POLAND:
-        bmap.readshapefile('../shapefiles/POL_adm1', 'poland', linewidth=1.0)
-
-    # Plot data
-    S1 = plt.contourf(xx[::-1], yy[::-1], data, alpha=0.9, cmap=cmap, levels=levels, extend='both')
-    S2 = plt.contour(xx[::-1], yy[::-1], data, alpha=0.8, colors='black', linewidths=0.3, levels=levels)
-    plt.clabel(S2, inline=0, inline_spacing=0, fontsize=15, fmt='%1.0f', colors='black')
-    plt.colorbar(S1, orientation='vertical', fraction=0.0321, pad=0.005)
+    # Plot data from precomputed contour geometry (bands are coloured the same way as map tiles)
+    chart_fig.add(contours.draw_filled(ax, geometry, facecolors, alpha=0.9))
+    S2 = contours.draw_lines(ax, geometry, alpha=0.8, colors='black', linewidths=0.3)
+    if S2 is not None:
+        chart_fig.add(S2)
+        ax.clabel(S2, inline=0, inline_spacing=0, fontsize=15, fmt='%1.0f', colors='black')
 
     init_date = datetime.strptime(f"{date[:4]}/{date[4:6]}/{date[6:]} {hour:02}:00", '%Y/%m/%d %H:%M')
     valid_date = init_date + timedelta(hours=forecast)
 
-    plt.legend([],
-               title=f"{CHARTS_NAMES[chart]}\ninit:   {init_date.strftime('%Y/%m/%d %H:%M')} UTC\nvalid: {valid_date.strftime('%Y/%m/%d %H:%M')} UTC",
-               loc="upper left")
+    chart_fig.set_title(f"{CHARTS_NAMES[chart]}\ninit:   {init_date.strftime('%Y/%m/%d %H:%M')} UTC\n"
+                        f"valid: {valid_date.strftime('%Y/%m/%d %H:%M')} UTC")
 
     if chart in ["Wind 250hPa", "Wind 10m"]:
-        plt.quiver(xx[::20, ::20], yy[::20, ::20], wind_u[::20, ::20], wind_v[::20, ::20], scale=50, width=0.001)
-    # plt.show()
+        chart_fig.add(ax.quiver(xx[::20, ::20], yy[::20, ::20], wind_u[::20, ::20], wind_v[::20, ::20], scale=50,
+                                width=0.001))
 
-    if not os.path.exists(img_path):
-        os.makedirs(img_path)
-    fig.savefig(f"{img_path}/{chart}.png", bbox_inches='tight')
-    plt.close(fig)
+    for profile, path in outputs.items():
+        chart_fig.save(path, profile)
+
+
+def render_batch(date: str, hour: int, forecast: int, charts: List[str] = None, extent: List[int] = EXTENT_POLAND,
+                 img_path: str = BASE_DIR + "/data/pics/0",
+                 fields: Dict[str, np.ndarray] = None, profiles: List[str] = None) -> Dict[str, Exception]:
+    """
+    Renders many charts of one forecast hour: fields of all charts are read at once and all charts are drawn on the
+    figure of this process (see ChartFigure), so only data artists and title change between frames.
+
+    :param date: given base date as string in format "YYYYMMDD"
+    :param hour: given base hour (UTC) as integer (available: 0, 6, 12, 18)
+    :param forecast: given forecast hour as integer (available integers 0-392)
+    :param charts: list of chart names (all charts available for this forecast hour by default).
+    :param extent: given extent as List[int] in format: [left_lon, right_lon, top_lat, bottom_lat]
+    :param img_path: path to directory where maps will be saved.
+    :param fields: fields already read by gfs_extract_fields (they are taken from cache or GRIB file if not given).
+    :param profiles: names of output profiles to save (see output_profiles, DEFAULT_PROFILES by default).
+    :return: dict {chart: None if it was rendered, otherwise exception raised while rendering it}.
+    """
+    if charts is None:
+        charts = list(CHARTS.keys()) if forecast == 0 else list(CHARTS_NONZERO.keys())
+    if not isinstance(charts, list):
+        raise TypeError("Charts should be a list of strings!")
+
+    if fields is None:
+        fields = gfs_extract_fields(date, hour, forecast, charts, extent)
+
+    results = {}
+    for chart in charts:
+        try:
+            gfs_build_visualization_map(date, hour, forecast, chart, extent, img_path, fields, profiles=profiles)
+            results[chart] = None
+        except Exception as e:
+            results[chart] = e
+    return results
+
+
+class ChartFigure:
+    """
+    Figure shared by all charts rendered by one process. Figure, map axes, colorbar and legend are made once and map
+    contours are added once per extent; every chart only replaces its data artists (filled contours, contour lines
+    with labels, wind vectors), colour scale and title, so the figure layout is not built again for every frame.
+    """
+
+    def __init__(self, figsize: tuple = (10.8, 7.2), dpi: float = 200):
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(self.fig)  # text sizes (e.g. of contour labels) are measured with its cached renderer
+
+        # Prepare map axes (the same way as Basemap does it)
+        self.ax = self.fig.add_subplot(1, 1, 1)
+        self.ax.set_xticks([])
+        self.ax.set_yticks([])
+
+        # colorbar is made for an empty collection with alpha of filled contours (see set_scale)
+        self.scale = None
+        self.mappable = PathCollection([], alpha=0.9, cmap=plt.get_cmap('jet'), norm=colors.Normalize(0, 1))
+        self.mappable.set_array(np.array([0.0, 1.0]))
+        self.colorbar = self.fig.colorbar(self.mappable, ax=self.ax, orientation='vertical', fraction=0.0321,
+                                          pad=0.005, extend='both')
+        self.legend = self.ax.legend([], title=" ", loc="upper left")
+
+        self.extent = None
+        self.basemap = None
+        self.artists = []
+        self.bbox = None  # part of the figure saved to file, computed once per layout (see save)
+
+    def set_extent(self, extent: List[int]):
+        """
+        Sets map extent and puts map contours (rendered once per process and extent) between filled contours and
+        contour lines.
+        """
+        if extent == self.extent:
+            return
+        left_lon, right_lon, top_lat, bottom_lat = extent
+        self.ax.set_xlim(left_lon, right_lon)
+        self.ax.set_ylim(bottom_lat, top_lat)
+        self.ax.set_aspect('equal', adjustable='box')
+
+        self.ax.apply_aspect()
+        self.extent = list(extent)
+        if self.basemap is not None:
+            self.basemap.remove()
+        self.basemap = self.ax.imshow(self.basemap_layer(self.fig.dpi), interpolation='nearest', zorder=1.5,
+                                      extent=(left_lon, right_lon, bottom_lat, top_lat))
+        self.bbox = None
+
+    def basemap_layer(self, dpi: float) -> np.ndarray:
+        """
+        :return: map contours of the current extent rasterized at given dpi, one layer pixel per pixel of map axes
+                 of the chart saved with that dpi (see prepare_basemap_layer).
+        """
+        window = self.ax.get_window_extent()
+        scale = dpi / self.fig.dpi
+        return prepare_basemap_layer(self.extent, int(round(window.width * scale)), int(round(window.height * scale)),
+                                     dpi)
+
+    def set_scale(self, levels: ndarray, cmap: str) -> ndarray:
+        """
+        Sets colour scale of the colorbar: bands between given levels with extend='both', coloured the same way as
+        by contourf (see tiles.band_colors).
+
+        :return: colours of bands (len(levels) + 1 colours, from the lowest band).
+        """
+        key = (tuple(levels), cmap)
+        if key != self.scale:
+            levels = np.asarray(levels, dtype=float)
+            # the same boundaries and values as colorbar of contourf(extend='both') has
+            self.colorbar.boundaries = np.r_[levels[0] - 1, levels, levels[-1] + 1]
+            self.colorbar.values = np.r_[levels[0] - 1, (levels[:-1] + levels[1:]) / 2, levels[-1] + 1]
+            self.mappable.set_cmap(plt.get_cmap(cmap))
+            self.mappable.set_norm(colors.Normalize(levels[0], levels[-1]))
+            self.colorbar.update_normal(self.mappable)
+            self.colorbar.locator = ticker.FixedLocator(levels, nbins=10)
+            self.colorbar.update_ticks()
+            self.scale = key
+            self.bbox = None
+        return tiles.band_colors(levels, cmap)
+
+    def set_title(self, title: str):
+        self.legend.set_title(title)
+
+    def add(self, artist):
+        """
+        Registers data artist of the current chart, which is removed before the next one (see clear).
+        """
+        self.artists.append(artist)
+        return artist
+
+    def clear(self):
+        """
+        Removes data artists of the previous chart.
+        """
+        for artist in self.artists:
+            if isinstance(artist, ContourSet) and not isinstance(artist, Artist):
+                # before matplotlib 3.8 contour set is not an artist, its collections and labels are removed
+                for collection in artist.collections:
+                    collection.remove()
+                for text in artist.labelTexts:
+                    text.remove()
+            else:
+                artist.remove()
+        self.artists = []
+
+    def save(self, path: str, profile: str = "standard"):
+        """
+        Saves chart with settings of given output profile (see output_profiles). Saved part of the figure is the
+        tight bounding box of the map, colorbar and legend, which depends on extent and colour scale, so it is
+        computed once for them instead of drawing the figure twice for every chart (as bbox_inches='tight' does).
+        It is computed again when the legend or contour labels of the chart do not fit in it (e.g. a longer title).
+        """
+        renderer = self.fig.canvas.get_renderer()
+        texts = [self.legend] + [text for artist in self.artists for text in getattr(artist, 'labelTexts', [])]
+        extent = Bbox.union([text.get_window_extent(renderer) for text in texts]).transformed(
+            self.fig.dpi_scale_trans.inverted())
+        if self.bbox is None or extent.x0 < self.bbox.x0 or extent.y0 < self.bbox.y0 or \
+                extent.x1 > self.bbox.x1 or extent.y1 > self.bbox.y1:
+            self.bbox = self.fig.get_tightbbox(renderer).padded(matplotlib.rcParams['savefig.pad_inches'])
+
+        # map contours are rasterized at dpi of the profile, so they are not resampled
+        dpi = output_profiles.PROFILES[profile].dpi
+        self.basemap.set_data(self.basemap_layer(dpi))
+
+        buffer = io.BytesIO()
+        self.fig.savefig(buffer, format='rgba', dpi=dpi, bbox_inches=self.bbox)
+        # the same size as Agg renderer of the saved part of the figure has
+        size = (int(self.bbox.width * dpi), int(self.bbox.height * dpi))
+        image = Image.frombuffer('RGBA', size, buffer.getbuffer(), 'raw', 'RGBA', 0, 1)
+        if output_profiles.PROFILES[profile].format == "jpeg":
+            image = image.convert('RGB')
+
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        # write to a temporary file first, so a half-written chart is never visible under its final name
+        image.save(f"{path}.tmp", **output_profiles.image_kwargs(profile))
+        os.replace(f"{path}.tmp", path)
+
+
+def chart_figure() -> ChartFigure:
+    """
+    :return: ChartFigure of this process (made on first use).
+    """
+    global _CHART_FIGURE
+    if _CHART_FIGURE is None:
+        _CHART_FIGURE = ChartFigure()
+    return _CHART_FIGURE
 
 
 def prepare_basemap_pickle(extent: List[int]):
     """
     Helper function to load base map from a pickle file (or to make new one if not found), to increase speed of gfs_build_visualization_map function.
+    Loaded basemap is kept in memory, so each process unpickles it only once.
 
     :param extent: given extent as List[int] in format: [left_lon, right_lon, top_lat, bottom_lat]
     :return: basemap loaded from pickle file.
@@ -464,6 +974,9 @@ def prepare_basemap_pickle(extent: List[int]):
     top_lat = extent[2]
     bottom_lat = extent[3]
 
+    if tuple(extent) in _BASEMAPS:
+        return _BASEMAPS[tuple(extent)]
+
     filedir = BASE_DIR + "/data/basemaps/"
     filename = filedir + f"bmap_{left_lon}-{right_lon}-{top_lat}-{bottom_lat}.pickle"
 
@@ -474,34 +987,78 @@ def prepare_basemap_pickle(extent: List[int]):
                        projection='cyl', resolution='i')
         pickle.dump(bmap, open(filename, 'wb'), -1)
 
-    return pickle.load(open(filename, 'rb'))
+    _BASEMAPS[tuple(extent)] = pickle.load(open(filename, 'rb'))
+    return _BASEMAPS[tuple(extent)]
+
+
+def prepare_basemap_layer(extent: List[int], width: int, height: int, dpi: float) -> np.ndarray:
+    """
+    Helper function to rasterize static map contours (coastlines, countries and regions' shapefile) into transparent
+    image, which is composited over the data plot. Layer is rendered only once per process for given extent, size
+    and dpi, which saves drawing and reading shapefiles for every chart.
+
+    :param extent: given extent as List[int] in format: [left_lon, right_lon, top_lat, bottom_lat]
+    :param width: width of map area in pixels.
+    :param height: height of map area in pixels.
+    :param dpi: resolution of the chart (line widths are given in points).
+    :return: RGBA image (np.ndarray of uint8, shape: height x width x 4).
+    """
+    if not isinstance(extent, list):
+        raise TypeError("Extent should be a type of list of integers!")
+    if len(extent) != 4:
+        raise ValueError("Extent should be a List of four integers!")
+    if width <= 0 or height <= 0:
+        raise ValueError("Layer size should be positive!")
+
+    key = (tuple(extent), width, height, dpi)
+    if key in _BASEMAP_LAYERS:
+        return _BASEMAP_LAYERS[key]
+
+    fig = plt.figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    fig.patch.set_alpha(0.0)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.patch.set_alpha(0.0)
+
+    bmap = prepare_basemap_pickle(extent)
+    bmap.drawcoastlines(linewidth=1.5, ax=ax)
+    bmap.drawcountries(linewidth=1.5, ax=ax)
+    if extent == EXTENT_POLAND:
+        bmap.readshapefile(BASE_DIR + '/shapefiles/POL_adm1', 'poland', linewidth=1.0, ax=ax)
+
+    ax.set_aspect('auto')
+    ax.set_xlim(extent[0], extent[1])
+    ax.set_ylim(extent[3], extent[2])
+    ax.axis('off')
+
+    fig.canvas.draw()
+    _BASEMAP_LAYERS[key] = np.asarray(fig.canvas.buffer_rgba()).copy()
+    plt.close(fig)
+
+    return _BASEMAP_LAYERS[key]
 
 
 if __name__ == '__main__':
+    from project import animation, pipeline, render_scheduler
+
+    metrics.configure("pipeline")
+    metrics.remove_snapshots(["pipeline", "render"])
+    watcher = cycle_watcher.CycleWatcher(NOMADS_DATA_URL)
+    date, hour = cycle_watcher.latest_cycle()
+
     while True:
-        # 1. Download the newest data from NOAA servers
-        # date, hour, is_new_data = gfs_download_newest_data()
-
-        date = "20201012"
-        hour = 6
-        is_new_data = True
-
-        # 2. Prepare data for each chart, build charts and save .png pics
-        if is_new_data:
-            for forecast in FORECAST_HOURS:
-                charts = CHARTS if forecast is 0 else CHARTS_NONZERO
-                for key in charts:
-                    try:
-                        tempdir = '{dir}/data/pics/{date}/{hour:02}z/{forecast:03}'.format(dir=BASE_DIR, date=date,
-                                                                                           hour=hour,
-                                                                                           forecast=forecast)
-                        gfs_build_visualization_map(date, hour, forecast, key, img_path=tempdir)
-                    except (FileNotFoundError, FileExistsError):
-                        pass
+        # 1. Wait for the cycle to be released, download every forecast file as soon as it is published
+        #    and build its charts (in parallel)
+        statuses, results = pipeline.run_cycle(date, hour, watcher=watcher)
+
+        if any(result.status == render_scheduler.STATUS_OK for result in results):
+            # 2. Build animations and sprite sheets of whole run and time series cube for point forecasts
+            animation.build_cycle_animations(date, f"{hour:02}z")
+            gfs_build_cube(date, hour, extent=regions.superset_extent())
             print('''\n\n
             =======================================================\n
             =================={}==================
             ====== Newest charts are prepared and available! ======\n
             =======================================================\n
             '''.format(datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-        time.sleep(5 * 60)
+
+        date, hour = cycle_watcher.following_cycle(date, hour)
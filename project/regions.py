@@ -0,0 +1,93 @@
+import os
+import numpy as np
+
+from typing import Dict, List
+
+BASE_DIR = os.path.dirname(__file__) + "/.."
+GRID_STEP = 0.25  # [deg], GFS 0p25 grid
+
+# region name: extent in format [left_lon, right_lon, top_lat, bottom_lat]
+REGIONS = {
+    "poland": [13, 25, 56, 48],
+}
+DEFAULT_REGION = "poland"  # charts of the default region are served by the web app
+
+
+def register(name: str, extent: List[int]):
+    """
+    Adds region to the registry. All registered regions are rendered from one download of their common extent.
+
+    :param name: region name (used in output paths).
+    :param extent: given extent as List[int] in format: [left_lon, right_lon, top_lat, bottom_lat]
+    """
+    if type(name) != str:
+        raise TypeError("Region name should be a string!")
+    if not isinstance(extent, list):
+        raise TypeError("Extent should be a type of list of integers!")
+    if not name or "/" in name or ".." in name:
+        raise ValueError("Incorrect region name!")
+    if len(extent) != 4 or extent[0] >= extent[1] or extent[2] <= extent[3]:
+        raise ValueError("Extent should be a List of four integers: [left_lon, right_lon, top_lat, bottom_lat]!")
+
+    REGIONS[name] = extent
+
+
+def extents(names: List[str] = None) -> List[List[int]]:
+    """
+    :param names: region names (all registered regions by default).
+    :return: list of extents of given regions.
+    """
+    return [REGIONS[name] for name in (REGIONS.keys() if names is None else names)]
+
+
+def superset_extent(extent_list: List[List[int]] = None) -> List[int]:
+    """
+    :param extent_list: list of extents (extents of all registered regions by default).
+    :return: the smallest extent containing all given extents.
+    """
+    extent_list = extents() if extent_list is None else extent_list
+    if not extent_list:
+        raise ValueError("At least one extent is needed!")
+    return [min(e[0] for e in extent_list), max(e[1] for e in extent_list),
+            max(e[2] for e in extent_list), min(e[3] for e in extent_list)]
+
+
+def window(superset: List[int], extent: List[int], step: float = GRID_STEP):
+    """
+    Finds part of a field of superset extent, which covers given extent.
+
+    :return: (rows, columns) tuple of slices.
+    """
+    if extent[0] < superset[0] or extent[1] > superset[1] or extent[2] > superset[2] or extent[3] < superset[3]:
+        raise ValueError(f"Extent {extent} is out of {superset} extent!")
+
+    row0 = int(round((superset[2] - extent[2]) / step))
+    row1 = int(round((superset[2] - extent[3]) / step)) + 1
+    col0 = int(round((extent[0] - superset[0]) / step))
+    col1 = int(round((extent[1] - superset[0]) / step)) + 1
+    return slice(row0, row1), slice(col0, col1)
+
+
+def cut(fields: Dict[str, np.ndarray], superset: List[int], extent: List[int]) -> Dict[str, np.ndarray]:
+    """
+    Cuts fields of given extent out of fields of superset extent. Returned arrays are views - no data is copied.
+
+    :param fields: dict {field name: 2D np.ndarray} of superset extent.
+    :return: dict {field name: 2D np.ndarray} of given extent.
+    """
+    if extent == superset:
+        return fields
+    rows, cols = window(superset, extent)
+    return {name: data[rows, cols] for name, data in fields.items()}
+
+
+def pics_dir(name: str) -> str:
+    """
+    :return: directory with charts of given region (data/pics for the default region, which is served by the web
+             app, data/regions/<name>/pics for other ones).
+    """
+    if name not in REGIONS:
+        raise ValueError(f"Unknown region: \"{name}\"!")
+    if name == DEFAULT_REGION:
+        return BASE_DIR + "/data/pics"
+    return BASE_DIR + f"/data/regions/{name}/pics"
@@ -0,0 +1,229 @@
+import os
+import time
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, NamedTuple, Tuple
+from project import catalogue, image_variants, metrics, regions, tiles
+from project import raw_data_visualization as rdv
+
+RENDER_WORKERS = os.cpu_count() or 1
+
+STATUS_OK = "ok"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "failed"
+
+
+class RenderJob(NamedTuple):
+    date: str
+    hour: int
+    forecast: int
+    chart: str
+    extent: List[int]
+    img_path: str
+
+
+class RenderResult(NamedTuple):
+    job: RenderJob
+    status: str
+    seconds: float
+    error: str
+
+
+def file_jobs(date: str, hour: int, forecast: int, region_names: List[str] = None) -> List[RenderJob]:
+    """
+    Lists all charts of one forecast file in all given regions.
+
+    :param date: given base date as string in format "YYYYMMDD"
+    :param hour: given base hour (UTC) as integer (available: 0, 6, 12, 18)
+    :param forecast: given forecast hour as integer (available integers 0-392)
+    :param region_names: names of regions (all registered regions by default, see regions.REGIONS).
+    :return: list of RenderJob.
+    """
+    charts = rdv.CHARTS if forecast == 0 else rdv.CHARTS_NONZERO
+    jobs = []
+    for name in (regions.REGIONS.keys() if region_names is None else region_names):
+        img_path = f"{regions.pics_dir(name)}/{date}/{hour:02}z/{forecast:03}"
+        jobs += [RenderJob(date, hour, forecast, chart, regions.REGIONS[name], img_path) for chart in charts]
+    return jobs
+
+
+def cycle_jobs(date: str, hour: int, forecasts: List[int] = rdv.FORECAST_HOURS,
+               region_names: List[str] = None) -> List[RenderJob]:
+    """
+    Lists all charts of one forecast cycle.
+
+    :param date: given base date as string in format "YYYYMMDD"
+    :param hour: given base hour (UTC) as integer (available: 0, 6, 12, 18)
+    :param forecasts: forecast hours to be rendered.
+    :param region_names: names of regions (all registered regions by default, see regions.REGIONS).
+    :return: list of RenderJob.
+    """
+    jobs = []
+    for forecast in forecasts:
+        jobs += file_jobs(date, hour, forecast, region_names)
+    return jobs
+
+
+def make_pool(workers: int = RENDER_WORKERS, extents: List[List[int]] = None) -> ProcessPoolExecutor:
+    """
+    Prepares pool of render worker processes. Every worker sets up matplotlib and basemaps of given extents once.
+
+    :param workers: number of worker processes.
+    :param extents: extents of charts which will be rendered (extents of all registered regions by default).
+    :return: ProcessPoolExecutor, which runs render_file jobs.
+    """
+    if type(workers) != int:
+        raise TypeError("Workers should be an integer!")
+    if workers <= 0:
+        raise ValueError("Workers should be a positive integer!")
+
+    extents = regions.extents() if extents is None else list(extents)
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(extents,))
+
+
+def _init_worker(extents: List[List[int]]):
+    """
+    Process pool initializer - selects non-interactive matplotlib backend and loads basemaps once per worker.
+    """
+    metrics.configure("render")
+    import matplotlib
+    matplotlib.use("Agg")
+    for extent in extents:
+        rdv.prepare_basemap_pickle(extent)
+
+
+def _publish(jobs: List[RenderJob]):
+    """
+    Adds charts rendered into the default pictures directory to the web app catalogue.
+    """
+    pics_dir = os.path.abspath(catalogue.PICS_DIR)
+    entries = [(job.date, f"{job.hour:02}z", f"{job.forecast:03}", f"{job.chart}.png") for job in jobs
+               if os.path.abspath(os.path.join(job.img_path, "..", "..", "..")) == pics_dir]
+    if entries:
+        catalogue.publish_many(entries)
+
+
+def render_file(jobs: List[RenderJob]) -> Tuple[float, List[RenderResult]]:
+    """
+    Renders all jobs of one forecast file. GRIB file is opened and all needed bands are read only once, for the
+    common extent of all jobs; fields of each job's extent are cut out of them without copying (see regions.cut).
+    Contours of every chart are computed once for the common extent and drawn in all regions (see rdv.chart_contours).
+    Smaller and WebP variants of rendered charts are made, chart fields of the common extent are saved as tile
+    sources (see tiles.write_source) and charts are published in the catalogue.
+
+    :return: time of reading the GRIB file [s] and list of RenderResult.
+    """
+    results = []
+    start = time.perf_counter()
+    todo = [job for job in jobs if not os.path.isfile(f"{job.img_path}/{job.chart}.png")]
+    if not todo:
+        _publish(jobs)
+        return 0.0, [RenderResult(job, STATUS_SKIPPED, 0.0, "Chart already exists.") for job in jobs]
+
+    superset = regions.superset_extent([job.extent for job in jobs])
+    hits, misses = rdv.FIELD_CACHE.hits, rdv.FIELD_CACHE.misses
+    try:
+        fields = rdv.gfs_extract_fields(jobs[0].date, jobs[0].hour, jobs[0].forecast,
+                                        sorted({job.chart for job in todo}), superset)
+    except FileNotFoundError as e:
+        return time.perf_counter() - start, [RenderResult(job, STATUS_SKIPPED, 0.0, str(e)) for job in jobs]
+    except Exception:
+        return time.perf_counter() - start, [RenderResult(job, STATUS_FAILED, 0.0, traceback.format_exc())
+                                             for job in jobs]
+    extract_seconds = time.perf_counter() - start
+    metrics.observe("gfs_decode_seconds", extract_seconds)
+    metrics.inc("gfs_field_cache_requests_total", rdv.FIELD_CACHE.hits - hits, result="hit")
+    metrics.inc("gfs_field_cache_requests_total", rdv.FIELD_CACHE.misses - misses, result="miss")
+
+    rendered = []
+    geometries = {}
+    for job in jobs:
+        start = time.perf_counter()
+        try:
+            if job.chart not in geometries and not os.path.isfile(f"{job.img_path}/{job.chart}.png"):
+                geometries[job.chart] = rdv.chart_contours(job.date, job.hour, job.forecast, job.chart, superset,
+                                                           fields)
+                metrics.observe("gfs_contours_seconds", time.perf_counter() - start, chart=job.chart)
+            rdv.gfs_build_visualization_map(job.date, job.hour, job.forecast, job.chart, extent=job.extent,
+                                            img_path=job.img_path, fields=regions.cut(fields, superset, job.extent),
+                                            geometry=geometries.get(job.chart))
+            status, error = STATUS_OK, ""
+        except (FileNotFoundError, FileExistsError) as e:
+            status, error = STATUS_SKIPPED, str(e)
+        except Exception:
+            status, error = STATUS_FAILED, traceback.format_exc()
+        results.append(RenderResult(job, status, time.perf_counter() - start, error))
+        metrics.inc("gfs_charts_total", status=status)
+        if status == STATUS_OK:
+            metrics.observe("gfs_render_seconds", results[-1].seconds, chart=job.chart)
+        if status == STATUS_OK and job.chart not in rendered:
+            rendered.append(job.chart)
+            tiles.write_source(job.date, job.hour, job.forecast, job.chart, rdv.chart_field(job.chart, fields),
+                               superset, *rdv.choose_levels(job.chart))
+        if os.path.isfile(f"{job.img_path}/{job.chart}.png"):
+            image_variants.make_variants(f"{job.img_path}/{job.chart}.png")
+            _publish([job])
+
+    metrics.flush()
+    return extract_seconds, results
+
+
+def report(extract_seconds: float, file_results: List[RenderResult], done: int, total: int):
+    """
+    Prints timing of one forecast file and of each of its charts.
+
+    :param extract_seconds: time of reading the GRIB file [s].
+    :param file_results: results of the file's charts.
+    :param done: number of charts finished so far (including these ones).
+    :param total: number of all charts.
+    """
+    if file_results:
+        print(f"f{file_results[0].job.forecast:03}: GRIB bands read in {extract_seconds:.2f}s")
+    for i, result in enumerate(file_results):
+        print(f"[{done - len(file_results) + i + 1}/{total}] {result.job.date} {result.job.hour:02}z "
+              f"f{result.job.forecast:03} \"{result.job.chart}\": {result.status} ({result.seconds:.2f}s)")
+        if result.status == STATUS_FAILED:
+            print(result.error)
+
+
+def summary(results: List[RenderResult], wall: float, workers: int):
+    """
+    Prints summary of rendering: wall time, total job time, effective speedup and number of failures.
+    """
+    busy = sum(result.seconds for result in results)
+    failed = [result for result in results if result.status == STATUS_FAILED]
+    print(f"Rendered {len(results)} jobs in {wall:.1f}s on {workers} workers "
+          f"(job time {busy:.1f}s, speedup {busy / max(wall, 1e-9):.1f}x, {len(failed)} failed).")
+
+
+def render_all(jobs: List[RenderJob], workers: int = RENDER_WORKERS) -> List[RenderResult]:
+    """
+    Renders charts in a pool of worker processes. Jobs are grouped by forecast file, so every GRIB file is read once
+    and its fields are shared by all its charts in all regions. Every worker sets up matplotlib and basemaps once and reuses them
+    for all its jobs. Timing of each job and summary are printed.
+
+    :param jobs: list of RenderJob.
+    :param workers: number of worker processes.
+    :return: list of RenderResult in order of completion.
+    """
+
+    extents = []
+    files = {}
+    for job in jobs:
+        if job.extent not in extents:
+            extents.append(job.extent)
+        files.setdefault((job.date, job.hour, job.forecast), []).append(job)
+
+    results = []
+    start = time.perf_counter()
+    with make_pool(workers, extents) as executor:
+        futures = [executor.submit(render_file, jobs_of_file) for jobs_of_file in files.values()]
+        for future in as_completed(futures):
+            extract_seconds, file_results = future.result()
+            results += file_results
+            report(extract_seconds, file_results, len(results), len(jobs))
+    metrics.merge_snapshots("render")
+
+    summary(results, time.perf_counter() - start, workers)
+    return results
@@ -0,0 +1,55 @@
+import numpy as np
+
+from scipy.ndimage import uniform_filter
+
+
+def block_upsample(data_in: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Resizes map/matrix to bigger one by repeating every value in a factor x factor block. Vectorized equivalent of
+    the element by element loop, output is a float array just like before.
+
+    :param data_in: matrix to be resized
+    :param factor: multiplier
+    :return: new matrix (np.array) with size data_in.shape*factor
+    """
+
+    if type(factor) != int:
+        raise TypeError("Factor should be an integer!")
+    if factor <= 0:
+        raise ValueError("Factor should be a positive integer!")
+
+    data_in = np.asarray(data_in, dtype=float)
+    return np.repeat(np.repeat(data_in, factor, axis=0), factor, axis=1)
+
+
+def box_smooth(data: np.ndarray, size: int) -> np.ndarray:
+    """
+    Smooths matrix with a size x size box (mean) filter. Gives the same result as
+    scipy.ndimage.convolve(data, np.ones([size, size]) / size ** 2), but the filter is applied separably with running
+    sums, so the cost per pixel does not depend on size.
+
+    :param data: matrix to be smoothed
+    :param size: edge of the box
+    :return: smoothed matrix (np.array) with the same shape as data.
+    """
+
+    if type(size) != int:
+        raise TypeError("Size should be an integer!")
+    if size <= 0:
+        raise ValueError("Size should be a positive integer!")
+
+    # convolve flips its kernel, which for an even box moves its centre by one sample
+    origin = -1 if size % 2 == 0 else 0
+    return uniform_filter(np.asarray(data, dtype=float), size=size, mode='reflect', origin=origin)
+
+
+def upsample_smooth(data_in: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Upsamples matrix by given factor and smooths block edges with a box of the same size - replacement for
+    convolve(matrix_resize(data, factor), np.ones([factor, factor]) / factor ** 2).
+
+    :param data_in: matrix to be resized
+    :param factor: multiplier
+    :return: new matrix (np.array) with size data_in.shape*factor
+    """
+    return box_smooth(block_upsample(data_in, factor), factor)
@@ -0,0 +1,193 @@
+import io
+import os
+import json
+import math
+import shutil
+import threading
+import numpy as np
+import matplotlib.pyplot as plt
+
+from collections import OrderedDict
+from matplotlib import colors
+from PIL import Image
+from typing import List
+from project import metrics
+
+TILES_DIR = os.path.dirname(__file__) + "/../data/tiles"
+TILE_SIZE = 256  # [px]
+MAX_ZOOM = 12
+MEMORY_TILES = 1024  # number of tiles kept in memory
+ALPHA = 0.9  # the same as alpha of filled contours on full-frame charts
+
+_memory = OrderedDict()  # LRU: tile path -> PNG bytes
+_memory_lock = threading.Lock()
+_empty_tile = None
+
+
+def source_dir(date: str, hour: int, forecast: int, tiles_dir: str = TILES_DIR) -> str:
+    """
+    :return: directory with tile sources and cached tiles of given forecast hour.
+    """
+    return os.path.join(tiles_dir, date, f"{hour:02}z", f"{forecast:03}")
+
+
+def write_source(date: str, hour: int, forecast: int, chart: str, data: np.ndarray, extent: List[int],
+                 levels: np.ndarray, cmap: str, tiles_dir: str = TILES_DIR):
+    """
+    Saves decoded field of a chart (e.g. wind speed, pressure in hPa) with its levels and colormap (see
+    raw_data_visualization.choose_levels), from which tiles are rendered on demand. Cached tiles of the chart are
+    removed.
+
+    :param data: 2D field on 0.25 degree grid, first row is top_lat and first column is left_lon.
+    :param extent: extent of the field as List[int] in format: [left_lon, right_lon, top_lat, bottom_lat]
+    :param levels: contour levels of the chart.
+    :param cmap: name of matplotlib colormap.
+    """
+    if not isinstance(extent, list):
+        raise TypeError("Extent should be a type of list of integers!")
+    if len(extent) != 4:
+        raise ValueError("Extent should be a List of four integers!")
+
+    directory = source_dir(date, hour, forecast, tiles_dir)
+    os.makedirs(directory, exist_ok=True)
+
+    tmp_path = os.path.join(directory, f"{chart}.npy.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.asarray(data, dtype=np.float32))
+    os.replace(tmp_path, os.path.join(directory, f"{chart}.npy"))
+
+    meta = {"extent": extent, "levels": [float(level) for level in levels], "cmap": cmap}
+    tmp_path = os.path.join(directory, f"{chart}.json.{os.getpid()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(directory, f"{chart}.json"))
+
+    shutil.rmtree(os.path.join(directory, chart), ignore_errors=True)
+    with _memory_lock:
+        for path in [path for path in _memory if path.startswith(os.path.join(directory, chart, ""))]:
+            del _memory[path]
+
+
+def tile_lonlat(z: int, x: int, y: int, size: int = TILE_SIZE):
+    """
+    :return: longitudes (1D, of pixel columns) and latitudes (1D, of pixel rows) of pixel centres of a Web Mercator
+             tile.
+    """
+    n = 2 ** z
+    lon = (x + (np.arange(size) + 0.5) / size) / n * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(math.pi * (1 - 2 * (y + (np.arange(size) + 0.5) / size) / n))))
+    return lon, lat
+
+
+def band_colors(levels: List[float], cmap: str, bytes: bool = False) -> np.ndarray:
+    """
+    Colours of filled contour bands, the same as contourf(levels=levels, extend='both') gives: every band is coloured
+    by its middle value, normalized linearly between the first and the last level (bands below the first and above
+    the last level get the colours of the ends of the colormap).
+
+    :return: RGBA np.ndarray with one colour per band (len(levels) + 1 colours, from the lowest band).
+    """
+    levels = np.asarray(levels, dtype=float)
+    values = np.r_[levels[0] - 1, (levels[:-1] + levels[1:]) / 2, levels[-1] + 1]
+    return plt.get_cmap(cmap)(colors.Normalize(levels[0], levels[-1])(values), bytes=bytes)
+
+
+def render_tile(data: np.ndarray, extent: List[int], levels: List[float], cmap: str, z: int, x: int, y: int,
+                size: int = TILE_SIZE) -> np.ndarray:
+    """
+    Renders single tile: field is interpolated bilinearly to tile pixels and coloured with the same discrete
+    colours as filled contours of full-frame charts (see band_colors).
+
+    :return: RGBA np.ndarray of uint8 (size x size x 4), transparent outside the field.
+    """
+    left_lon, right_lon, top_lat, bottom_lat = extent
+    step = (top_lat - bottom_lat) / (data.shape[0] - 1)
+    lon, lat = tile_lonlat(z, x, y, size)
+    cols = (lon - left_lon) / step
+    rows = (top_lat - lat) / step
+
+    inside = (rows[:, None] >= 0) & (rows[:, None] <= data.shape[0] - 1) & \
+             (cols[None, :] >= 0) & (cols[None, :] <= data.shape[1] - 1)
+    if not inside.any():
+        return np.zeros((size, size, 4), dtype=np.uint8)
+
+    r = np.clip(rows, 0, data.shape[0] - 1)
+    c = np.clip(cols, 0, data.shape[1] - 1)
+    r0 = np.minimum(r.astype(int), data.shape[0] - 2)
+    c0 = np.minimum(c.astype(int), data.shape[1] - 2)
+    fr = (r - r0)[:, None]
+    fc = (c - c0)[None, :]
+    values = data[r0][:, c0] * (1 - fr) * (1 - fc) + data[r0 + 1][:, c0] * fr * (1 - fc) + \
+             data[r0][:, c0 + 1] * (1 - fr) * fc + data[r0 + 1][:, c0 + 1] * fr * fc
+
+    rgba = band_colors(levels, cmap, bytes=True)[np.digitize(values, levels)]
+    rgba[..., 3] = np.where(inside & ~np.isnan(values), round(ALPHA * 255), 0)
+    return rgba
+
+
+def _png(rgba: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(rgba, "RGBA").save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def empty_tile() -> bytes:
+    """
+    :return: fully transparent tile (PNG bytes), shared by all tiles outside forecast extent.
+    """
+    global _empty_tile
+    if _empty_tile is None:
+        _empty_tile = _png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+    return _empty_tile
+
+
+def get_tile(date: str, hour: int, forecast: int, chart: str, z: int, x: int, y: int,
+             tiles_dir: str = TILES_DIR) -> bytes:
+    """
+    Returns tile of a chart as PNG bytes. Tiles are looked up in memory (LRU of MEMORY_TILES tiles), then on disk and
+    rendered from the tile source only when they are not cached.
+
+    :return: PNG bytes.
+    """
+    if type(z) != int or type(x) != int or type(y) != int:
+        raise TypeError("Tile coordinates should be integers!")
+    if not 0 <= z <= MAX_ZOOM or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+        raise ValueError("Incorrect tile coordinates!")
+
+    directory = source_dir(date, hour, forecast, tiles_dir)
+    path = os.path.join(directory, chart, str(z), str(x), f"{y}.png")
+
+    with _memory_lock:
+        if path in _memory:
+            _memory.move_to_end(path)
+            metrics.inc("gfs_tile_requests_total", source="memory")
+            return _memory[path]
+
+    if os.path.isfile(path):
+        with open(path, 'rb') as f:
+            tile = f.read()
+        metrics.inc("gfs_tile_requests_total", source="disk")
+    else:
+        try:
+            with open(os.path.join(directory, f"{chart}.json")) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Could not find tile source of \"{chart}\" ({date} {hour:02}z {forecast:03}).")
+        data = np.load(os.path.join(directory, f"{chart}.npy"), mmap_mode='r')
+        rgba = render_tile(data, meta["extent"], meta["levels"], meta["cmap"], z, x, y)
+        if not rgba[..., 3].any():
+            metrics.inc("gfs_tile_requests_total", source="empty")
+            return empty_tile()
+        tile = _png(rgba)
+        metrics.inc("gfs_tile_requests_total", source="render")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(tile)
+        os.replace(tmp_path, path)
+
+    with _memory_lock:
+        _memory[path] = tile
+        while len(_memory) > MEMORY_TILES:
+            _memory.popitem(last=False)
+    return tile
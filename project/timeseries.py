@@ -0,0 +1,193 @@
+import os
+import glob
+import json
+import numpy as np
+
+from datetime import datetime, timedelta
+from matplotlib.figure import Figure
+from typing import Callable, Dict, List, Tuple
+
+from project import derived_fields
+
+CUBES_DIR = os.path.dirname(__file__) + "/../data/cubes"
+GRID_STEP = 0.25  # [deg], GFS 0p25 grid
+
+
+def cube_dir(date: str, hour: int, cubes_dir: str = CUBES_DIR) -> str:
+    """
+    :return: directory with the cube of given cycle.
+    """
+    return os.path.join(cubes_dir, date, f"{hour:02}z")
+
+
+def write_cube(date: str, hour: int, forecasts: List[int], names: List[str], extent: List[int],
+               fields_of: Callable[[int], Dict[str, np.ndarray]], cubes_dir: str = CUBES_DIR,
+               products: List[str] = None) -> str:
+    """
+    Packs fields of all forecast hours of a cycle into one float32 array of shape (lat, lon, field, time), saved as
+    cube.npy together with index.json. Time is the innermost axis, so whole time series of every field in a grid
+    point is one contiguous read (chunks of the (time, lat, lon) cube are whole time series of single points).
+    Derived products are evaluated once for the whole cycle, on fields stacked along the time axis, and packed after
+    the fields.
+
+    :param date: given base date as string in format "YYYYMMDD"
+    :param hour: given base hour (UTC) as integer (available: 0, 6, 12, 18)
+    :param forecasts: list of forecast hours (time axis of the cube).
+    :param names: list of field names (field axis of the cube).
+    :param extent: extent of fields as List[int] in format: [left_lon, right_lon, top_lat, bottom_lat]
+    :param fields_of: function returning dict {field name: 2D np.ndarray} of given forecast hour, or None if the
+                      forecast file is not available. Fields missing in some forecast hours are filled with NaN.
+    :param cubes_dir: directory with cubes.
+    :param products: list of derived_fields.PRODUCTS computed from the fields.
+    :return: directory of the written cube.
+    """
+
+    products = products or []
+    if not isinstance(forecasts, list) or not isinstance(names, list) or not isinstance(products, list):
+        raise TypeError("Forecasts, field names and products should be lists!")
+    if not forecasts or not names:
+        raise ValueError("Forecasts and field names should not be empty!")
+    if not isinstance(extent, list):
+        raise TypeError("Extent should be a type of list of integers!")
+    if len(extent) != 4:
+        raise ValueError("Extent should be a List of four integers!")
+    for product in products:
+        if product not in derived_fields.PRODUCTS or not set(derived_fields.inputs(product)) <= set(names):
+            raise ValueError(f"Product \"{product}\" can not be computed from given fields!")
+
+    directory = cube_dir(date, hour, cubes_dir)
+    os.makedirs(directory, exist_ok=True)
+    cube_path = os.path.join(directory, "cube.npy")
+    tmp_path = f"{cube_path}.{os.getpid()}.tmp"
+
+    cube = None
+    for t, forecast in enumerate(forecasts):
+        fields = fields_of(forecast)
+        if not fields:
+            continue
+        if cube is None:
+            shape = next(iter(fields.values())).shape
+            cube = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                             shape=(shape[0], shape[1], len(names) + len(products), len(forecasts)))
+            cube[:] = np.nan
+        for f, name in enumerate(names):
+            if name in fields:
+                cube[:, :, f, t] = fields[name]
+
+    if cube is None:
+        raise FileNotFoundError(f"Could not find any fields of {date} {hour:02}z cycle.")
+    if products:
+        stacked = {name: np.asarray(cube[:, :, f, :]) for f, name in enumerate(names)}
+        derived = derived_fields.evaluate(products, stacked, forecasts)
+        for f, product in enumerate(products, len(names)):
+            cube[:, :, f, :] = derived[product]
+    cube.flush()
+    del cube
+    os.replace(tmp_path, cube_path)
+
+    index = {"date": date, "hour": hour, "extent": extent, "step": GRID_STEP, "forecasts": forecasts,
+             "fields": names + products}
+    tmp_path = os.path.join(directory, f"index.json.{os.getpid()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, os.path.join(directory, "index.json"))
+    return directory
+
+
+def latest_cube(cubes_dir: str = CUBES_DIR) -> Tuple[str, int]:
+    """
+    :return: base date (str: "YYYYMMDD") and hour (int) of the newest cycle with a cube, or None if there is none.
+    """
+    indexes = sorted(glob.glob(os.path.join(cubes_dir, "*", "*z", "index.json")))
+    if not indexes:
+        return None
+    hour_dir = os.path.dirname(indexes[-1])
+    return os.path.basename(os.path.dirname(hour_dir)), int(os.path.basename(hour_dir)[:-1])
+
+
+def point_series(date: str, hour: int, lat: float, lon: float, cubes_dir: str = CUBES_DIR) -> dict:
+    """
+    Reads time series of all fields in grid point nearest to given coordinates.
+
+    :param date: given base date as string in format "YYYYMMDD"
+    :param hour: given base hour (UTC) as integer (available: 0, 6, 12, 18)
+    :param lat: latitude [deg].
+    :param lon: longitude [deg].
+    :param cubes_dir: directory with cubes.
+    :return: dict with keys: date, hour, lat and lon (of the grid point), forecasts, valid (ISO times in UTC) and
+             fields ({field name: list of values, None where data is missing}).
+    """
+
+    if not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
+        raise TypeError("Latitude and longitude should be numbers!")
+
+    directory = cube_dir(date, hour, cubes_dir)
+    try:
+        with open(os.path.join(directory, "index.json")) as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Could not find cube of {date} {hour:02}z cycle.")
+    cube = np.load(os.path.join(directory, "cube.npy"), mmap_mode='r')
+
+    left_lon, right_lon, top_lat, bottom_lat = index["extent"]
+    step = index["step"]
+    row = int(round((top_lat - lat) / step))
+    col = int(round((lon - left_lon) / step))
+    if not (0 <= row < cube.shape[0] and 0 <= col < cube.shape[1]):
+        raise ValueError(f"Point ({lat}, {lon}) is out of forecast extent!")
+
+    series = np.array(cube[row, col])
+    base = datetime.strptime(date, "%Y%m%d") + timedelta(hours=hour)
+    return {
+        "date": date,
+        "hour": hour,
+        "lat": top_lat - row * step,
+        "lon": left_lon + col * step,
+        "forecasts": index["forecasts"],
+        "valid": [(base + timedelta(hours=forecast)).strftime("%Y-%m-%dT%H:%MZ") for forecast in index["forecasts"]],
+        "fields": {name: [None if np.isnan(value) else round(float(value), 2) for value in series[f]]
+                   for f, name in enumerate(index["fields"])},
+    }
+
+
+def _values(series: dict, name: str) -> np.ndarray:
+    values = series["fields"].get(name)
+    if values is None:
+        return np.full(len(series["forecasts"]), np.nan)
+    return np.array([np.nan if value is None else value for value in values], dtype=float)
+
+
+def build_meteogram(series: dict, path: str):
+    """
+    Draws meteogram (temperature and dew point, wind, precipitation and pressure) of a point and saves it as PNG.
+
+    :param series: time series of a point (see point_series).
+    :param path: path of output file.
+    """
+    times = [datetime.strptime(valid, "%Y-%m-%dT%H:%MZ") for valid in series["valid"]]
+
+    fig = Figure(figsize=(10.8, 9.0), dpi=100)
+    axes = fig.subplots(4, 1, sharex=True)
+
+    axes[0].plot(times, _values(series, "Temperature 2m"), color='tab:red', label="Temperature 2m ['C]")
+    axes[0].plot(times, _values(series, "Dew point 2m"), color='tab:green', label="Dew point 2m ['C]")
+
+    axes[1].plot(times, _values(series, "Wind 10m speed"), color='tab:blue', label="Wind 10m [m/s]")
+    axes[1].plot(times, _values(series, "Wind gust ground"), color='tab:purple', linestyle='--',
+                 label="Wind gust [m/s]")
+
+    axes[2].bar(times, _values(series, "Precipitation rate"), width=0.1, color='tab:cyan',
+                label="Precipitation rate [kg/m^2/h]")
+
+    axes[3].plot(times, _values(series, "Pressure sea lvl hPa"), color='black', label="Pressure sea lvl [hPa]")
+
+    for ax in axes:
+        ax.grid(alpha=0.3)
+        ax.legend(loc="upper left", fontsize='small')
+
+    fig.suptitle(f"GFS {series['date']} {series['hour']:02}z, {series['lat']:.2f}N {series['lon']:.2f}E")
+    fig.autofmt_xdate()
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    fig.savefig(tmp_path, format='png', bbox_inches='tight')
+    os.replace(tmp_path, path)
@@ -4,13 +4,24 @@ import dash_html_components as html
 import dash_bootstrap_components as dbc
 
 import os
-import glob
+import time
 import flask
+import hashlib
 
 from datetime import datetime, timedelta
+from project import animation, catalogue, image_variants, metrics, output_profiles, tiles, timeseries
 
 base_dir = f"{os.path.dirname(__file__)}/../data/pics/"
 static_image_route = '/static/'
+image_cache_control = 'public, max-age=31536000, immutable'  # pictures' paths contain base date and hour
+animation_route = '/animations/'
+animation_cache_control = 'public, max-age=600'  # animations grow while the run is being rendered
+point_route = '/api/point'
+meteogram_route = '/api/meteogram'
+meteograms_dir = f"{os.path.dirname(__file__)}/../data/meteograms/"
+point_cache_control = 'public, max-age=600'  # without day and hour, the newest cycle is served
+tile_route = '/tiles/'
+metrics_route = '/metrics'
 
 PARAM_DESCRIPTIONS = {
     "CAPE surface": [html.Strong("Convective available potential energy"),
@@ -33,6 +44,9 @@ PARAM_DESCRIPTIONS = {
     "Pressure sea lvl": [html.Strong("Pressure"),
                          """\nThe exertion of force upon a surface by a fluid (e.g., the atmosphere) in contact with it. Here, reduced to sea level."""],
 
+    "Relative humidity 2m": [html.Strong("Relative humidity"),
+                             """\nThe ratio of the amount of water vapour in the air to the amount the air could hold at its temperature, in percent. It is computed from temperature and dew point: the closer they are, the higher the relative humidity. At 100% the air is saturated and fog or clouds may form."""],
+
     "Temperature 2m": [html.Strong("Temperature"),
                        """\nThe temperature is a measure of the internal energy that a substance contains. This is the most measured quantity in the atmosphere."""],
 
@@ -51,17 +65,44 @@ def helper_path(path):
     return os.path.basename(os.path.normpath(path))
 
 
-charts = {helper_path(day):
-              {helper_path(hour):
-                   {helper_path(forecast):
-                        [helper_path(pic) for pic in
-                         glob.glob(f"{base_dir}{helper_path(day)}/{helper_path(hour)}/{helper_path(forecast)}/*.png")]
-                    for forecast in glob.glob(f"{base_dir}{helper_path(day)}/{helper_path(hour)}/*/")}
-               for hour in glob.glob(f"{base_dir}{helper_path(day)}/*/")}
-          for day in glob.glob(f"{base_dir}*/")}
+if not os.path.isfile(catalogue.CATALOGUE_PATH):
+    catalogue.rebuild(base_dir)
+
+# catalogue is refreshed in background and read by callbacks from immutable snapshots (see catalogue.CatalogueWatcher)
+CATALOGUE = catalogue.CatalogueWatcher()
+CATALOGUE.start()
 
 app = dash.Dash(external_stylesheets=[dbc.themes.BOOTSTRAP])
 server = app.server
+metrics.configure("web")
+
+
+@server.before_request
+def start_timer():
+    flask.g.request_start = time.perf_counter()
+    CATALOGUE.start()  # no-op unless this is a new (e.g. forked) process without the refresh thread
+
+
+@server.after_request
+def record_request(response):
+    """
+    Counts served requests and their latency per route (route patterns keep the number of label values small).
+    """
+    if 'request_start' in flask.g:
+        route = flask.request.url_rule.rule if flask.request.url_rule is not None else 'unknown'
+        metrics.observe('gfs_http_request_seconds', time.perf_counter() - flask.g.request_start, route=route)
+        metrics.inc('gfs_http_requests_total', route=route, status=response.status_code)
+        # every worker saves its metrics, so /metrics served by any of them covers all workers (see metrics.collect)
+        metrics.flush_if_due()
+    return response
+
+
+@server.route(metrics_route)
+def serve_metrics():
+    """
+    Serves metrics of all web workers and of the pipeline and render processes in Prometheus text format.
+    """
+    return flask.Response(metrics.exposition(metrics.collect()), mimetype='text/plain; version=0.0.4')
 
 app.layout = html.Div([
     dbc.Modal(
@@ -126,8 +167,8 @@ app.layout = html.Div([
         html.Div([
             dcc.Dropdown(
                 id='day-dropdown',
-                options=[{'label': i, 'value': i} for i in charts.keys()],
-                value=list(charts.keys())[-1],
+                options=[{'label': i, 'value': i} for i in CATALOGUE.snapshot.charts.keys()],
+                value=list(CATALOGUE.snapshot.charts.keys())[-1],
                 clearable=False,
                 style={
                     'width': '99%',
@@ -163,6 +204,36 @@ app.layout = html.Div([
         ]),
         html.Br(),
 
+        html.Div(id='prefetch-text', children='Preload frames:', style={'margin-left': '10px'}),
+        html.Div([
+            dcc.RadioItems(
+                id='prefetch-mode',
+                options=[{'label': ' off', 'value': 'off'},
+                         {'label': ' neighbouring', 'value': 'neighbours'},
+                         {'label': ' whole run', 'value': 'run'}],
+                value='neighbours',
+                labelStyle={'display': 'inline-block', 'margin-right': '10px'},
+                style={'margin-left': '10px'}
+            ),
+            html.Div(id='prefetch-status', style={'display': 'none'})
+        ]),
+        html.Br(),
+
+        html.Div([
+            html.A("Whole run animation", id='animation-link', target='_blank')
+        ], style={'margin-left': '10px'}),
+        html.Br(),
+
+        html.Div(id='meteogram-text', children='Meteogram (lat, lon):', style={'margin-left': '10px'}),
+        html.Div([
+            dcc.Input(id='meteogram-lat', type='number', value=52.25, step=0.25, debounce=True,
+                      style={'width': '45%', 'margin-right': '5px'}),
+            dcc.Input(id='meteogram-lon', type='number', value=21.0, step=0.25, debounce=True,
+                      style={'width': '45%'}),
+            html.Img(id='meteogram', style={'width': '100%', 'margin-top': '5px'})
+        ], style={'margin-left': '10px'}),
+        html.Br(),
+
         html.Div([
             dbc.Button("Info & instructions", id="info-button", className="mr-1")
         ], style={
@@ -184,6 +255,8 @@ app.layout = html.Div([
                         'textAlign': 'center'
                         }),
 
+        dcc.Store(id='run-store'),
+
         dcc.Interval(
             id='day-interval',
             interval=5 * 60 * 1000,  # in milliseconds
@@ -222,17 +295,7 @@ def toggle_modal(n1, n2, is_open):
     [dash.dependencies.State("day-dropdown", "value")]
 )
 def update_day_dropdown(n, current_val):
-    global charts
-    charts = {helper_path(day):
-                  {helper_path(hour):
-                       {helper_path(forecast):
-                            [helper_path(pic) for pic in
-                             glob.glob(
-                                 f"{base_dir}{helper_path(day)}/{helper_path(hour)}/{helper_path(forecast)}/*.png")]
-                        for forecast in glob.glob(f"{base_dir}{helper_path(day)}/{helper_path(hour)}/*/")}
-                   for hour in glob.glob(f"{base_dir}{helper_path(day)}/*/")}
-              for day in glob.glob(f"{base_dir}*/")}
-
+    charts = CATALOGUE.snapshot.charts
     options = [{'label': f"{i[:4]}-{i[4:6]}-{i[6:]}", 'value': i} for i in charts.keys()]
     if current_val in [option['value'] for option in options]:
         value = current_val
@@ -248,6 +311,7 @@ def update_day_dropdown(n, current_val):
     [dash.dependencies.State("hour-dropdown", "value")]
 )
 def update_hour_dropdown(day, current_val):
+    charts = CATALOGUE.snapshot.charts
     options = [{'label': "{:02}:00 UTC".format(int(i[:-1])), 'value': i} for i in charts[day].keys()]
     if current_val in [option['value'] for option in options]:
         value = current_val
@@ -259,11 +323,12 @@ def update_hour_dropdown(day, current_val):
 
 @app.callback(
     [dash.dependencies.Output('forecast-slider', 'marks'), dash.dependencies.Output('forecast-slider', 'max'),
-     dash.dependencies.Output('forecast-slider', 'value')],
+     dash.dependencies.Output('forecast-slider', 'value'), dash.dependencies.Output('run-store', 'data')],
     [dash.dependencies.Input('day-dropdown', 'value'), dash.dependencies.Input('hour-dropdown', 'value')],
     [dash.dependencies.State("forecast-slider", "value")]
 )
 def update_forecast_slider(day, hour, current_val):
+    charts = CATALOGUE.snapshot.charts
     base_datetime = datetime.strptime(f"{day}-{hour}", "%Y%m%d-%Hz")
     marks = {
         int(i): {'label': "{}".format((base_datetime + timedelta(hours=int(i))).strftime('%d.%m\n%H:00')
@@ -277,44 +342,240 @@ def update_forecast_slider(day, hour, current_val):
     else:
         value = list(marks.keys())[0]
 
-    return marks, max, value
+    # whole run goes to the browser, so moving the slider needs no round-trip to the server
+    run = {forecast: list(pics) for forecast, pics in charts[day][hour].items()} \
+        if all(v is not None for v in [day, hour]) else {}
 
+    return marks, max, value, run
 
-@app.callback(
+
+# Callbacks below are run in the browser.
+app.clientside_callback(
+    """
+    function(forecast, run, current_val) {
+        var pics = (run && forecast !== null && forecast !== undefined) ? run[String(forecast).padStart(3, '0')] : null;
+        var options = pics ? pics.map(function(pic) { return {'label': pic.slice(0, -4), 'value': pic}; })
+                           : [{'label': ' ', 'value': ' '}];
+        var values = options.map(function(option) { return option.value; });
+        return [options, values.indexOf(current_val) >= 0 ? current_val : values[0]];
+    }
+    """,
     [dash.dependencies.Output('chart-dropdown', 'options'), dash.dependencies.Output('chart-dropdown', 'value')],
-    [dash.dependencies.Input('day-dropdown', 'value'), dash.dependencies.Input('hour-dropdown', 'value'),
-     dash.dependencies.Input('forecast-slider', 'value')],
+    [dash.dependencies.Input('forecast-slider', 'value'), dash.dependencies.Input('run-store', 'data')],
     [dash.dependencies.State("chart-dropdown", "value")]
 )
-def update_chart_dropdown(day, hour, forecast, current_val):
-    options = [{'label': i[:-4], 'value': i} for i in charts[day][hour][f'{forecast:03}'][::]] \
-        if all(v not in [None, " "] for v in [day, hour, forecast]) else [{'label': " ", 'value': " "}]
-    if current_val in [option['value'] for option in options]:
-        value = current_val
-    else:
-        value = options[0]['value']
-
-    return options, value
 
-
-@app.callback(
+app.clientside_callback(
+    """
+    function(day, hour, forecast, chart) {
+        var fcst = String(forecast === null || forecast === undefined ? 0 : forecast).padStart(3, '0');
+        return '%s' + day + '-' + hour + '-' + fcst + '-' + chart;
+    }
+    """ % static_image_route,
     dash.dependencies.Output('image', 'src'),
     [dash.dependencies.Input('day-dropdown', 'value'), dash.dependencies.Input('hour-dropdown', 'value'),
      dash.dependencies.Input('forecast-slider', 'value'), dash.dependencies.Input('chart-dropdown', 'value')])
-def update_image_src(day, hour, forecast, chart):
-    return f"{static_image_route}{day}-{hour}-{forecast:03}-{chart}" if forecast is not None \
-        else f"{static_image_route}{day}-{hour}-000-{chart}"
+
+app.clientside_callback(
+    """
+    function(day, hour, chart) {
+        return '%s' + day + '/' + hour + '/' + encodeURIComponent(String(chart).slice(0, -4)) + '.webp';
+    }
+    """ % animation_route,
+    dash.dependencies.Output('animation-link', 'href'),
+    [dash.dependencies.Input('day-dropdown', 'value'), dash.dependencies.Input('hour-dropdown', 'value'),
+     dash.dependencies.Input('chart-dropdown', 'value')])
+
+# Warms browser cache with frames of the selected chart: two nearest frames on each side or the whole run.
+app.clientside_callback(
+    """
+    function(chart, forecast, mode, run, day, hour) {
+        if (mode === 'off' || !run || !chart || chart === ' ') {
+            return '';
+        }
+        var forecasts = Object.keys(run).sort().filter(function(fcst) { return run[fcst].indexOf(chart) >= 0; });
+        var current = forecasts.indexOf(String(forecast).padStart(3, '0'));
+        if (mode === 'neighbours') {
+            forecasts = forecasts.slice(Math.max(current - 2, 0), current + 3);
+        }
+        window.gfsPrefetched = window.gfsPrefetched || {};
+        forecasts.forEach(function(fcst) {
+            var src = '%s' + day + '-' + hour + '-' + fcst + '-' + chart;
+            if (!window.gfsPrefetched[src]) {
+                var img = new Image();
+                img.src = src;
+                window.gfsPrefetched[src] = img;
+            }
+        });
+        return forecasts.length + ' frames';
+    }
+    """ % static_image_route,
+    dash.dependencies.Output('prefetch-status', 'children'),
+    [dash.dependencies.Input('chart-dropdown', 'value'), dash.dependencies.Input('forecast-slider', 'value'),
+     dash.dependencies.Input('prefetch-mode', 'value'), dash.dependencies.Input('run-store', 'data')],
+    [dash.dependencies.State('day-dropdown', 'value'), dash.dependencies.State('hour-dropdown', 'value')])
+
+
+app.clientside_callback(
+    """
+    function(day, hour, lat, lon) {
+        if (!day || !hour || lat === null || lat === undefined || lon === null || lon === undefined) {
+            return '';
+        }
+        return '%s?day=' + day + '&hour=' + parseInt(hour) + '&lat=' + lat + '&lon=' + lon;
+    }
+    """ % meteogram_route,
+    dash.dependencies.Output('meteogram', 'src'),
+    [dash.dependencies.Input('day-dropdown', 'value'), dash.dependencies.Input('hour-dropdown', 'value'),
+     dash.dependencies.Input('meteogram-lat', 'value'), dash.dependencies.Input('meteogram-lon', 'value')])
 
 
 @app.server.route('{}<img_path>'.format(static_image_route))
 def serve_image(img_path):
+    """
+    Serves chart picture. Optional query parameters select smaller or WebP variant of the picture:
+    size (one of image_variants.SIZES keys or "full") and format ("png" or "webp"), or picture rendered with another
+    output profile: profile (one of output_profiles.PROFILES keys, only already rendered pictures are served).
+    """
     if ".." in img_path:
         raise Exception('"{}" is excluded from the allowed static paths'.format(img_path))
     image_path = img_path.replace('-', '/')
     image_dir = base_dir + image_path[:17]
     image_name = image_path[17:]
-    return flask.send_from_directory(image_dir, image_name)
+
+    profile = flask.request.args.get('profile', 'standard')
+    if profile != 'standard':
+        try:
+            path = output_profiles.output_path(image_dir, os.path.splitext(image_name)[0], profile)
+        except ValueError as e:
+            flask.abort(400, str(e))
+        if not os.path.isfile(path):
+            flask.abort(404)
+        return send_cached(path, image_cache_control)
+
+    size = flask.request.args.get('size', 'full')
+    fmt = flask.request.args.get('format', 'png')
+    try:
+        path = image_variants.variant_path(os.path.join(image_dir, image_name), size, fmt)
+    except ValueError as e:
+        flask.abort(400, str(e))
+
+    if not os.path.isfile(path):
+        if not os.path.isfile(os.path.join(image_dir, image_name)):
+            flask.abort(404)
+        image_variants.make_variant(os.path.join(image_dir, image_name), size, fmt)
+
+    return send_cached(path, image_cache_control)
+
+
+@app.server.route('{}<day>/<hour>/<name>'.format(animation_route))
+def serve_animation(day, hour, name):
+    """
+    Serves animated WebP ("<chart>.webp"), sprite sheet ("<chart>.sprite.png") or sprite sheet index
+    ("<chart>.sprite.json") of the whole run of a chart.
+    """
+    if any(".." in part for part in [day, hour, name]):
+        raise Exception('"{}" is excluded from the allowed static paths'.format(name))
+    path = os.path.join(animation.ANIMATIONS_DIR, day, hour, name)
+    if not os.path.isfile(path):
+        flask.abort(404)
+    return send_cached(path, animation_cache_control)
+
+
+def point_query():
+    """
+    Reads point forecast query parameters: lat, lon and optional day ("YYYYMMDD") and hour (0, 6, 12, 18) of the
+    cycle (the newest cycle with time series cube by default).
+
+    :return: (day, hour, lat, lon)
+    """
+    try:
+        lat = float(flask.request.args['lat'])
+        lon = float(flask.request.args['lon'])
+    except (KeyError, ValueError):
+        flask.abort(400, "lat and lon query parameters should be numbers.")
+
+    day = flask.request.args.get('day')
+    hour = flask.request.args.get('hour')
+    if day is None or hour is None:
+        latest = timeseries.latest_cube()
+        if latest is None:
+            flask.abort(404)
+        day, hour = latest
+    elif not (len(day) == 8 and day.isnumeric() and hour in ['0', '6', '12', '18']):
+        flask.abort(400, "day should be in format YYYYMMDD and hour one of: 0, 6, 12, 18.")
+
+    return day, int(hour), lat, lon
+
+
+def read_point(day, hour, lat, lon):
+    try:
+        return timeseries.point_series(day, hour, lat, lon)
+    except FileNotFoundError:
+        flask.abort(404)
+    except ValueError as e:
+        flask.abort(404, str(e))
+
+
+@app.server.route(point_route)
+def serve_point():
+    """
+    Serves point forecast as JSON: time series of all fields in grid point nearest to lat, lon (see point_query and
+    timeseries.point_series).
+    """
+    series = read_point(*point_query())
+    response = flask.jsonify(series)
+    response.headers['Cache-Control'] = point_cache_control
+    return response
+
+
+@app.server.route(meteogram_route)
+def serve_meteogram():
+    """
+    Serves meteogram of a point (see point_query). Meteograms are drawn once per cycle and grid point.
+    """
+    day, hour, lat, lon = point_query()
+    series = read_point(day, hour, lat, lon)
+    path = os.path.join(meteograms_dir, day, f"{hour:02}z", f"{series['lat']:.2f}_{series['lon']:.2f}.png")
+    if not os.path.isfile(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        timeseries.build_meteogram(series, path)
+    return send_cached(path, point_cache_control)
+
+
+@app.server.route('{}<cycle>/<chart>/<fcst>/<int:z>/<int:x>/<int:y>.png'.format(tile_route))
+def serve_tile(cycle, chart, fcst, z, x, y):
+    """
+    Serves XYZ (Web Mercator) tile of a chart, e.g. /tiles/2020101206/Temperature 2m/003/6/35/21.png. Tiles are
+    rendered on first request from chart fields saved by the renderer (see tiles.get_tile).
+    """
+    if ".." in chart or "/" in chart:
+        raise Exception('"{}" is excluded from the allowed static paths'.format(chart))
+    if not (len(cycle) == 10 and cycle.isnumeric() and cycle[8:] in ['00', '06', '12', '18'] and fcst.isnumeric()):
+        flask.abort(400, "cycle should be in format YYYYMMDDHH and fcst should be a forecast hour.")
+
+    try:
+        tile = tiles.get_tile(cycle[:8], int(cycle[8:]), int(fcst), chart, z, x, y)
+    except FileNotFoundError:
+        flask.abort(404)
+    except ValueError as e:
+        flask.abort(400, str(e))
+
+    response = flask.Response(tile, mimetype='image/png')
+    response.set_etag(hashlib.sha1(tile).hexdigest())
+    response.headers['Cache-Control'] = image_cache_control
+    return response.make_conditional(flask.request)
+
+
+def send_cached(path, cache_control):
+    """
+    Sends file with strong ETag and given Cache-Control header, answering conditional requests with 304.
+    """
+    response = flask.send_from_directory(os.path.dirname(path), os.path.basename(path))
+    response.set_etag(image_variants.file_etag(path))
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(flask.request)
 
 
 if __name__ == '__main__':
-    app.run_server(debug=True)
+    app.run_server(debug=True, threaded=True)
@@ -0,0 +1,154 @@
+import hashlib
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class NomadsStub:
+    """
+    Local HTTP stand-in for NOMADS filter endpoint. Forecast hours listed in `ready` are answered with about `size`
+    bytes of GRIB2 data made of `messages` messages, other ones with a short "data not available" page (just like
+    NOMADS does).
+    """
+
+    def __init__(self, ready=(0,), size=20 * 1024, delay=0.0, failures=0, messages=1):
+        self.ready = set(ready)
+        self.size = size
+        self.messages = messages
+        self.delay = delay
+        self.failures = failures
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{}/cgi-bin/filter_gfs_0p25.pl".format(self.server.server_address[1])
+
+    def handle(self, handler):
+        with self._lock:
+            self.requests.append(handler.path)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            fail = self.failures > 0
+            if fail:
+                self.failures -= 1
+        try:
+            time.sleep(self.delay)
+            if fail:
+                self.reply(handler, 503, b"Service unavailable")
+                return
+            query = parse_qs(urlparse(handler.path).query)
+            forecast = int(query["file"][0][-3:])
+            if forecast in self.ready:
+                message = grib2_message(b"G" * max(self.size // self.messages - 20, 0))
+                self.reply(handler, 200, message * self.messages)
+            else:
+                self.reply(handler, 200, b"data file is not present")
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    @staticmethod
+    def reply(handler, code, body):
+        handler.send_response(code)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def grib2_message(payload: bytes) -> bytes:
+    """
+    Builds minimal GRIB2 framed message ('GRIB' indicator section ... '7777') around given payload.
+    """
+    length = 16 + len(payload) + 4
+    return b"GRIB" + b"\x00\x00" + b"\x00" + b"\x02" + length.to_bytes(8, 'big') + payload + b"7777"
+
+
+class FileServerStub(NomadsStub):
+    """
+    Local static file server with HTTP Range and ETag support - stand-in for NOMADS data directory. `files` maps URL
+    paths (e.g. "/gfs.20201012/06/atmos/gfs.t06z.pgrb2.0p25.f000.idx") to their content and can be changed while
+    the server is running.
+    """
+
+    def __init__(self, files, honour_range=True):
+        super().__init__()
+        self.files = files
+        self.honour_range = honour_range
+        self.responses = []  # (path, If-None-Match header, status code) of every request
+        self.url = "http://127.0.0.1:{}".format(self.server.server_address[1])
+
+    def handle(self, handler):
+        with self._lock:
+            self.requests.append((handler.path, handler.headers.get("Range")))
+        body = self.files.get(urlparse(handler.path).path)
+        if body is None:
+            self.respond(handler, 404)
+            self.reply(handler, 404, b"Not Found")
+            return
+        etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+        if handler.headers.get("If-None-Match") == etag:
+            self.respond(handler, 304)
+            handler.send_response(304)
+            handler.send_header("ETag", etag)
+            handler.end_headers()
+            return
+        range_header = handler.headers.get("Range")
+        if range_header is None or not self.honour_range:
+            self.respond(handler, 200)
+            handler.send_response(200)
+            handler.send_header("ETag", etag)
+            handler.send_header("Content-Length", str(len(body)))
+            handler.end_headers()
+            handler.wfile.write(body)
+            return
+        start, end = range_header[len("bytes="):].split("-")
+        end = int(end) if end else len(body) - 1
+        part = body[int(start):end + 1]
+        self.respond(handler, 206)
+        handler.send_response(206)
+        handler.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+        handler.send_header("Content-Length", str(len(part)))
+        handler.end_headers()
+        handler.wfile.write(part)
+
+    def respond(self, handler, code):
+        with self._lock:
+            self.responses.append((handler.path, handler.headers.get("If-None-Match"), code))
+
+
+def grib_with_idx(count: int, size: int = 100, descriptions: dict = None):
+    """
+    Builds fake GRIB2 file made of `count` messages (message n is filled with byte n % 256) and its .idx inventory.
+
+    :param descriptions: dict {message number: "VAR:level:time range"} (other messages are "VAR<n>:level:anl").
+    :return: (grib bytes, idx text, list of messages).
+    """
+    descriptions = descriptions or {}
+    messages = [grib2_message(bytes([n % 256]) * size) for n in range(1, count + 1)]
+    offsets = [sum(len(m) for m in messages[:i]) for i in range(count)]
+    idx = "".join(f"{n}:{offset}:d=2020101206:{descriptions.get(n, f'VAR{n}:level:anl')}:\n"
+                  for n, offset in zip(range(1, count + 1), offsets))
+    return b"".join(messages), idx, messages
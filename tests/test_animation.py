@@ -0,0 +1,43 @@
+import os
+import json
+import tempfile
+import unittest
+
+from PIL import Image
+from project import animation
+
+
+class TestAnimation(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.pics = os.path.join(self.tmp.name, "pics")
+        self.out = os.path.join(self.tmp.name, "animations")
+        for i, forecast in enumerate(["000", "003", "006"]):
+            os.makedirs(os.path.join(self.pics, "20201012", "06z", forecast))
+            Image.new("RGB", (1080, 720), (80 * i, 0, 0)).save(
+                os.path.join(self.pics, "20201012", "06z", forecast, "Temperature 2m.png"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_build_animation(self):
+        paths = animation.build_animation("20201012", "06z", "Temperature 2m", self.pics, self.out, width=540)
+        with Image.open(paths["webp"]) as image:
+            self.assertEqual((image.format, image.n_frames, image.size), ("WEBP", 3, (540, 360)))
+        with open(paths["index"]) as f:
+            index = json.load(f)
+        self.assertEqual(index["forecasts"], ["000", "003", "006"])
+        with Image.open(paths["sprite"]) as image:
+            self.assertEqual(image.size, (3 * index["tile_width"], index["tile_height"]))
+
+    def test_build_animation_bad_values(self):
+        self.assertRaises(FileNotFoundError, lambda: animation.build_animation("20201012", "06z", "CIN surface",
+                                                                               self.pics, self.out))
+        self.assertRaises(TypeError, lambda: animation.build_animation("20201012", "06z", "Temperature 2m",
+                                                                       self.pics, self.out, width="5"))
+        self.assertRaises(ValueError, lambda: animation.build_animation("20201012", "06z", "Temperature 2m",
+                                                                        self.pics, self.out, width=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
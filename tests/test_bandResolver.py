@@ -0,0 +1,96 @@
+import unittest
+
+from project import band_resolver
+
+
+class FakeBand:
+    def __init__(self, element, short_name, pdtn=0, values=""):
+        self.metadata = {"GRIB_ELEMENT": element, "GRIB_SHORT_NAME": short_name, "GRIB_PDS_PDTN": str(pdtn),
+                         "GRIB_PDS_TEMPLATE_ASSEMBLED_VALUES": values}
+
+    def GetMetadata(self):
+        return self.metadata
+
+
+class FakeGrib:
+    def __init__(self, bands):
+        self.bands = bands
+        self.RasterCount = len(bands)
+
+    def GetRasterBand(self, number):
+        return self.bands[number - 1]
+
+
+# template 4.8 values of a 0-6 hour accumulation (type of statistical processing is the 24th value)
+ACC = " ".join(["1", "8", "2", "0", "96", "0", "0", "1", "0", "1", "0", "0", "255", "0", "0", "2020", "10", "12",
+                "12", "0", "0", "1", "0", "1", "2", "1", "6", "255", "0", "0"])
+ACC_DAY = ACC.replace("1 2 1 6 255", "1 2 2 1 255")  # 1 day accumulation
+
+
+class TestBandResolver(unittest.TestCase):
+    def test_inventory_key(self):
+        self.assertEqual(band_resolver.inventory_key("d=2020101206:TMP:2 m above ground:3 hour fcst:"),
+                         ("TMP", "2 m above ground", "fcst"))
+        self.assertEqual(band_resolver.inventory_key("d=2020101206:APCP:surface:0-6 hour acc fcst:"),
+                         ("APCP", "surface", "acc 6h"))
+        self.assertEqual(band_resolver.inventory_key("d=2020101206:APCP:surface:6-9 hour acc fcst:"),
+                         ("APCP", "surface", "acc 3h"))
+        self.assertEqual(band_resolver.inventory_key("d=2020101206:TMP:0.4 mb:anl:"), ("TMP", "0.4 mb", "fcst"))
+        self.assertEqual(band_resolver.inventory_key("d=2020101206:PRMSL:mean sea level:anl:"),
+                         ("PRMSL", "mean sea level", "fcst"))
+        self.assertRaises(ValueError, lambda: band_resolver.inventory_key("d=2020101206:TMP"))
+
+    def test_metadata_key(self):
+        self.assertEqual(band_resolver.metadata_key(FakeBand("TMP", "2-HTGL").metadata),
+                         ("TMP", "2 m above ground", "fcst"))
+        self.assertEqual(band_resolver.metadata_key(FakeBand("UGRD", "25000-ISBL").metadata),
+                         ("UGRD", "250 mb", "fcst"))
+        self.assertEqual(band_resolver.metadata_key(FakeBand("APCP", "0-SFC", 8, ACC).metadata),
+                         ("APCP", "surface", "acc 6h"))
+        self.assertEqual(band_resolver.metadata_key(FakeBand("APCP", "0-SFC", 8, ACC_DAY).metadata),
+                         ("APCP", "surface", "acc 24h"))
+        self.assertEqual(band_resolver.metadata_key(FakeBand("TMP", "40-ISBL").metadata), ("TMP", "0.4 mb", "fcst"))
+        self.assertEqual(band_resolver.metadata_key(FakeBand("HLCY", "3000-0-HTGL").metadata),
+                         ("HLCY", "3000-0-HTGL", "fcst"))
+
+    def test_forecast_key(self):
+        key = ("APCP", "surface", "acc 6h")
+        self.assertEqual([band_resolver.forecast_key(key, forecast)[2] for forecast in [3, 6, 9, 12, 15]],
+                         ["acc 3h", "acc 6h", "acc 3h", "acc 6h", "acc 3h"])
+        self.assertEqual(band_resolver.forecast_key(("TMP", "2 m above ground", "fcst"), 9),
+                         ("TMP", "2 m above ground", "fcst"))
+
+    def test_inventory_messages_accumulation_interval(self):
+        # GFS has accumulation since the last reset and since the start of forecast
+        inventory = [(1, 0, "d=2020101206:APCP:surface:0-12 hour acc fcst:"),
+                     (2, 100, "d=2020101206:APCP:surface:6-12 hour acc fcst:")]
+        key = band_resolver.forecast_key(("APCP", "surface", "acc 6h"), 12)
+        self.assertEqual(band_resolver.inventory_messages(inventory, [key]), {key: 2})
+
+    def test_inventory_messages(self):
+        inventory = [(1, 0, "d=2020101206:PRMSL:mean sea level:anl:"),
+                     (2, 100, "d=2020101206:TMP:2 m above ground:anl:"),
+                     (3, 200, "d=2020101206:TMP:2 m above ground:anl:")]
+        self.assertEqual(band_resolver.inventory_messages(inventory, [("TMP", "2 m above ground", "fcst")]),
+                         {("TMP", "2 m above ground", "fcst"): 2})
+        self.assertRaises(KeyError, lambda: band_resolver.inventory_messages(inventory, [("DPT", "2 m above ground",
+                                                                                          "fcst")]))
+
+    def test_resolver_caches_index_per_signature(self):
+        resolver = band_resolver.BandResolver()
+        bands = [FakeBand("PRMSL", "0-MSL"), FakeBand("TMP", "2-HTGL"), FakeBand("DPT", "2-HTGL"),
+                 FakeBand("APCP", "0-SFC", 8, ACC)]
+        key = ("DPT", "2 m above ground", "fcst")
+        self.assertIs(resolver.bands(FakeGrib(bands), [key])[key], bands[2])
+        self.assertIs(resolver.bands(FakeGrib(list(bands)), [key])[key], bands[2])
+        self.assertEqual(resolver.scans, 1)
+
+        # the same signature, but changed inventory is detected and indexed again
+        moved = [bands[0], bands[2], bands[1], bands[3]]
+        self.assertIs(resolver.bands(FakeGrib(moved), [key])[key], bands[2])
+        self.assertEqual(resolver.scans, 2)
+        self.assertRaises(KeyError, lambda: resolver.bands(FakeGrib(bands), [("GUST", "surface", "fcst")]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from project import catalogue
+
+
+class TestCatalogue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "catalogue.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_publish_and_load(self):
+        self.assertEqual(catalogue.load(self.path), {})
+        catalogue.publish("20201012", "06z", "003", "Wind 10m.png", self.path)
+        catalogue.publish("20201012", "06z", "000", "Temperature 2m.png", self.path)
+        catalogue.publish("20201012", "06z", "000", "CAPE surface.png", self.path)
+        self.assertEqual(catalogue.load(self.path),
+                         {"20201012": {"06z": {"000": ["CAPE surface.png", "Temperature 2m.png"],
+                                               "003": ["Wind 10m.png"]}}})
+
+    def test_version_changes_only_on_new_charts(self):
+        first = catalogue.version(self.path)
+        catalogue.publish("20201012", "06z", "000", "Temperature 2m.png", self.path)
+        second = catalogue.version(self.path)
+        catalogue.publish("20201012", "06z", "000", "Temperature 2m.png", self.path)
+        self.assertNotEqual(first, second)
+        self.assertEqual(second, catalogue.version(self.path))
+
+    def test_rebuild(self):
+        pics = os.path.join(self.tmp.name, "pics")
+        os.makedirs(os.path.join(pics, "20201012", "06z", "000"))
+        open(os.path.join(pics, "20201012", "06z", "000", "Temperature 2m.png"), 'wb').close()
+        catalogue.rebuild(pics, self.path)
+        self.assertEqual(catalogue.load(self.path), {"20201012": {"06z": {"000": ["Temperature 2m.png"]}}})
+
+    def test_watcher_snapshots(self):
+        watcher = catalogue.CatalogueWatcher(self.path, interval=60)
+        watcher.start()
+        empty = watcher.snapshot
+        self.assertEqual(dict(empty.charts), {})
+        self.assertFalse(watcher.refresh())
+
+        catalogue.publish("20201012", "06z", "000", "Temperature 2m.png", self.path)
+        self.assertTrue(watcher.refresh())
+        self.assertFalse(watcher.refresh())
+        self.assertEqual(watcher.snapshot.charts["20201012"]["06z"]["000"], ("Temperature 2m.png",))
+        self.assertEqual(dict(empty.charts), {})
+        with self.assertRaises(TypeError):
+            watcher.snapshot.charts["20201013"] = {}
+        watcher.stop()
+        self.assertRaises(ValueError, lambda: catalogue.CatalogueWatcher(self.path, interval=0))
+
+    def test_watcher_retries_failed_load(self):
+        watcher = catalogue.CatalogueWatcher(self.path, interval=60)
+        watcher.start()
+        catalogue.publish("20201012", "06z", "000", "Temperature 2m.png", self.path)
+
+        def fail(path):
+            raise sqlite3.OperationalError("database is locked")
+
+        load = catalogue.load
+        catalogue.load = fail
+        try:
+            self.assertRaises(sqlite3.Error, watcher.refresh)
+        finally:
+            catalogue.load = load
+        self.assertEqual(dict(watcher.snapshot.charts), {})
+        self.assertTrue(watcher.refresh())
+        self.assertEqual(list(watcher.snapshot.charts), ["20201012"])
+        watcher.stop()
+
+    def test_watcher_refreshes_in_background(self):
+        watcher = catalogue.CatalogueWatcher(self.path, interval=0.01)
+        watcher.start()
+        catalogue.publish("20201012", "06z", "003", "Wind 10m.png", self.path)
+        for _ in range(500):
+            if watcher.snapshot.charts:
+                break
+            time.sleep(0.01)
+        watcher.stop()
+        self.assertEqual(list(watcher.snapshot.charts), ["20201012"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.path import Path
+from project import contours
+
+EXTENT = [13, 25, 56, 48]
+LEVELS = np.arange(-30, 42, 1)
+
+
+class TestContours(unittest.TestCase):
+    def setUp(self):
+        y, x = np.mgrid[0:330, 0:490]
+        self.data = 10 + 10 * np.sin(x / 80.0) + 5 * np.cos(y / 50.0)
+        self.geometry = contours.compute(self.data, EXTENT, LEVELS)
+
+    def test_compute(self):
+        self.assertEqual(len(self.geometry["filled"]), len(LEVELS) + 1)
+        self.assertEqual(len(self.geometry["lines"]), len(LEVELS))
+        self.assertFalse(self.geometry["filled"][0])  # nothing below -30
+        self.assertTrue(self.geometry["lines"][LEVELS.tolist().index(10)])
+        vertices = np.concatenate([path.vertices for level in self.geometry["filled"] for path in level])
+        self.assertTrue((vertices[:, 0] >= 13).all() and (vertices[:, 0] <= 25).all())
+        self.assertTrue((vertices[:, 1] >= 48).all() and (vertices[:, 1] <= 56).all())
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = contours.contours_path("20201012", 6, 3, "Temperature 2m", EXTENT, tmp)
+            contours.save(self.geometry, path)
+            self.assertTrue(os.path.isfile(path))
+            loaded = contours.load(path)
+
+        self.assertEqual(loaded["extent"], EXTENT)
+        np.testing.assert_array_equal(loaded["levels"], LEVELS)
+        for kind in contours.KINDS:
+            self.assertEqual([len(level) for level in loaded[kind]], [len(level) for level in self.geometry[kind]])
+            for level, original in zip(loaded[kind], self.geometry[kind]):
+                for path, original_path in zip(level, original):
+                    np.testing.assert_allclose(path.vertices, original_path.vertices, atol=1e-4)
+
+    def test_draw(self):
+        ax = Figure().add_subplot(1, 1, 1)
+        filled = contours.draw_filled(ax, self.geometry, [(0, 0, 0, 1)] * (len(LEVELS) + 1))
+        self.assertEqual(len(filled.get_paths()), sum(1 for level in self.geometry["filled"] if level))
+        lines = contours.draw_lines(ax, self.geometry, colors='black')
+        self.assertIsNotNone(lines)
+        ax.clabel(lines, fmt='%1.0f')
+        self.assertIsNone(contours.draw_lines(ax, contours.compute(np.zeros((20, 20)), EXTENT, LEVELS + 0.5)))
+
+    def test_draw_lines_compound_path(self):
+        fig = Figure(figsize=(1, 1), dpi=100)
+        FigureCanvasAgg(fig)
+        ax = fig.add_axes([0, 0, 1, 1])
+        ax.set_xlim(0, 10)
+        ax.set_ylim(0, 10)
+        path = Path.make_compound_path(Path([[1, 2], [3, 2]]), Path([[7, 8], [9, 8]]))
+        contours.draw_lines(ax, {"levels": np.array([0.0]), "lines": [[path]]}, colors='black', linewidths=2)
+        fig.canvas.draw()
+        image = np.asarray(fig.canvas.buffer_rgba())
+        self.assertLess(image[80, 20, 0], 128)  # on the first line
+        self.assertEqual(image[50, 50, 0], 255)  # lines are not joined
+
+    def test_compute_bad_extent(self):
+        self.assertRaises(TypeError, lambda: contours.compute(self.data, (13, 25, 56, 48), LEVELS))
+        self.assertRaises(ValueError, lambda: contours.compute(self.data, [13, 25, 56], LEVELS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import hashlib
+import unittest
+
+from datetime import datetime, timedelta
+from project import cycle_watcher, downloader
+from tests.nomads_stub import FileServerStub
+
+LISTING = "/gfs.20201012/06/atmos/"
+
+
+def listing(forecasts):
+    return "".join(f'<a href="gfs.t06z.pgrb2.0p25.f{f:03}">gfs.t06z.pgrb2.0p25.f{f:03}</a>\n'
+                   f'<a href="gfs.t06z.pgrb2.0p25.f{f:03}.idx">gfs.t06z.pgrb2.0p25.f{f:03}.idx</a>\n'
+                   for f in forecasts).encode()
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += timedelta(seconds=seconds)
+
+
+class TestCycleWatcher(unittest.TestCase):
+    def test_latest_cycle(self):
+        self.assertEqual(cycle_watcher.latest_cycle(datetime(2020, 10, 12, 10, 0)), ("20201012", 6))
+        self.assertEqual(cycle_watcher.latest_cycle(datetime(2020, 10, 12, 9, 0)), ("20201012", 0))
+        self.assertEqual(cycle_watcher.latest_cycle(datetime(2020, 10, 12, 2, 0)), ("20201011", 18))
+
+    def test_following_cycle(self):
+        self.assertEqual(cycle_watcher.following_cycle("20201012", 6), ("20201012", 12))
+        self.assertEqual(cycle_watcher.following_cycle("20201231", 18), ("20210101", 0))
+        self.assertRaises(ValueError, lambda: cycle_watcher.following_cycle("20201012", 3))
+
+    def test_cycle_path(self):
+        self.assertEqual(cycle_watcher.cycle_path("20201012", 6), "/gfs.20201012/06/atmos")
+        self.assertEqual(cycle_watcher.cycle_url("20201012", 6, "http://nomads"), "http://nomads" + LISTING)
+
+    def test_parse_listing(self):
+        text = listing([0, 3]).decode() + '<a href="gfs.t06z.pgrb2.0p25.f006">gfs.t06z.pgrb2.0p25.f006</a>'
+        self.assertEqual(cycle_watcher.parse_listing(text, 6), {0, 3})
+        self.assertEqual(cycle_watcher.parse_listing(text, 12), set())
+
+    def test_available_uses_conditional_requests(self):
+        with FileServerStub({LISTING: listing([0])}) as stub:
+            watcher = cycle_watcher.CycleWatcher(stub.url, downloader.make_session())
+            self.assertEqual(watcher.available("20201012", 6), {0})
+            self.assertEqual(watcher.available("20201012", 6), {0})
+            self.assertEqual(watcher.available("20201012", 12), set())
+        self.assertEqual(watcher.requests, 3)
+        # the second request of the same listing is conditional and is answered 304 Not Modified
+        etag = '"{}"'.format(hashlib.sha1(listing([0])).hexdigest())
+        self.assertEqual(stub.responses, [(LISTING, None, 200), (LISTING, etag, 304),
+                                          ("/gfs.20201012/12/atmos/", None, 404)])
+
+    def test_watch_yields_new_forecasts(self):
+        clock = FakeClock(datetime(2020, 10, 12, 8, 0))
+        files = {}
+        with FileServerStub(files) as stub:
+            watcher = cycle_watcher.CycleWatcher(stub.url, downloader.make_session(), interval=60, clock=clock,
+                                                 sleep=clock.sleep)
+            batches = watcher.watch("20201012", 6, [0, 3, 6])
+            files[LISTING] = listing([0, 3])
+            self.assertEqual(next(batches), [0, 3])
+            self.assertEqual(clock.slept[0], (timedelta(hours=1, minutes=15)).total_seconds())
+            files[LISTING] = listing([0, 3, 6])
+            self.assertEqual(list(batches), [[6]])
+
+    def test_watch_gives_up(self):
+        clock = FakeClock(datetime(2020, 10, 12, 10, 0))
+        with FileServerStub({LISTING: listing([0])}) as stub:
+            watcher = cycle_watcher.CycleWatcher(stub.url, downloader.make_session(), interval=3600, clock=clock,
+                                                 sleep=clock.sleep)
+            self.assertEqual(list(watcher.watch("20201012", 6, [0, 3])), [[0]])
+
+    def test_bad_interval(self):
+        self.assertRaises(TypeError, lambda: cycle_watcher.CycleWatcher("http://localhost", interval="60"))
+        self.assertRaises(ValueError, lambda: cycle_watcher.CycleWatcher("http://localhost", interval=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,35 @@
 import os
+import tempfile
 import unittest
 import numpy as np
 import datetime
+import gdal
+from PIL import Image
+from project import band_resolver, contours
 from project import raw_data_visualization as rdv
+from tests.nomads_stub import NomadsStub, FileServerStub, grib_with_idx
 
 
 class TestRawDataVisualization(unittest.TestCase):
+    def setUp(self):
+        # contour geometry of rendered charts is saved in a temporary directory
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        contours_dir = contours.CONTOURS_DIR
+        contours.CONTOURS_DIR = tmp.name
+        self.addCleanup(setattr, contours, "CONTOURS_DIR", contours_dir)
+
+    def temporary_base_dir(self) -> str:
+        """
+        Points rdv.BASE_DIR (where GRIB files are downloaded) at a temporary directory until the end of the test.
+        """
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        base_dir = rdv.BASE_DIR
+        rdv.BASE_DIR = tmp.name
+        self.addCleanup(setattr, rdv, "BASE_DIR", base_dir)
+        return tmp.name
+
     def test_choose_levels_temp_levels(self):
         levels, cmap = rdv.choose_levels("Temperature 2m")
         self.assertEqual(len(levels), len([num for num in range(-30, 42)]))
@@ -23,6 +47,14 @@ class TestRawDataVisualization(unittest.TestCase):
         rdv.gfs_scan_bands(f"{rdv.BASE_DIR}/testGrib.f000")
         self.assertTrue(lambda: os.path.isfile("bands.csv"))
 
+    def test_band_resolver_finds_fields_in_grib(self):
+        grib = gdal.Open(f"{rdv.BASE_DIR}/testGrib.f000")
+        keys = rdv.needed_fields(0)
+        bands = band_resolver.BandResolver().bands(grib, keys)
+        self.assertEqual(sorted(bands), keys)
+        for key, band in bands.items():
+            self.assertEqual(band_resolver.metadata_key(band.GetMetadata()), key)
+
     def test_download_newest_data(self):
         date, hour, is_new_data = rdv.gfs_download_newest_data([0, 3])
         self.assertEqual(date, datetime.date.today().strftime("%Y%m%d"))
@@ -39,6 +71,44 @@ class TestRawDataVisualization(unittest.TestCase):
         self.assertRaises(TypeError, lambda: rdv.gfs_get_raw_data("20200816", 10, 0, 5))
         self.assertRaises(ValueError, lambda: rdv.gfs_get_raw_data("20200816", 10, 0, [5, 10]))
 
+    def test_gfs_get_raw_data_local_stub(self):
+        path = os.path.join(self.temporary_base_dir(), "data/gfs/19990101")
+        with NomadsStub(ready=[0], messages=600) as stub:
+            rdv.gfs_get_raw_data("19990101", 0, 0, rdv.EXTENT_POLAND, base_url=stub.url)
+            self.assertIn("&dir=%2Fgfs.19990101%2F00%2Fatmos", stub.requests[0])
+            self.assertTrue(os.path.isfile(os.path.join(path, "00z/gfs.pgrb2.0p25.f000")))
+            self.assertRaises(FileExistsError, lambda: rdv.gfs_get_raw_data("19990101", 0, 0, rdv.EXTENT_POLAND,
+                                                                             base_url=stub.url))
+            self.assertRaises(EOFError, lambda: rdv.gfs_get_raw_data("19990101", 0, 3, rdv.EXTENT_POLAND,
+                                                                      base_url=stub.url))
+        with NomadsStub(ready=[3], messages=10) as stub:
+            self.assertRaises(EOFError, lambda: rdv.gfs_get_raw_data("19990101", 0, 3, rdv.EXTENT_POLAND,
+                                                                      base_url=stub.url))
+        self.assertEqual(os.listdir(os.path.join(path, "00z")), ["gfs.pgrb2.0p25.f000"])
+
+    def test_gfs_get_partial_data_local_stub(self):
+        path = os.path.join(self.temporary_base_dir(), "data/gfs/19990101")
+        keys = rdv.needed_fields(0)
+        numbers = [10 + 20 * i for i in range(len(keys))]
+        descriptions = {number: f"{variable}:{level}:anl" for number, (variable, level, _) in zip(numbers, keys)}
+        grib, idx, messages = grib_with_idx(600, descriptions=descriptions)
+        prefix = "/gfs.19990101/00/atmos/gfs.t00z.pgrb2.0p25.f000"
+        with FileServerStub({prefix: grib, prefix + ".idx": idx.encode()}) as stub:
+            rdv.gfs_get_partial_data("19990101", 0, 0, base_url=stub.url)
+            self.assertRaises(EOFError, lambda: rdv.gfs_get_partial_data("19990101", 0, 3, base_url=stub.url))
+        self.assertEqual(len(keys), 11)
+        with open(os.path.join(path, "00z/gfs.pgrb2.0p25.f000"), 'rb') as f:
+            self.assertEqual(f.read(), b"".join(messages[number - 1] for number in numbers))
+
+    def test_extent_window(self):
+        subregion = (12.875, 0.25, 0, 56.125, 0, -0.25)
+        self.assertEqual(rdv.extent_window(subregion, 49, 33, rdv.EXTENT_POLAND), [(0, 0, 49, 33)])
+        self.assertEqual(rdv.extent_window(subregion, 49, 33, [14, 15, 55, 54]), [(4, 4, 5, 5)])
+        self.assertRaises(ValueError, lambda: rdv.extent_window(subregion, 49, 33, [0, 40, 60, 40]))
+        world = (-0.125, 0.25, 0, 90.125, 0, -0.25)
+        self.assertEqual(rdv.extent_window(world, 1440, 721, rdv.EXTENT_POLAND), [(52, 136, 49, 33)])
+        self.assertEqual(rdv.extent_window(world, 1440, 721, [-1, 1, 1, -1]), [(1436, 356, 4, 9), (0, 356, 5, 9)])
+
     def test_matrix_resize_if_correct_resizing(self):
         array1 = np.array([[0, 1], [1, 0]])
         array2 = np.array([[0, 0, 1, 1], [0, 0, 1, 1], [1, 1, 0, 0], [1, 1, 0, 0]])
@@ -50,6 +120,24 @@ class TestRawDataVisualization(unittest.TestCase):
         self.assertRaises(ValueError, lambda: rdv.matrix_resize([0], -5))
         self.assertRaises(ValueError, lambda: rdv.matrix_resize([0], 0))
 
+    def test_chart_fields(self):
+        self.assertEqual(rdv.chart_fields("Temperature 2m", 0), {"Temperature 2m": ("TMP", "2 m above ground", "fcst")})
+        self.assertEqual(rdv.chart_fields("Wind 10m", 3), {"Wind 10m u": ("UGRD", "10 m above ground", "fcst"),
+                                                           "Wind 10m v": ("VGRD", "10 m above ground", "fcst")})
+        self.assertEqual(list(rdv.chart_fields("Relative humidity 2m", 0)), ["Temperature 2m", "Dew point 2m"])
+        self.assertRaises(ValueError, lambda: rdv.chart_fields("Precipitation ground 6h", 0))
+
+    def test_chart_field(self):
+        fields = {"Wind 10m u": np.array([[3.0]]), "Wind 10m v": np.array([[4.0]]),
+                  "Pressure sea lvl": np.array([[101300.0]])}
+        self.assertEqual(rdv.chart_field("Wind 10m", fields)[0, 0], 5.0)
+        self.assertEqual(rdv.chart_field("Pressure sea lvl", fields)[0, 0], 1013.0)
+        fields["Wind 10m speed"] = np.array([[7.0]])
+        self.assertEqual(rdv.chart_field("Wind 10m", fields)[0, 0], 7.0)
+
+    def test_gfs_extract_fields_missing_file(self):
+        self.assertRaises(FileNotFoundError, lambda: rdv.gfs_extract_fields("30200820", 12, 0))
+
     def test_gfs_build_visualization_map_bad_values(self):
         self.assertRaises(ValueError, lambda: rdv.gfs_build_visualization_map("20200820", 12, 0, "Bad Chart Name"))
         self.assertRaises(ValueError, lambda: rdv.gfs_build_visualization_map("2020", 12, 0, "Temperature 2m"))
@@ -72,6 +160,62 @@ class TestRawDataVisualization(unittest.TestCase):
         self.assertRaises(TypeError, lambda: rdv.gfs_build_visualization_map("20200820", 12, 0, 2))
         self.assertRaises(TypeError, lambda: rdv.gfs_build_visualization_map("20200820", 12, 0, extent=5))
         self.assertRaises(TypeError, lambda: rdv.gfs_build_visualization_map("20200820", 12, 0, img_path=10))
+        self.assertRaises(TypeError, lambda: rdv.gfs_build_visualization_map("20200820", 12, 0, "Temperature 2m",
+                                                                             fields=[1]))
+
+    def test_render_batch_reuses_figure(self):
+        y, x = np.mgrid[0:33, 0:49]
+        fields = {"Temperature 2m": 10 + 10 * np.sin(x / 8.0), "Wind 10m u": 5 * np.cos(y / 6.0) + 1,
+                  "Wind 10m v": np.full((33, 49), 2.0)}
+        with tempfile.TemporaryDirectory() as tmp:
+            results = rdv.render_batch("19990101", 0, 3, ["Temperature 2m", "Wind 10m", "CAPE surface"],
+                                       img_path=f"{tmp}/003", fields=fields)
+            figure = rdv.chart_figure()
+            children = len(figure.ax.get_children())
+            self.assertEqual(rdv.render_batch("19990101", 0, 6, ["Wind 10m"], img_path=f"{tmp}/006", fields=fields),
+                             {"Wind 10m": None})
+            self.assertIs(rdv.chart_figure(), figure)
+            self.assertEqual(len(figure.ax.get_children()), children)
+
+            self.assertIsNone(results["Temperature 2m"])
+            self.assertIsNone(results["Wind 10m"])
+            self.assertIsInstance(results["CAPE surface"], ValueError)
+            self.assertEqual(sorted(os.listdir(f"{tmp}/003")), ["Temperature 2m.png", "Wind 10m.png"])
+
+    def test_gfs_build_visualization_map_profiles(self):
+        fields = {"Temperature 2m": 10 + 10 * np.sin(np.mgrid[0:33, 0:49][1] / 8.0)}
+        with tempfile.TemporaryDirectory() as tmp:
+            rdv.gfs_build_visualization_map("19990101", 0, 3, "Temperature 2m", img_path=tmp, fields=fields,
+                                            profiles=["preview", "standard"])
+            self.assertTrue(os.path.isfile(f"{tmp}/Temperature 2m.png"))
+            self.assertTrue(os.path.isfile(f"{tmp}/profiles/Temperature 2m.preview.webp"))
+            rdv.gfs_build_visualization_map("19990101", 0, 3, "Temperature 2m", img_path=tmp, fields=fields,
+                                            profiles=["standard", "print"])
+            self.assertTrue(os.path.isfile(f"{tmp}/profiles/Temperature 2m.print.png"))
+            with Image.open(f"{tmp}/Temperature 2m.png") as standard, \
+                    Image.open(f"{tmp}/profiles/Temperature 2m.print.png") as printed, \
+                    Image.open(f"{tmp}/profiles/Temperature 2m.preview.webp") as preview:
+                self.assertEqual(preview.format, "WEBP")
+                self.assertAlmostEqual(printed.width / standard.width, 1.5, places=2)
+            self.assertRaises(FileExistsError, lambda: rdv.gfs_build_visualization_map(
+                "19990101", 0, 3, "Temperature 2m", img_path=tmp, fields=fields, profiles=["print", "preview"]))
+            self.assertRaises(ValueError, lambda: rdv.gfs_build_visualization_map(
+                "19990101", 0, 3, "Temperature 2m", img_path=tmp, fields=fields, profiles=["poster"]))
+
+    def test_chart_figure_saved_part_fits_legend(self):
+        figure = rdv.chart_figure()
+        figure.clear()
+        figure.set_extent(rdv.EXTENT_POLAND)
+        figure.set_scale(np.arange(0, 10), 'jet')
+        with tempfile.TemporaryDirectory() as tmp:
+            figure.set_title("Short title")
+            figure.save(f"{tmp}/short.png")
+            bbox = figure.bbox
+            figure.set_title("Long title " * 30)
+            figure.save(f"{tmp}/long.png")
+            self.assertGreater(figure.bbox.width, bbox.width)
+            with Image.open(f"{tmp}/long.png") as image:
+                self.assertEqual(image.width, int(figure.bbox.width * figure.fig.dpi))
 
     def test_prepare_basemap_pickle(self):
         self.assertRaises(TypeError, lambda: rdv.prepare_basemap_pickle(20))
@@ -85,6 +229,26 @@ class TestRawDataVisualization(unittest.TestCase):
             raised = True
         self.assertEqual(False, raised)
 
+    def test_prepare_basemap_layer(self):
+        self.assertRaises(TypeError, lambda: rdv.prepare_basemap_layer(20, 200, 150, 100))
+        self.assertRaises(ValueError, lambda: rdv.prepare_basemap_layer([20, 10], 200, 150, 100))
+        self.assertRaises(ValueError, lambda: rdv.prepare_basemap_layer(rdv.EXTENT_POLAND, 0, 150, 100))
+
+        key = (tuple(rdv.EXTENT_POLAND), 200, 150, 100)
+        rdv._BASEMAP_LAYERS.pop(key, None)
+        layer = rdv.prepare_basemap_layer(rdv.EXTENT_POLAND, 200, 150, 100)
+        self.assertEqual(layer.shape, (150, 200, 4))
+        self.assertEqual(layer.dtype, np.uint8)
+        # background is transparent, only the contours are drawn
+        alpha = layer[:, :, 3]
+        self.assertEqual(alpha[0, 0], 0)
+        self.assertGreater(np.count_nonzero(alpha == 0), alpha.size // 2)
+        self.assertTrue(np.any(alpha == 255))
+
+        self.assertIs(rdv._BASEMAP_LAYERS[key], layer)
+        self.assertIs(rdv.prepare_basemap_layer(rdv.EXTENT_POLAND, 200, 150, 100), layer)
+        self.assertEqual(rdv.prepare_basemap_layer(rdv.EXTENT_POLAND, 400, 300, 200).shape, (300, 400, 4))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import numpy as np
+
+from project import derived_fields
+
+
+class TestDerivedFields(unittest.TestCase):
+    def tearDown(self):
+        derived_fields.PRODUCTS.pop("Wind 10m speed kt", None)
+
+    def test_wind(self):
+        fields = {"Wind 10m u": np.array([[3.0, 0.0]]), "Wind 10m v": np.array([[4.0, -2.0]])}
+        products = derived_fields.evaluate(["Wind 10m speed", "Wind 10m direction", "Wind 10m u"], fields)
+        np.testing.assert_allclose(products["Wind 10m speed"], [[5.0, 2.0]])
+        np.testing.assert_allclose(products["Wind 10m direction"], [[216.87, 0.0]], atol=0.01)
+        self.assertIs(products["Wind 10m u"], fields["Wind 10m u"])
+
+    def test_relative_humidity(self):
+        fields = {"Temperature 2m": np.array([20.0, 20.0, 0.0]), "Dew point 2m": np.array([20.0, 10.0, -10.0])}
+        humidity = derived_fields.evaluate(["Relative humidity 2m"], fields)["Relative humidity 2m"]
+        np.testing.assert_allclose(humidity, [100.0, 52.5, 46.9], atol=0.1)
+
+    def test_precipitation_rate(self):
+        forecasts = [0, 3, 6, 9, 12, 18, 36, 48]
+        accumulation = np.array([[np.nan, 3.0, 9.0, 1.5, 6.0, 12.0, 6.0, 12.0]] * 2)
+        rate = derived_fields.evaluate(["Precipitation rate"], {"Precipitation ground 6h": accumulation},
+                                       forecasts)["Precipitation rate"]
+        np.testing.assert_allclose(rate[1], [np.nan, 1.0, 2.0, 0.5, 1.5, 2.0, 1.0, 2.0])
+        self.assertRaises(ValueError, lambda: derived_fields.evaluate(["Precipitation rate"],
+                                                                      {"Precipitation ground 6h": accumulation}))
+
+    def test_register(self):
+        derived_fields.register("Wind 10m speed kt", ["Wind 10m speed"], lambda speed: speed * 1.944)
+        self.assertEqual(derived_fields.inputs("Wind 10m speed kt"), ["Wind 10m u", "Wind 10m v"])
+        self.assertFalse(derived_fields.is_temporal("Wind 10m speed kt"))
+        fields = {"Wind 10m u": np.zeros((2, 3, 4)), "Wind 10m v": np.ones((2, 3, 4))}
+        self.assertEqual(derived_fields.evaluate(["Wind 10m speed kt"], fields)["Wind 10m speed kt"].shape, (2, 3, 4))
+        self.assertRaises(ValueError, lambda: derived_fields.evaluate(["Wind 10m speed kt"], {"Wind 10m u": 1.0}))
+        self.assertRaises(TypeError, lambda: derived_fields.register("a", "Wind 10m u", abs))
+        self.assertRaises(ValueError, lambda: derived_fields.register("a", ["a"], abs))
+
+
+if __name__ == '__main__':
+    unittest.main()
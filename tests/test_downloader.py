@@ -0,0 +1,131 @@
+import os
+import tempfile
+import unittest
+
+from project import downloader
+from tests.nomads_stub import NomadsStub, FileServerStub, grib_with_idx
+
+
+def fetch_to(directory, session, url):
+    def fetch(forecast):
+        path = os.path.join(directory, f"gfs.pgrb2.0p25.f{forecast:03}")
+        if os.path.isfile(path):
+            raise FileExistsError
+        r = session.get(f"{url}?file=gfs.t00z.pgrb2.0p25.f{forecast:03}")
+        if len(r.content) <= 10 * 1024:
+            raise EOFError
+        with open(path, 'wb') as f:
+            f.write(r.content)
+    return fetch
+
+
+class TestDownloader(unittest.TestCase):
+    def test_make_session_bad_values(self):
+        self.assertRaises(TypeError, lambda: downloader.make_session(max_per_host="4"))
+        self.assertRaises(ValueError, lambda: downloader.make_session(max_per_host=0))
+        self.assertRaises(ValueError, lambda: downloader.make_session(retries=-1))
+
+    def test_download_all_statuses(self):
+        with NomadsStub(ready=[0, 3, 6]) as stub, tempfile.TemporaryDirectory() as tmp:
+            open(os.path.join(tmp, "gfs.pgrb2.0p25.f003"), 'wb').close()
+            statuses = downloader.download_all([0, 3, 6], fetch_to(tmp, downloader.make_session(), stub.url),
+                                               workers=3)
+        self.assertEqual(statuses, {0: downloader.STATUS_OK, 3: downloader.STATUS_EXISTS, 6: downloader.STATUS_OK})
+
+    def test_download_all_missing_data(self):
+        with NomadsStub(ready=[0]) as stub, tempfile.TemporaryDirectory() as tmp:
+            statuses = downloader.download_all([0, 3], fetch_to(tmp, downloader.make_session(), stub.url))
+        self.assertEqual(statuses[0], downloader.STATUS_OK)
+        self.assertEqual(statuses[3], downloader.STATUS_MISSING)
+
+    def test_download_all_per_host_limit(self):
+        forecasts = list(range(0, 24, 3))
+        with NomadsStub(ready=forecasts, delay=0.05) as stub, tempfile.TemporaryDirectory() as tmp:
+            session = downloader.make_session(max_per_host=2)
+            downloader.download_all(forecasts, fetch_to(tmp, session, stub.url), workers=8)
+        self.assertLessEqual(stub.max_active, 2)
+
+    def test_download_all_retries(self):
+        with NomadsStub(ready=[0], failures=2) as stub, tempfile.TemporaryDirectory() as tmp:
+            session = downloader.make_session(retries=3, backoff_factor=0)
+            statuses = downloader.download_all([0], fetch_to(tmp, session, stub.url))
+        self.assertEqual(statuses[0], downloader.STATUS_OK)
+        self.assertEqual(len(stub.requests), 3)
+
+    def test_download_all_bad_workers(self):
+        self.assertRaises(TypeError, lambda: downloader.download_all([0], lambda job: None, workers="2"))
+        self.assertRaises(ValueError, lambda: downloader.download_all([0], lambda job: None, workers=0))
+
+    def test_download_all_on_done_holds_back_downloads(self):
+        started = []
+        finished = []
+
+        def fetch(job):
+            started.append(job)
+
+        def on_done(job, status):
+            finished.append(len(started))
+
+        downloader.download_all(range(6), fetch, workers=2, on_done=on_done)
+        # k-th callback runs before any job beyond first 2 + k is started
+        self.assertEqual(len(finished), 6)
+        self.assertTrue(all(count <= 2 + k for k, count in enumerate(finished)))
+
+    def test_parse_idx(self):
+        inventory = downloader.parse_idx("1:0:d=2020101206:PRMSL:mean sea level:anl:\n2:990:d=2020101206:CLWMR:1 hybrid level:anl:\n")
+        self.assertEqual(inventory, [(1, 0, "d=2020101206:PRMSL:mean sea level:anl:"),
+                                     (2, 990, "d=2020101206:CLWMR:1 hybrid level:anl:")])
+        self.assertRaises(ValueError, lambda: downloader.parse_idx("1:0"))
+
+    def test_message_ranges(self):
+        inventory = [(1, 0, ""), (2, 100, ""), (3, 250, ""), (4, 300, ""), (5, 420, "")]
+        self.assertEqual(downloader.message_ranges(inventory, [2, 3, 5]), [(100, 299), (420, None)])
+        self.assertEqual(downloader.message_ranges(inventory, [1]), [(0, 99)])
+        self.assertRaises(KeyError, lambda: downloader.message_ranges(inventory, [6]))
+
+    def test_fetch_ranges(self):
+        grib, idx, messages = grib_with_idx(6)
+        ranges = downloader.message_ranges(downloader.parse_idx(idx), [2, 3, 6])
+        with FileServerStub({"/f000": grib}) as stub, tempfile.TemporaryDirectory() as tmp:
+            downloader.fetch_ranges(downloader.make_session(), stub.url + "/f000", ranges, os.path.join(tmp, "out"))
+            with open(os.path.join(tmp, "out"), 'rb') as f:
+                self.assertEqual(f.read(), messages[1] + messages[2] + messages[5])
+        self.assertEqual(len(stub.requests), 2)
+
+    def test_stream_to_file_resumes(self):
+        grib, idx, messages = grib_with_idx(5)
+        with FileServerStub({"/f000": grib}) as stub, tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "out.part")
+            with open(path, 'wb') as f:
+                f.write(grib[:150])
+            self.assertEqual(downloader.stream_to_file(downloader.make_session(), stub.url + "/f000", path,
+                                                       chunk_size=64), len(grib))
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), grib)
+            self.assertEqual(stub.requests[-1], ("/f000", "bytes=150-"))
+            self.assertRaises(EOFError, lambda: downloader.stream_to_file(downloader.make_session(),
+                                                                          stub.url + "/f003", path))
+
+    def test_validate_grib(self):
+        grib, idx, messages = grib_with_idx(5)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "f000")
+            for content, error in [(grib[:-10], EOFError), (grib[:-4] + b"8888", ValueError),
+                                   (b"<html>data file is not present</html>", ValueError)]:
+                with open(path, 'wb') as f:
+                    f.write(content)
+                self.assertRaises(error, lambda: downloader.validate_grib(path))
+            with open(path, 'wb') as f:
+                f.write(grib)
+            self.assertEqual(downloader.validate_grib(path), 5)
+            self.assertRaises(ValueError, lambda: downloader.validate_grib(path, min_messages=6))
+
+    def test_fetch_ranges_not_supported(self):
+        grib, idx, messages = grib_with_idx(3)
+        with FileServerStub({"/f000": grib}, honour_range=False) as stub, tempfile.TemporaryDirectory() as tmp:
+            self.assertRaises(EOFError, lambda: downloader.fetch_ranges(downloader.make_session(), stub.url + "/f000",
+                                                                        [(0, 10)], os.path.join(tmp, "out")))
+
+
+if __name__ == '__main__':
+    unittest.main()
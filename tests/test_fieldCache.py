@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from project.field_cache import FieldCache
+
+
+class TestFieldCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.extent = [13, 25, 56, 48]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_bad_values(self):
+        self.assertRaises(TypeError, lambda: FieldCache(5))
+        self.assertRaises(TypeError, lambda: FieldCache(self.tmp.name, "10"))
+        self.assertRaises(ValueError, lambda: FieldCache(self.tmp.name, 0))
+
+    def test_put_and_get(self):
+        cache = FieldCache(self.tmp.name)
+        self.assertIsNone(cache.get("20201012", 6, 0, "Temperature 2m", self.extent))
+        cache.put("20201012", 6, 0, "Temperature 2m", self.extent, np.arange(6.0).reshape(2, 3))
+        data = cache.get("20201012", 6, 0, "Temperature 2m", self.extent)
+        self.assertIsInstance(data, np.memmap)
+        self.assertEqual(data.dtype, np.float32)
+        self.assertTrue((data == np.arange(6.0).reshape(2, 3)).all())
+        self.assertIsNone(cache.get("20201012", 6, 0, "Temperature 2m", [0, 40, 60, 40]))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_lru_eviction(self):
+        field = np.zeros((32, 32))
+        cache = FieldCache(self.tmp.name, max_bytes=3 * (field.size * 4 + 128))
+        for forecast in [0, 3, 6]:
+            cache.put("20201012", 6, forecast, "Temperature 2m", self.extent, field)
+            path = cache.path(cache.key("20201012", 6, forecast, "Temperature 2m", self.extent))
+            os.utime(path, ns=(forecast * 10 ** 9, forecast * 10 ** 9))
+        cache.get("20201012", 6, 0, "Temperature 2m", self.extent)
+        cache.put("20201012", 6, 9, "Temperature 2m", self.extent, field)
+        self.assertIsNone(cache.get("20201012", 6, 3, "Temperature 2m", self.extent))
+        self.assertIsNotNone(cache.get("20201012", 6, 0, "Temperature 2m", self.extent))
+        self.assertLessEqual(cache.size(), cache.max_bytes)
+
+    def test_put_scans_cache_only_to_evict(self):
+        field = np.zeros((32, 32))
+        cache = FieldCache(self.tmp.name, max_bytes=3 * (field.size * 4 + 128))
+        scans = []
+        entries = cache._entries
+        cache._entries = lambda: scans.append(1) or entries()
+        for forecast in [0, 3, 6]:
+            cache.put("20201012", 6, forecast, "Temperature 2m", self.extent, field)
+        self.assertEqual(len(scans), 1)  # size counted once, cache is not full
+        cache.put("20201012", 6, 9, "Temperature 2m", self.extent, field)
+        self.assertEqual(len(scans), 2)
+        self.assertLessEqual(cache.size(), cache.max_bytes)
+
+    def test_put_removes_temporary_file_on_error(self):
+        cache = FieldCache(self.tmp.name)
+        self.assertRaises(ValueError, lambda: cache.put("20201012", 6, 0, "Temperature 2m", self.extent,
+                                                        np.array(["a"])))
+        files = [name for root, dirs, names in os.walk(self.tmp.name) for name in names]
+        self.assertEqual(files, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+from project import image_variants
+
+
+class TestImageVariants(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.png = os.path.join(self.tmp.name, "Temperature 2m.png")
+        Image.new("RGBA", (2160, 1440), (255, 0, 0, 255)).save(self.png)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_variant_path(self):
+        self.assertEqual(image_variants.variant_path(self.png, "full", "png"), self.png)
+        self.assertEqual(image_variants.variant_path(self.png, "small", "webp"),
+                         os.path.join(self.tmp.name, "variants", "Temperature 2m.small.webp"))
+        self.assertRaises(ValueError, lambda: image_variants.variant_path(self.png, "huge", "png"))
+        self.assertRaises(ValueError, lambda: image_variants.variant_path(self.png, "small", "gif"))
+
+    def test_make_variants(self):
+        image_variants.make_variants(self.png)
+        with Image.open(image_variants.variant_path(self.png, "small", "png")) as image:
+            self.assertEqual(image.size, (image_variants.SIZES["small"], 480))
+        with Image.open(image_variants.variant_path(self.png, "full", "webp")) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (2160, 1440)))
+        self.assertRaises(FileNotFoundError, lambda: image_variants.make_variants(self.png + "x"))
+
+    def test_make_variant_concurrently(self):
+        encode, calls = image_variants._encode, []
+        image_variants._encode = lambda *args: calls.append(args) or encode(*args)
+        try:
+            with ThreadPoolExecutor(8) as pool:
+                paths = set(pool.map(lambda _: image_variants.make_variant(self.png, "small", "webp"), range(8)))
+        finally:
+            image_variants._encode = encode
+        self.assertEqual(paths, {image_variants.variant_path(self.png, "small", "webp")})
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(image_variants._pending, {})
+
+    def test_file_etag(self):
+        etag = image_variants.file_etag(self.png)
+        self.assertEqual(etag, image_variants.file_etag(self.png))
+        Image.new("RGBA", (20, 10)).save(self.png)
+        self.assertNotEqual(etag, image_variants.file_etag(self.png))
+
+    def test_file_etags_are_bounded(self):
+        max_etags = image_variants.MAX_ETAGS
+        image_variants.MAX_ETAGS = 3
+        try:
+            paths = []
+            for i in range(5):
+                paths.append(os.path.join(self.tmp.name, f"{i}.txt"))
+                with open(paths[-1], 'w') as f:
+                    f.write(str(i))
+                image_variants.file_etag(paths[-1])
+                image_variants.file_etag(paths[0])  # recently used, kept
+            self.assertLessEqual(len(image_variants._etags), 3)
+            self.assertIn(paths[0], image_variants._etags)
+            self.assertIn(paths[4], image_variants._etags)
+            self.assertNotIn(paths[1], image_variants._etags)
+        finally:
+            image_variants.MAX_ETAGS = max_etags
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from project import metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def test_exposition(self):
+        registry = metrics.Registry(buckets=(0.1, 1.0))
+        registry.inc("gfs_downloads_total", status="ok")
+        registry.inc("gfs_downloads_total", 2, status="ok")
+        registry.set("gfs_cycle_last_seconds", 12.5)
+        registry.observe("gfs_render_seconds", 0.05, chart="Wind 10m")
+        registry.observe("gfs_render_seconds", 0.5, chart="Wind 10m")
+        registry.observe("gfs_render_seconds", 5.0, chart="Wind 10m")
+        text = metrics.exposition(registry)
+        self.assertIn('# TYPE gfs_downloads_total counter\ngfs_downloads_total{status="ok"} 3\n', text)
+        self.assertIn('gfs_cycle_last_seconds 12.5\n', text)
+        self.assertIn('gfs_render_seconds_bucket{chart="Wind 10m",le="0.1"} 1\n', text)
+        self.assertIn('gfs_render_seconds_bucket{chart="Wind 10m",le="1"} 2\n', text)
+        self.assertIn('gfs_render_seconds_bucket{chart="Wind 10m",le="+Inf"} 3\n', text)
+        self.assertIn('gfs_render_seconds_sum{chart="Wind 10m"} 5.55\n', text)
+        self.assertIn('gfs_render_seconds_count{chart="Wind 10m"} 3\n', text)
+
+    def test_collect_merges_snapshots(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            other = metrics.Registry()
+            other.inc("gfs_charts_total", 4, status="ok")
+            other.observe("gfs_decode_seconds", 0.2)
+            with open(os.path.join(tmp, "render-1.json"), 'w') as f:
+                json.dump(other.snapshot(), f)
+            metrics.inc("gfs_charts_total", status="ok")
+            registry = metrics.collect(tmp)
+            own = metrics.REGISTRY.counters[("gfs_charts_total", (("status", "ok"),))]
+            self.assertEqual(registry.counters[("gfs_charts_total", (("status", "ok"),))], own + 4)
+            self.assertEqual(registry.histograms[("gfs_decode_seconds", ())][-1], 0.2)
+
+            metrics.flush(tmp)
+            metrics.remove_snapshots(["render", "process"], tmp)
+            self.assertEqual(os.listdir(tmp), [])
+
+    def test_merge_snapshots(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for pool in range(3):
+                for pid in range(4):
+                    worker = metrics.Registry()
+                    worker.inc("gfs_charts_total", status="ok")
+                    worker.observe("gfs_render_seconds", 0.5)
+                    with open(os.path.join(tmp, f"render-{pool * 10 + pid}.json"), 'w') as f:
+                        json.dump(worker.snapshot(), f)
+                metrics.merge_snapshots("render", tmp)
+                self.assertEqual(os.listdir(tmp), ["render.json"])
+
+            with open(os.path.join(tmp, "render.json")) as f:
+                merged = metrics.Registry()
+                merged.merge(json.load(f))
+            self.assertEqual(merged.counters[("gfs_charts_total", (("status", "ok"),))], 12)
+            self.assertEqual(merged.histograms[("gfs_render_seconds", ())][-1], 6.0)
+            metrics.remove_snapshots(["render"], tmp)
+            self.assertEqual(os.listdir(tmp), [])
+
+    def test_flush_if_due(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            metrics._last_flush = None
+            self.assertTrue(metrics.flush_if_due(60, tmp))
+            self.assertFalse(metrics.flush_if_due(60, tmp))
+            self.assertEqual(os.listdir(tmp), [f"process-{os.getpid()}.json"])
+            self.assertTrue(metrics.flush_if_due(0, tmp))
+
+    def test_collect_removes_snapshots_of_finished_processes(self):
+        finished = subprocess.Popen([sys.executable, "-c", "pass"])
+        finished.wait()
+        with tempfile.TemporaryDirectory() as tmp:
+            worker = metrics.Registry()
+            worker.inc("gfs_http_requests_total", route="/", status=200)
+            names = [f"web-{os.getppid()}.json", f"pipeline-{finished.pid}.json", f"web-{finished.pid}.json",
+                     "render.json"]
+            for name in names:
+                with open(os.path.join(tmp, name), 'w') as f:
+                    json.dump(worker.snapshot(), f)
+            old = time.time() - metrics.STALE_AFTER - 1
+            os.utime(os.path.join(tmp, f"pipeline-{finished.pid}.json"), (old, old))
+
+            registry = metrics.collect(tmp)
+            self.assertEqual(registry.counters[("gfs_http_requests_total", (("route", "/"), ("status", "200")))], 3)
+            self.assertEqual(sorted(os.listdir(tmp)), sorted(names[:1] + names[2:]))
+            self.assertEqual(metrics.snapshot_pid(os.path.join(tmp, "render-12.json")), 12)
+            self.assertIsNone(metrics.snapshot_pid(os.path.join(tmp, "render.json")))
+
+    def test_span(self):
+        with metrics.span("gfs_test"):
+            pass
+        self.assertIn(("gfs_test_seconds", ()), metrics.REGISTRY.histograms)
+        self.assertIn(("gfs_test_last_seconds", ()), metrics.REGISTRY.gauges)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import os
+import unittest
+
+from project import output_profiles
+
+
+class TestOutputProfiles(unittest.TestCase):
+    def tearDown(self):
+        output_profiles.PROFILES.pop("thumb", None)
+
+    def test_output_path(self):
+        self.assertEqual(output_profiles.output_path("pics/003", "Wind 10m", "standard"),
+                         os.path.join("pics/003", "Wind 10m.png"))
+        self.assertEqual(output_profiles.output_path("pics/003", "Wind 10m", "preview"),
+                         os.path.join("pics/003", "profiles", "Wind 10m.preview.webp"))
+        self.assertRaises(ValueError, lambda: output_profiles.output_path("pics/003", "Wind 10m", "poster"))
+
+    def test_image_kwargs(self):
+        self.assertEqual(output_profiles.image_kwargs("print"),
+                         {"format": "PNG", "dpi": (300, 300), "compress_level": 9})
+        self.assertEqual(output_profiles.image_kwargs("preview"),
+                         {"format": "WEBP", "dpi": (72, 72), "quality": 70})
+
+    def test_register(self):
+        output_profiles.register("thumb", 50, "jpeg", quality=60)
+        self.assertEqual(output_profiles.output_path("pics", "CAPE surface", "thumb"),
+                         os.path.join("pics", "profiles", "CAPE surface.thumb.jpg"))
+        self.assertRaises(TypeError, lambda: output_profiles.register(5, 50, "png"))
+        self.assertRaises(TypeError, lambda: output_profiles.register("thumb", "50", "png"))
+        self.assertRaises(ValueError, lambda: output_profiles.register("a/b", 50, "png"))
+        self.assertRaises(ValueError, lambda: output_profiles.register("thumb", 50, "gif"))
+        self.assertRaises(ValueError, lambda: output_profiles.register("thumb", 50, "png", compress_level=10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import threading
+import time
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from project import downloader, metrics, pipeline, render_scheduler
+from project import raw_data_visualization as rdv
+
+FORECASTS = [0, 3, 6, 9, 12, 15, 18]
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.events = []  # ("download" | "render", forecast) in order
+        self.lock = threading.Lock()
+        self.render_started = threading.Event()
+        self.release_render = threading.Event()
+        self.calls = 0  # on_done calls started, they block when the queue is full
+        self.producer = None  # thread which runs download_cycle
+
+    def stub(self, module, name, value):
+        original = getattr(module, name)
+        setattr(module, name, value)
+        self.addCleanup(setattr, module, name, original)
+
+    def download_cycle(self, date, hour, forecasts, extent, workers, partial=False, on_done=None):
+        self.producer = threading.current_thread()
+        statuses = {}
+        for forecast in forecasts:
+            with self.lock:
+                self.calls += 1
+            on_done(forecast, downloader.STATUS_OK)
+            with self.lock:
+                self.events.append(("download", forecast))
+            statuses[forecast] = downloader.STATUS_OK
+        return statuses
+
+    def render_file(self, jobs):
+        with self.lock:
+            self.events.append(("render", jobs[0].forecast))
+        self.render_started.set()
+        self.release_render.wait(10)
+        return 0.0, [render_scheduler.RenderResult(job, render_scheduler.STATUS_OK, 0.0, "") for job in jobs]
+
+    def run_pipeline(self, queue_size, make_pool=lambda workers, extents: ThreadPoolExecutor(workers)):
+        self.stub(rdv, "gfs_download_cycle", self.download_cycle)
+        self.stub(render_scheduler, "render_file", self.render_file)
+        self.stub(render_scheduler, "make_pool", make_pool)
+        self.stub(metrics, "flush", lambda *args: None)
+        self.stub(metrics, "merge_snapshots", lambda *args: None)
+
+        result = []
+
+        def run():
+            try:
+                result.append(pipeline.run_cycle("20201012", 6, FORECASTS, render_workers=1, queue_size=queue_size))
+            except BaseException as e:
+                result.append(e)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread, result
+
+    def test_run_cycle_bad_queue_size(self):
+        self.assertRaises(TypeError, lambda: pipeline.run_cycle("20201012", 6, queue_size="4"))
+        self.assertRaises(ValueError, lambda: pipeline.run_cycle("20201012", 6, queue_size=0))
+
+    def test_run_cycle_renders_while_downloading(self):
+        thread, result = self.run_pipeline(queue_size=2)
+        self.assertTrue(self.render_started.wait(10))
+        # rendering of the first file is blocked: one file is rendered, two wait in the queue and the download of
+        # the next one is held back
+        deadline = time.time() + 10
+        while self.calls < 4 and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.2)
+        with self.lock:
+            self.assertEqual(self.calls, 4)
+            self.assertEqual(sorted(self.events), [("download", 0), ("download", 3), ("download", 6), ("render", 0)])
+
+        self.release_render.set()
+        thread.join(10)
+        self.assertFalse(thread.is_alive())
+        statuses, results = result[0]
+        self.assertEqual(statuses, {forecast: downloader.STATUS_OK for forecast in FORECASTS})
+        self.assertEqual([event[1] for event in self.events if event[0] == "render"], FORECASTS)
+        self.assertLess(self.events.index(("render", 0)), self.events.index(("download", FORECASTS[-1])))
+        self.assertTrue(all(result.status == render_scheduler.STATUS_OK for result in results))
+
+    def test_run_cycle_stops_downloads_when_rendering_fails(self):
+        class BrokenPool(ThreadPoolExecutor):
+            def submit(self, *args, **kwargs):
+                raise BrokenProcessPool("A process in the process pool was terminated abruptly")
+
+        thread, result = self.run_pipeline(queue_size=2, make_pool=lambda workers, extents: BrokenPool(workers))
+        thread.join(10)
+        self.assertFalse(thread.is_alive())
+        self.assertIsInstance(result[0], BrokenProcessPool)
+        self.assertFalse(self.producer.is_alive())
+        # downloads already handed to the queue are finished, the rest of the cycle is not downloaded
+        downloaded = [event[1] for event in self.events if event[0] == "download"]
+        self.assertLess(len(downloaded), len(FORECASTS))
+
+
+if __name__ == '__main__':
+    unittest.main()
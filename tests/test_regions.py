@@ -0,0 +1,38 @@
+import unittest
+import numpy as np
+
+from project import regions
+
+
+class TestRegions(unittest.TestCase):
+    def test_superset_extent(self):
+        self.assertEqual(regions.superset_extent([[13, 25, 56, 48], [10, 20, 50, 40]]), [10, 25, 56, 40])
+        self.assertRaises(ValueError, lambda: regions.superset_extent([]))
+
+    def test_cut_is_zero_copy(self):
+        superset = [10, 25, 56, 40]
+        data = np.arange(65 * 61, dtype=np.float32).reshape(65, 61)
+        fields = regions.cut({"Temperature 2m": data}, superset, [13, 25, 56, 48])
+        self.assertEqual(fields["Temperature 2m"].shape, (33, 49))
+        self.assertEqual(fields["Temperature 2m"][0, 0], data[0, 12])
+        self.assertTrue(np.shares_memory(fields["Temperature 2m"], data))
+        self.assertRaises(ValueError, lambda: regions.cut({"Temperature 2m": data}, superset, [5, 25, 56, 48]))
+
+    def test_register(self):
+        self.assertRaises(TypeError, lambda: regions.register("alps", (5, 17, 49, 43)))
+        self.assertRaises(ValueError, lambda: regions.register("../alps", [5, 17, 49, 43]))
+        self.assertRaises(ValueError, lambda: regions.register("alps", [17, 5, 49, 43]))
+        regions.register("alps", [5, 17, 49, 43])
+        try:
+            self.assertTrue(regions.pics_dir("alps").endswith("/data/regions/alps/pics"))
+            self.assertEqual(regions.superset_extent(), [5, 25, 56, 43])
+        finally:
+            del regions.REGIONS["alps"]
+
+    def test_pics_dir(self):
+        self.assertTrue(regions.pics_dir(regions.DEFAULT_REGION).endswith("/data/pics"))
+        self.assertRaises(ValueError, lambda: regions.pics_dir("atlantis"))
+
+
+if __name__ == '__main__':
+    unittest.main()
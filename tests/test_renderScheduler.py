@@ -0,0 +1,34 @@
+import unittest
+from project import raw_data_visualization as rdv
+from project import render_scheduler as rs
+from project import regions
+
+
+class TestRenderScheduler(unittest.TestCase):
+    def test_cycle_jobs(self):
+        jobs = rs.cycle_jobs("20201012", 6, [0, 3])
+        self.assertEqual(len(jobs), len(rdv.CHARTS) + len(rdv.CHARTS_NONZERO))
+        self.assertTrue(jobs[0].img_path.endswith("/data/pics/20201012/06z/000"))
+
+    def test_file_jobs_of_regions(self):
+        regions.register("alps", [5, 17, 49, 43])
+        try:
+            jobs = rs.file_jobs("20201012", 6, 3)
+        finally:
+            del regions.REGIONS["alps"]
+        self.assertEqual(len(jobs), 2 * len(rdv.CHARTS_NONZERO))
+        self.assertEqual({tuple(job.extent) for job in jobs}, {(13, 25, 56, 48), (5, 17, 49, 43)})
+        self.assertTrue(jobs[-1].img_path.endswith("/data/regions/alps/pics/20201012/06z/003"))
+
+    def test_render_all_bad_workers(self):
+        self.assertRaises(TypeError, lambda: rs.render_all([], workers="2"))
+        self.assertRaises(ValueError, lambda: rs.render_all([], workers=0))
+
+    def test_render_all_missing_files_are_skipped(self):
+        results = rs.render_all(rs.cycle_jobs("30200820", 6, [0]), workers=2)
+        self.assertEqual(len(results), len(rdv.CHARTS))
+        self.assertTrue(all(result.status == rs.STATUS_SKIPPED for result in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+import numpy as np
+
+from scipy.ndimage import convolve
+from project import resampling
+
+
+class TestResampling(unittest.TestCase):
+    def test_block_upsample_if_correct_resizing(self):
+        array1 = np.array([[0, 1], [1, 0]])
+        array2 = np.array([[0, 0, 1, 1], [0, 0, 1, 1], [1, 1, 0, 0], [1, 1, 0, 0]])
+        self.assertTrue((resampling.block_upsample(array1, 2) == array2).all())
+        self.assertEqual(resampling.block_upsample(array1, 2).dtype, float)
+
+    def test_box_smooth_same_as_convolve(self):
+        data = np.random.RandomState(0).normal(size=(12, 17))
+        for size in [1, 3, 4, 10]:
+            expected = convolve(data, np.ones([size, size]) / (size ** 2))
+            self.assertTrue(np.allclose(resampling.box_smooth(data, size), expected))
+
+    def test_upsample_smooth_shape(self):
+        self.assertEqual(resampling.upsample_smooth(np.ones((33, 49)), 10).shape, (330, 490))
+
+    def test_bad_factor(self):
+        self.assertRaises(TypeError, lambda: resampling.block_upsample(np.ones((2, 2)), 2.5))
+        self.assertRaises(ValueError, lambda: resampling.block_upsample(np.ones((2, 2)), 0))
+        self.assertRaises(TypeError, lambda: resampling.box_smooth(np.ones((2, 2)), "3"))
+        self.assertRaises(ValueError, lambda: resampling.box_smooth(np.ones((2, 2)), -1))
+
+
+if __name__ == '__main__':
+    unittest.main()
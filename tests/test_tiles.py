@@ -0,0 +1,68 @@
+import io
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from PIL import Image
+from matplotlib.figure import Figure
+from project import tiles
+
+EXTENT = [13, 25, 56, 48]
+LEVELS = np.arange(-30, 42, 1)
+
+
+class TestTiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        data = np.full((33, 49), 10.0, dtype=np.float32)
+        tiles.write_source("20201012", 6, 3, "Temperature 2m", data, EXTENT, LEVELS, 'jet', self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_tile_lonlat(self):
+        lon, lat = tiles.tile_lonlat(0, 0, 0)
+        self.assertAlmostEqual(lon[0], -180 + 180 / 256)
+        self.assertTrue(lat[0] > 84 and lat[-1] < -84)
+
+    def test_render_tile_inside_and_outside(self):
+        data = np.full((33, 49), 10.5, dtype=np.float32)
+        rgba = tiles.render_tile(data, EXTENT, LEVELS, 'jet', 6, 36, 20)  # 52.5-55.8N, 22.5-28.1E
+        self.assertTrue((rgba[0, 0, 3] > 0) and (rgba[0, -1, 3] == 0))
+        self.assertEqual(len(np.unique(rgba[rgba[..., 3] > 0].reshape(-1, 4), axis=0)), 1)
+        self.assertFalse(tiles.render_tile(data, EXTENT, LEVELS, 'jet', 6, 10, 10)[..., 3].any())
+
+    def test_band_colors_match_contourf(self):
+        contour_set = Figure().add_subplot(1, 1, 1).contourf(np.arange(12.0).reshape(3, 4), levels=LEVELS, cmap='jet',
+                                                              extend='both')
+        np.testing.assert_allclose(tiles.band_colors(LEVELS, 'jet'), contour_set.to_rgba(contour_set.layers))
+
+    def test_get_tile_is_cached(self):
+        tile = tiles.get_tile("20201012", 6, 3, "Temperature 2m", 6, 35, 20, self.tmp.name)
+        with Image.open(io.BytesIO(tile)) as image:
+            self.assertEqual(image.size, (tiles.TILE_SIZE, tiles.TILE_SIZE))
+        path = os.path.join(tiles.source_dir("20201012", 6, 3, self.tmp.name), "Temperature 2m", "6", "35", "20.png")
+        self.assertTrue(os.path.isfile(path))
+        self.assertIs(tiles.get_tile("20201012", 6, 3, "Temperature 2m", 6, 35, 20, self.tmp.name), tile)
+
+        tiles.write_source("20201012", 6, 3, "Temperature 2m", np.zeros((33, 49)), EXTENT, LEVELS, 'jet',
+                           self.tmp.name)
+        self.assertFalse(os.path.isfile(path))
+        self.assertNotEqual(tiles.get_tile("20201012", 6, 3, "Temperature 2m", 6, 35, 20, self.tmp.name), tile)
+
+    def test_get_tile_outside_extent(self):
+        self.assertEqual(tiles.get_tile("20201012", 6, 3, "Temperature 2m", 3, 0, 0, self.tmp.name),
+                         tiles.empty_tile())
+
+    def test_get_tile_bad_values(self):
+        self.assertRaises(ValueError, lambda: tiles.get_tile("20201012", 6, 3, "Temperature 2m", 2, 4, 0,
+                                                             self.tmp.name))
+        self.assertRaises(TypeError, lambda: tiles.get_tile("20201012", 6, 3, "Temperature 2m", "2", 0, 0,
+                                                            self.tmp.name))
+        self.assertRaises(FileNotFoundError, lambda: tiles.get_tile("20201012", 6, 3, "CAPE surface", 6, 35, 20,
+                                                                    self.tmp.name))
+
+
+if __name__ == '__main__':
+    unittest.main()
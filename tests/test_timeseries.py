@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from project import timeseries
+
+EXTENT = [13, 25, 56, 48]
+
+
+def fields_of(forecast):
+    if forecast == 6:
+        return None
+    fields = {"Temperature 2m": np.full((33, 49), float(forecast), dtype=np.float32)}
+    fields["Temperature 2m"][4, 8] = 100 + forecast
+    if forecast != 0:
+        fields["Precipitation ground 6h"] = np.ones((33, 49), dtype=np.float32)
+    return fields
+
+
+class TestTimeseries(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_point_series(self):
+        timeseries.write_cube("20201012", 6, [0, 3, 6], ["Temperature 2m", "Precipitation ground 6h"], EXTENT,
+                              fields_of, self.tmp.name)
+        series = timeseries.point_series("20201012", 6, 55.0, 15.1, self.tmp.name)
+        self.assertEqual((series["lat"], series["lon"]), (55.0, 15.0))
+        self.assertEqual(series["valid"], ["2020-10-12T06:00Z", "2020-10-12T09:00Z", "2020-10-12T12:00Z"])
+        self.assertEqual(series["fields"]["Temperature 2m"], [100.0, 103.0, None])
+        self.assertEqual(series["fields"]["Precipitation ground 6h"], [None, 1.0, None])
+        self.assertEqual(timeseries.latest_cube(self.tmp.name), ("20201012", 6))
+
+    def test_write_cube_products(self):
+        names = ["Temperature 2m", "Precipitation ground 6h"]
+        timeseries.write_cube("20201012", 6, [0, 3, 6], names, EXTENT, fields_of, self.tmp.name, ["Precipitation rate"])
+        series = timeseries.point_series("20201012", 6, 55.0, 15.1, self.tmp.name)
+        self.assertEqual(series["fields"]["Precipitation rate"], [None, 0.33, None])
+        self.assertRaises(ValueError, lambda: timeseries.write_cube("20201012", 6, [0], names, EXTENT, fields_of,
+                                                                    self.tmp.name, ["Wind 10m speed"]))
+
+    def test_point_out_of_extent(self):
+        timeseries.write_cube("20201012", 6, [0], ["Temperature 2m"], EXTENT, fields_of, self.tmp.name)
+        self.assertRaises(ValueError, lambda: timeseries.point_series("20201012", 6, 60.0, 15.0, self.tmp.name))
+        self.assertRaises(FileNotFoundError, lambda: timeseries.point_series("20201012", 12, 55.0, 15.0, self.tmp.name))
+
+    def test_write_cube_without_fields(self):
+        self.assertRaises(FileNotFoundError, lambda: timeseries.write_cube("20201012", 6, [6], ["Temperature 2m"],
+                                                                           EXTENT, fields_of, self.tmp.name))
+        self.assertIsNone(timeseries.latest_cube(self.tmp.name))
+
+    def test_build_meteogram(self):
+        timeseries.write_cube("20201012", 6, [0, 3], ["Temperature 2m"], EXTENT, fields_of, self.tmp.name)
+        path = os.path.join(self.tmp.name, "meteogram.png")
+        timeseries.build_meteogram(timeseries.point_series("20201012", 6, 52.0, 20.0, self.tmp.name), path)
+        self.assertTrue(os.path.isfile(path))
+
+
+if __name__ == '__main__':
+    unittest.main()